@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark audit log search: legacy regex scan vs org-scoped search modes
+
+Seeds synthetic audit logs into a scratch database (never the PedolOne
+database), stamped with org_ids the way the application stamps them, then
+times the old unanchored regex query against the search modes
+/audit/org/{org_id} now runs within one organization's scope: prefix (the
+default, through the search key index), partial (substring regex) and word
+(the $text index).
+
+Usage:
+    python bench_audit_search.py --rows 10000000
+"""
+import argparse
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from services.audit_search import ensure_search_index, build_search_filter, stamp_search_keys
+from services.org_identity import stamp_log
+
+load_dotenv()
+
+ORGS = [("bankabc_001", "BankABC"), ("stockbrokerx_001", "StockBrokerX"), ("insurancecorp_001", "InsuranceCorp")]
+RESOURCES = ["aadhaar", "pan", "account", "ifsc", "creditcard", "debitcard", "gst", "itform16", "upi", "passport", "drivinglicense"]
+PURPOSES = ["kyc", "loan processing", "fraud detection", "account opening", "insurance claim"]
+CITIES = [("Mumbai", "Maharashtra"), ("New Delhi", "Delhi"), ("Bengaluru", "Karnataka"), ("Chennai", "Tamil Nadu"), ("Pune", "Maharashtra")]
+LOG_TYPES = ["consent", "data_access", "data_request_sent", "user_login"]
+ORG_IDS = {**{name: org_id for org_id, name in ORGS}, **{org_id: org_id for org_id, _ in ORGS}}
+
+def resolve_org(value) -> str:
+    """Resolve the synthetic organizations without touching the organizations collection"""
+    return ORG_IDS.get(str(value), str(value)) if value else None
+
+def make_log(i: int, now: datetime) -> dict:
+    org_id, org_name = ORGS[i % len(ORGS)]
+    city, region = CITIES[i % len(CITIES)]
+    return {
+        "user_id": i % 50000,
+        "fintech_name": org_name,
+        "fintech_id": org_id,
+        "resource_name": RESOURCES[i % len(RESOURCES)],
+        "purpose": [PURPOSES[i % len(PURPOSES)]],
+        "log_type": LOG_TYPES[i % len(LOG_TYPES)],
+        "ip_address": f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}",
+        "region": f"{city}, {region}, India",
+        "city": city,
+        "country": "India",
+        "data_source": "individual",
+        "target_org_id": org_id,
+        "created_at": now - timedelta(seconds=i)
+    }
+
+def seed(collection, rows: int, batch_size: int = 10000) -> None:
+    existing = collection.estimated_document_count()
+    if existing and not collection.find_one({"org_ids": {"$exists": True}, "search_keys": {"$exists": True}}):
+        print(f"Dropping {existing} rows seeded without org_ids or search keys")
+        collection.drop()
+        existing = 0
+    if existing >= rows:
+        print(f"Reusing {existing} existing rows")
+        return
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    for offset in range(existing, rows, batch_size):
+        collection.insert_many(
+            [stamp_search_keys(stamp_log(make_log(i, now), resolve_org)) for i in range(offset, min(offset + batch_size, rows))],
+            ordered=False
+        )
+        if (offset // batch_size) % 100 == 0:
+            print(f"  seeded {offset + batch_size} rows")
+    print(f"Seeded {rows - existing} rows in {time.perf_counter() - start:.1f}s")
+
+def org_scope(org_id: str) -> dict:
+    # The same scope /audit/org/{org_id} uses: one equality on the stamped org_ids
+    return {"org_ids": org_id}
+
+def time_query(collection, query_filter: dict, limit: int, repeats: int) -> tuple[float, float, int]:
+    page_times = []
+    count_times = []
+    total = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        list(collection.find(query_filter).sort("created_at", -1).limit(limit))
+        page_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        total = collection.count_documents(query_filter)
+        count_times.append(time.perf_counter() - start)
+    return min(page_times) * 1000, min(count_times) * 1000, total
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark audit log search")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--database", default="PedolOne_bench")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--terms", nargs="+", default=["Mumbai", "passport", "fraud detection", "10.1.2"])
+    args = parser.parse_args()
+
+    if args.database == "PedolOne":
+        raise SystemExit("Refusing to benchmark against the application database")
+
+    client = MongoClient(os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
+    collection = client[args.database]["logs"]
+
+    print(f"Seeding {args.rows} audit logs into {args.database}.logs")
+    seed(collection, args.rows)
+    collection.create_index([("created_at", 1)])
+    collection.create_index([("org_ids", 1), ("created_at", -1)])
+    start = time.perf_counter()
+    ensure_search_index(collection)
+    print(f"Text index ready in {time.perf_counter() - start:.1f}s")
+
+    org_id, _ = ORGS[0]
+    print(f"\n{'term':<20} {'mode':<6} {'page ms':>10} {'count ms':>10} {'matches':>10}")
+    for term in args.terms:
+        # The legacy query replaced the org scope, so it matched every org's logs
+        regex = re.compile(term, re.IGNORECASE)
+        legacy = {"$or": [{field: regex} for field in ["fintech_name", "resource_name", "purpose", "ip_address", "region", "city", "country"]]}
+        prefix = {**org_scope(org_id), **build_search_filter(term, "prefix", org_id)}
+        partial = {**org_scope(org_id), **build_search_filter(term, "partial")}
+        word = {**org_scope(org_id), **build_search_filter(term, "word")}
+
+        for mode, query_filter in (("regex", legacy), ("prefix", prefix), ("scoped", partial), ("text", word)):
+            page_ms, count_ms, total = time_query(collection, query_filter, args.limit, args.repeats)
+            print(f"{term:<20} {mode:<6} {page_ms:>10.1f} {count_ms:>10.1f} {total:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark bulk data request creation: per-user loop vs set-based validation
+
+Seeds synthetic users and policies into a scratch database (never the
+PedolOne database), then times the old per-user find_one/find/insert_one
+loop against the set-based validation and chunked insert_many that
+/data-requests/create-bulk-request now uses.
+
+Usage:
+    python bench_bulk_requests.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from services.bulk_requests import resolve_bulk_request_users, insert_in_chunks
+from services.org_identity import stamp_policy
+
+load_dotenv()
+
+TARGET_ORG_ID = "bankabc_001"
+TARGET_ORG_NAME = "BankABC"
+USER_ID_BASE = 1_000_000
+
+def resolve_org(value):
+    # The scratch database has no organizations collection to resolve names from
+    return TARGET_ORG_ID if value in (TARGET_ORG_ID, TARGET_ORG_NAME) else value
+
+def seed(db, users: int, batch_size: int = 10000) -> None:
+    if db.policy.find_one({"org_ids": {"$exists": False}}):
+        print("Dropping scratch data seeded before policies carried org_ids")
+        db.users.drop()
+        db.policy.drop()
+    existing = db.users.estimated_document_count()
+    if existing >= users:
+        print(f"Reusing {existing} existing users")
+        return
+    start = time.perf_counter()
+    for offset in range(existing, users, batch_size):
+        batch = range(offset, min(offset + batch_size, users))
+        # Half the users are linked by organization_id, half only through a policy
+        db.users.insert_many([
+            {
+                "userid": USER_ID_BASE + i,
+                "email": f"user{i}@example.com",
+                "full_name": f"User {i}",
+                "organization_id": TARGET_ORG_ID if i % 2 == 0 else None
+            }
+            for i in batch
+        ], ordered=False)
+        db.policy.insert_many([
+            stamp_policy(
+                {"user_id": USER_ID_BASE + i, "resource_name": "pan", "shared_with": TARGET_ORG_NAME, "target_org_id": TARGET_ORG_ID},
+                resolve_org
+            )
+            for i in batch if i % 2 == 1
+        ], ordered=False)
+    db.users.create_index("userid")
+    # The same policy indexes routers/policy.py creates
+    db.policy.create_index("target_org_id")
+    db.policy.create_index("shared_with")
+    db.policy.create_index([("user_id", 1), ("target_org_id", 1)])
+    db.policy.create_index([("org_ids", 1), ("user_id", 1)])
+    print(f"Seeded {users - existing} users in {time.perf_counter() - start:.1f}s")
+
+def make_request(bulk_request_id: str, user: dict) -> dict:
+    return {
+        "request_id": str(uuid.uuid4()),
+        "bulk_request_id": bulk_request_id,
+        "target_org_id": TARGET_ORG_ID,
+        "target_user_id": user["userid"],
+        "target_user_email": user["email"],
+        "status": "pending",
+        "created_at": datetime.utcnow()
+    }
+
+def run_legacy(db, user_ids: list) -> int:
+    bulk_request_id = str(uuid.uuid4())
+    target_users = []
+    for user_id in user_ids:
+        user = db.users.find_one({"userid": user_id})
+        if user.get("organization_id") != TARGET_ORG_ID:
+            policies = list(db.policy.find({
+                "user_id": user_id,
+                "$or": [{"target_org_id": TARGET_ORG_ID}, {"shared_with": TARGET_ORG_NAME}]
+            }))
+            if not policies:
+                raise SystemExit(f"User {user_id} unexpectedly outside the organization")
+        target_users.append(user)
+    for user in target_users:
+        db.data_requests.insert_one(make_request(bulk_request_id, user))
+    return len(target_users)
+
+def run_set_based(db, user_ids: list) -> int:
+    bulk_request_id = str(uuid.uuid4())
+    users, missing, outside = resolve_bulk_request_users(db.users, db.policy, user_ids, TARGET_ORG_ID)
+    if missing or outside:
+        raise SystemExit("Seeded users failed validation")
+    return insert_in_chunks(db.data_requests, [make_request(bulk_request_id, user) for user in users])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk data request creation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--database", default="PedolOne_bench")
+    parser.add_argument("--skip-legacy-above", type=int, default=None, help="Only time the set-based path for larger sizes")
+    args = parser.parse_args()
+
+    if args.database == "PedolOne":
+        raise SystemExit("Refusing to benchmark against the application database")
+
+    client = MongoClient(os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
+    db = client[args.database]
+
+    seed(db, max(args.sizes))
+
+    print(f"\n{'users':>8} {'legacy s':>10} {'set-based s':>12} {'speedup':>8}")
+    for size in args.sizes:
+        user_ids = [USER_ID_BASE + i for i in range(size)]
+
+        legacy_s = None
+        if args.skip_legacy_above is None or size <= args.skip_legacy_above:
+            start = time.perf_counter()
+            run_legacy(db, user_ids)
+            legacy_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_set_based(db, user_ids)
+        set_based_s = time.perf_counter() - start
+
+        db.data_requests.drop()
+        legacy = f"{legacy_s:>10.2f}" if legacy_s is not None else f"{'-':>10}"
+        speedup = f"{legacy_s / set_based_s:>7.1f}x" if legacy_s is not None else f"{'-':>8}"
+        print(f"{size:>8} {legacy} {set_based_s:>12.2f} {speedup}")
+
+if __name__ == "__main__":
+    main()
@@ -7,24 +7,66 @@ import re
 from datetime import datetime, timedelta
 import hmac
 import base64
-from typing import Optional
+from typing import List, Optional
+from contextvars import ContextVar
 import os
 from pymongo import MongoClient
 from cryptography.fernet import Fernet
 
+from services.pii_store import PIIStore
+from services.org_cache import organization_cache
+from services.org_identity import OrgStampedCollection, stamp_log, stamp_policy
+from services.audit_search import stamp_search_keys
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
 client = MongoClient(MONGO_URL)
 db = client.PedolOne
 users_collection = db.users
+users_collection.create_index("userid")
+
+# Legacy layout: one document per user with an embedded "pii" array.
+# Only read by the migration into pii_store.
 user_pii_collection = db.user_pii
 
+# One document per (user_id, resource)
+user_pii_entries_collection = db.user_pii_entries
+pii_store = PIIStore(user_pii_entries_collection)
+pii_store.ensure_indexes()
+
 # Organization collections
 organizations_collection = db.organizations
-policies_collection = db.policy
-logs_collection = db.logs
+# Inserts are stamped with canonical org ids (see services.org_identity)
+policies_collection = OrgStampedCollection(db.policy, stamp_policy)
+logs_collection = OrgStampedCollection(db.logs, lambda doc: stamp_search_keys(stamp_log(doc)))
+logs_collection.create_index([("target_org_id", 1), ("log_type", 1), ("user_id", 1)])
 alerts_collection = db.alerts
 inter_org_contracts_collection = db.inter_org_contracts
 
+# Users already fetched during the current HTTP request, keyed by userid.
+# Set up per request by the middleware in main.py; None outside a request.
+_request_users: ContextVar[Optional[dict]] = ContextVar("request_users", default=None)
+
+def begin_request_user_cache():
+    """Start an empty user cache for the current request; returns a token for end_request_user_cache"""
+    return _request_users.set({})
+
+def end_request_user_cache(token) -> None:
+    _request_users.reset(token)
+
+def get_request_user(user_id: int) -> Optional[dict]:
+    """
+    Fetch a user by userid, querying the database at most once per request
+
+    Outside a request (e.g. background tasks and websockets) this is a
+    plain lookup.
+    """
+    cache = _request_users.get()
+    if cache is None:
+        return users_collection.find_one({"userid": user_id})
+    if user_id not in cache:
+        cache[user_id] = users_collection.find_one({"userid": user_id})
+    return cache[user_id]
+
 FERNET_KEY = os.getenv("FERNET_KEY")
 if not FERNET_KEY:
     raise Exception("FERNET_KEY not set in environment variables")
@@ -106,6 +148,18 @@ def generate_policy_signature(data: str, secret_key: Optional[str] = None) -> st
     signature = hmac.new(secret_key.encode(), data.encode(), hashlib.sha256).digest()
     return base64.b64encode(signature).decode()
 
+def generate_policy_signatures(payloads: List[str], secret_key: Optional[str] = None) -> List[str]:
+    """Generate HMAC-SHA256 signatures for many policies, keying the HMAC once"""
+    if not secret_key:
+        secret_key = os.getenv("POLICY_SECRET_KEY")
+    keyed = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
+    signatures = []
+    for data in payloads:
+        mac = keyed.copy()
+        mac.update(data.encode())
+        signatures.append(base64.b64encode(mac.digest()).decode())
+    return signatures
+
 def encrypt_pii(plain: str) -> str:
     return fernet.encrypt(plain.encode()).decode()
 
@@ -142,33 +196,143 @@ def seed_organizations():
             organizations_collection.insert_one(org)
             print(f"Seeded organization: {org['org_name']}")
 
+    # Every request resolves organizations, so load them all up front
+    organization_cache.warm()
+
 def get_organization_by_id(org_id: str):
-    """Get organization by ID"""
-    return organizations_collection.find_one({"org_id": org_id})
+    """Get organization by ID (served from organization_cache)"""
+    return organization_cache.get_by_id(org_id)
 
-def get_organization_clients(org_id: str):
-    """Get all users who have shared data with this organization (through policies)"""
-    # Get all policies where this org is the target
-    policies = list(policies_collection.find({"target_org_id": org_id}))
-    
-    # Get unique user IDs from these policies
-    user_ids = list(set([policy["user_id"] for policy in policies]))
-    
-    # Get user details
-    clients = []
-    for user_id in user_ids:
-        user = users_collection.find_one({"userid": user_id})
-        if user:
-            clients.append({
-                "userid": user["userid"],
-                "username": user["username"],
-                "full_name": user["full_name"],
-                "email": user["email"],
-                "phone_number": user["phone_number"],
-                "created_at": user["created_at"]
-            })
-    
-    return clients
+# Sort keys accepted by aggregate_organization_clients, mapped to pipeline fields.
+# Fields under "user." are only known after the users $lookup.
+CLIENT_SORT_FIELDS = {
+    "last_consent_date": "last_consent_date",
+    "active_policies_count": "active_policies_count",
+    "user_id": "_id",
+    "username": "user.username",
+    "full_name": "user.full_name",
+    "created_at": "user.created_at"
+}
+
+CLIENT_USER_FIELDS = ["userid", "username", "full_name", "email", "phone_number", "created_at"]
+
+def aggregate_organization_clients(
+    org_id: str,
+    include_shared_with: bool = False,
+    sort_by: str = "last_consent_date",
+    sort_order: str = "desc",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    include_access_counts: bool = False
+):
+    """
+    Page through the users who have policies with an organization
+
+    Policies are grouped per user and joined with their user record in a
+    single aggregation instead of one users query per client. Data access
+    counts are aggregated from the logs for the returned page only.
+
+    Args:
+        org_id: Organization whose clients to list
+        include_shared_with: Also match policies that name the organization
+            in shared_with rather than target_org_id
+        sort_by: One of CLIENT_SORT_FIELDS
+        sort_order: "asc" or "desc"
+        offset: Number of clients to skip
+        limit: Maximum number of clients to return, all when None
+        include_access_counts: Add total_data_access_count to each client
+
+    Returns:
+        (clients, total_count); each client has a "user" sub-document plus
+        shared_resources, active_policies_count and last_consent_date
+    """
+    # org_ids covers both target_org_id and shared_with
+    match = {"org_ids": org_id} if include_shared_with else {"target_org_id": org_id}
+
+    sort_field = CLIENT_SORT_FIELDS.get(sort_by, "last_consent_date")
+    sort_stage = {"$sort": {sort_field: -1 if sort_order == "desc" else 1, "_id": 1}}
+    window = [{"$skip": offset}] + ([{"$limit": limit}] if limit is not None else [])
+    join = [
+        {"$lookup": {
+            "from": users_collection.name,
+            "localField": "_id",
+            "foreignField": "userid",
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+        {"$project": {
+            "shared_resources": 1,
+            "active_policies_count": 1,
+            "last_consent_date": 1,
+            **{f"user.{field}": 1 for field in CLIENT_USER_FIELDS}
+        }}
+    ]
+    if sort_field.startswith("user."):
+        page = join + [sort_stage] + window
+        # Count only clients whose user record still exists, like the page
+        total = join + [{"$count": "count"}]
+    else:
+        # Sort and cut the page before joining so only its users are looked up
+        page = [sort_stage] + window + join
+        total = [{"$count": "count"}]
+
+    group = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$user_id",
+            "shared_resources": {"$addToSet": "$resource_name"},
+            "active_policies_count": {
+                "$sum": {"$cond": [{"$eq": [{"$ifNull": ["$is_revoked", False]}, True]}, 0, 1]}
+            },
+            "last_consent_date": {"$max": "$created_at"}
+        }}
+    ]
+
+    # The page and the total run as separate pipelines rather than one $facet:
+    # a $facet result is a single document, so an unbounded page of a large
+    # client list would exceed the 16 MB BSON limit
+    clients = list(policies_collection.aggregate(group + page))
+    total_result = next(policies_collection.aggregate(group + total), None)
+    total_count = total_result["count"] if total_result else 0
+
+    if include_access_counts and clients:
+        counts = {
+            doc["_id"]: doc["count"]
+            for doc in logs_collection.aggregate([
+                {"$match": {
+                    "target_org_id": org_id,
+                    "log_type": "data_access",
+                    "user_id": {"$in": [client["_id"] for client in clients]}
+                }},
+                {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+            ])
+        }
+        for client in clients:
+            client["total_data_access_count"] = counts.get(client["_id"], 0)
+
+    return clients, total_count
+
+def get_organization_clients(org_id: str, sort_by: str = "created_at", sort_order: str = "desc", offset: int = 0, limit: Optional[int] = None):
+    """
+    Get users who have shared data with this organization (through policies)
+
+    Returns:
+        (clients, total_count)
+    """
+    clients, total_count = aggregate_organization_clients(
+        org_id, sort_by=sort_by, sort_order=sort_order, offset=offset, limit=limit
+    )
+    return [
+        {
+            "userid": client["user"]["userid"],
+            "username": client["user"]["username"],
+            "full_name": client["user"]["full_name"],
+            "email": client["user"]["email"],
+            "phone_number": client["user"]["phone_number"],
+            "created_at": client["user"]["created_at"]
+        }
+        for client in clients
+    ], total_count
 
 async def enrich_audit_log_with_location(log_data: dict, ip_address: str = None) -> dict:
     """
@@ -4,8 +4,12 @@ import jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
+import time
+import hashlib
+import logging
 from dotenv import load_dotenv
 from models import TokenData
+from services.cache import TTLCache
 
 load_dotenv()
 
@@ -16,6 +20,16 @@ ACCESS_TOKEN_EXPIRE_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
 
 security = HTTPBearer()
 
+logger = logging.getLogger(__name__)
+
+# Tokens that already passed signature and expiry checks, keyed by SHA-256 of
+# the token so raw tokens are not kept in memory
+VERIFIED_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("JWT_CACHE_TTL_SECONDS", "300"))
+verified_token_cache = TTLCache(
+    ttl_seconds=VERIFIED_TOKEN_CACHE_TTL_SECONDS,
+    max_entries=int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -28,35 +42,42 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
 def verify_token(token: str, credentials_exception):
     """Verify JWT token and extract user data"""
+    cache_key = _token_cache_key(token)
+    token_data = verified_token_cache.get(cache_key)
+    if token_data is not None:
+        return token_data
+
     try:
-        print(f"DEBUG: Verifying token: {token[:20]}...")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"DEBUG: Token payload: {payload}")
-        email: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        
-        print(f"DEBUG: Extracted email: {email}, user_id: {user_id}")
-        
-        if email is None or user_id is None:
-            print(f"DEBUG: Missing email or user_id in token")
-            raise credentials_exception
-            
-        token_data = TokenData(email=email, user_id=user_id)
-        print(f"DEBUG: Created TokenData: {token_data}")
-        return token_data
-        
     except jwt.PyJWTError as e:
-        print(f"DEBUG: JWT decode error: {e}")
+        logger.info(f"Rejected JWT: {e}")
         raise credentials_exception
 
+    email: str = payload.get("sub")
+    user_id: int = payload.get("user_id")
+    if email is None or user_id is None:
+        logger.info("Rejected JWT without sub or user_id claim")
+        raise credentials_exception
+
+    token_data = TokenData(email=email, user_id=user_id)
+
+    # Never keep a token cached past its own expiry
+    ttl = VERIFIED_TOKEN_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        verified_token_cache.set(cache_key, token_data, ttl_seconds=ttl)
+
+    logger.debug(f"Verified JWT for user_id {user_id}")
+    return token_data
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current user from JWT token"""
-    print(f"DEBUG: get_current_user called")
-    print(f"DEBUG: credentials: {credentials}")
-    print(f"DEBUG: credentials.credentials: {credentials.credentials[:20] if credentials.credentials else 'None'}...")
-    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -1,10 +1,27 @@
-from fastapi import FastAPI
+import os
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import pii_tokenizer, auth, policy, stockbroker, websocket, organization, bank, insurance, data_requests, inter_org_contracts, audit, geolocation, file_sharing, alerts
-from helpers import seed_organizations
+from routers import pii_tokenizer, auth, policy, stockbroker, websocket, organization, bank, insurance, data_requests, inter_org_contracts, audit, geolocation, file_sharing, alerts, dashboard
+from helpers import seed_organizations, begin_request_user_cache, end_request_user_cache
+from services.file_ingest import RequestSizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
 
 app = FastAPI(title="Secure PII Tokenization API", version="1.0.0")
 
+# Refuse oversized uploads before the multipart body is received
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/file-sharing/upload-file/": file_sharing.MAX_SHARED_FILE_BYTES + MULTIPART_OVERHEAD_BYTES,
+        "/file-sharing/direct-share": file_sharing.MAX_SHARED_FILE_BYTES + MULTIPART_OVERHEAD_BYTES,
+    },
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -12,8 +29,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Has-More", "X-Next-Cursor"],
 )
 
+@app.middleware("http")
+async def request_user_cache(request: Request, call_next):
+    """Give each request its own user cache (see helpers.get_request_user)"""
+    token = begin_request_user_cache()
+    try:
+        return await call_next(request)
+    finally:
+        end_request_user_cache(token)
+
 app.include_router(pii_tokenizer.router)
 app.include_router(auth.router)
 app.include_router(policy.router)
@@ -28,6 +55,7 @@ app.include_router(audit.router)
 app.include_router(geolocation.router)
 app.include_router(file_sharing.router)
 app.include_router(alerts.router)
+app.include_router(dashboard.router)
 
 @app.on_event("startup")
 async def startup_event():
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Backfill prefix search keys on audit logs
+
+Audit log search matches the search_keys stamped on every insert. Logs
+written before that have none and are not found by the default prefix
+search; this sets them. Run migrate_org_ids.py first, since the keys are
+scoped by org_ids. Logs that already have search keys are skipped, so the
+script can be re-run safely while the application is running.
+
+Usage:
+    python migrate_audit_search.py [--batch-size 1000]
+"""
+import argparse
+
+from helpers import db
+from services.audit_search import backfill_search_keys
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill audit log search keys")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"Backfilling search keys on {db.logs.name}...")
+    stats = backfill_search_keys(db.logs, batch_size=args.batch_size)
+    print(f"Scanned {stats['scanned']} logs; updated {stats['updated']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Backfill canonical organization ids on logs, policies and data requests
+
+Documents written before insert-time stamping name organizations by id or
+by name in several fields. This stamps logs with org_ids/related_org_ids,
+policies with org_ids, and fills in target_org_id on data requests that
+only carry target_org_name, so org-scoped queries can use a single indexed
+equality match. Already stamped documents are skipped, so the script can be
+re-run safely while the application is running.
+
+Usage:
+    python migrate_org_ids.py [--batch-size 1000]
+"""
+import argparse
+
+from helpers import db, organization_cache
+from services.org_identity import backfill_logs, backfill_policies, backfill_data_requests
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill canonical organization ids")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    organization_cache.warm()
+
+    for collection, backfill in [
+        (db.logs, backfill_logs),
+        (db.policy, backfill_policies),
+        (db.data_requests, backfill_data_requests),
+    ]:
+        print(f"Backfilling {collection.name}...")
+        stats = backfill(collection, batch_size=args.batch_size)
+        print(f"Scanned {stats['scanned']} documents; updated {stats['updated']}")
+
+if __name__ == "__main__":
+    main()
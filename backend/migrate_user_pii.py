@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migrate user PII from the embedded per-user layout to per-resource documents
+
+Copies every entry of the legacy user_pii documents ({user_id, pii: [...]})
+into user_pii_entries, one document per (user_id, resource). Entries that
+already exist in the new store are left untouched, so the script can be
+re-run safely. The legacy collection is not modified.
+
+Usage:
+    python migrate_user_pii.py [--batch-size 1000]
+"""
+import argparse
+
+from helpers import user_pii_collection, user_pii_entries_collection, pii_store
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate user PII to per-resource documents")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    legacy_users = user_pii_collection.estimated_document_count()
+    print(f"Migrating PII for {legacy_users} users from {user_pii_collection.name} to {user_pii_entries_collection.name}")
+
+    stats = pii_store.migrate_embedded(user_pii_collection, batch_size=args.batch_size)
+    print(f"Scanned {stats['users']} users and {stats['entries']} entries; inserted {stats['inserted']} new entries")
+    print(f"{user_pii_entries_collection.name} now holds {user_pii_entries_collection.count_documents({})} entries")
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,15 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 from jwt_utils import get_current_user, TokenData
 from helpers import (
-    users_collection, 
     organizations_collection, 
     logs_collection,
     alerts_collection,
     get_organization_by_id,
-    get_client_ip
+    get_client_ip,
+    get_request_user
 )
+from services.dashboard_cache import invalidate_org_dashboard
+from services.org_cache import organization_cache
 import httpx
 import asyncio
 from bson import ObjectId
@@ -77,6 +79,7 @@ async def create_alert(
     }
     
     alerts_collection.insert_one(alert_data)
+    invalidate_org_dashboard(org_id, "unread_alerts")
     print(f"🚨 Alert created: {alert_type} for org {org_id}")
 
 async def check_failed_login_attempts(org_id: str, user_id: int, ip_address: str):
@@ -195,7 +198,7 @@ async def check_suspicious_activity(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Check for suspicious activity and create alerts"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -225,7 +228,7 @@ async def get_organization_alerts(
 ):
     """Get alerts for an organization with filtering and pagination"""
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -306,7 +309,7 @@ async def get_unread_alerts_count(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Get count of unread alerts for an organization"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -326,7 +329,7 @@ async def mark_alert_as_read(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Mark an alert as read"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -351,6 +354,7 @@ async def mark_alert_as_read(
                 }
             }
         )
+        invalidate_org_dashboard(alert.get("org_id"), "unread_alerts")
     except Exception as e:
         if "invalid ObjectId" in str(e):
             raise HTTPException(status_code=400, detail="Invalid alert ID format")
@@ -364,7 +368,7 @@ async def delete_alert(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Delete an alert"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -380,6 +384,7 @@ async def delete_alert(
         
         # Delete the alert
         alerts_collection.delete_one({"_id": ObjectId(alert_id)})
+        invalidate_org_dashboard(alert.get("org_id"), "unread_alerts")
         
         return {"message": "Alert deleted successfully"}
         
@@ -394,7 +399,7 @@ async def mark_all_alerts_as_read(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Mark all alerts for an organization as read"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -416,6 +421,8 @@ async def mark_all_alerts_as_read(
         }
     )
     
+    invalidate_org_dashboard(org_id, "unread_alerts")
+    
     return {
         "message": f"Marked {result.modified_count} alerts as read",
         "modified_count": result.modified_count
@@ -432,7 +439,7 @@ async def block_ip_address(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Block an IP address"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -465,6 +472,7 @@ async def block_ip_address(
             {"_id": org_id},
             {"$set": {"blocked_ips": blocked_ips}}
         )
+        organization_cache.invalidate(org_id)
         
         # Create an alert for IP blocking
         await create_alert(
@@ -493,7 +501,7 @@ async def get_blocked_ips(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Get list of blocked IP addresses for the organization"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -513,7 +521,7 @@ async def unblock_ip_address(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Unblock an IP address"""
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -535,6 +543,7 @@ async def unblock_ip_address(
             {"_id": org_id},
             {"$set": {"blocked_ips": blocked_ips}}
         )
+        organization_cache.invalidate(org_id)
         
         print(f"✅ IP {ip_address} unblocked for org {org_id}")
     
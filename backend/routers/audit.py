@@ -1,29 +1,54 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta
 from typing import List, Optional
-from helpers import logs_collection
+from helpers import logs_collection, get_client_ip, get_request_user
 from jwt_utils import get_current_user, TokenData
-import re
+from services.audit_archive import audit_archive_service, ARCHIVE_SCOPE_FIELDS
+from services.audit_search import ensure_search_index, build_search_filter, SEARCH_KEYS_FIELD
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import zlib
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/audit", tags=["Audit Logs"])
 
-@router.get("/org/{org_id}")
-async def get_organization_audit_logs(
-    org_id: str,
-    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    log_type: Optional[str] = Query(None, description="Filter by log type"),
-    data_source: Optional[str] = Query(None, description="Filter by data source"),
-    search: Optional[str] = Query(None, description="Search term for fintech name, resource, purpose, or IP"),
-    limit: Optional[int] = Query(100, description="Maximum number of logs to return"),
-    offset: Optional[int] = Query(0, description="Number of logs to skip"),
-    current_user: TokenData = Depends(get_current_user)
-):
-    """Get audit logs for an organization with filtering capabilities"""
-    from helpers import get_organization_by_id, users_collection
+# Archival selects aged logs by created_at
+logs_collection.create_index([("created_at", 1)])
+logs_collection.create_index([("org_ids", 1), ("created_at", -1)])
+ensure_search_index(logs_collection)
+
+AUDIT_ARCHIVE_INTERVAL_HOURS = float(os.getenv("AUDIT_ARCHIVE_INTERVAL_HOURS", "24"))
+
+async def archive_audit_logs_periodically():
+    """Background task to move aged audit logs from the hot tier into archive files"""
+    while True:
+        try:
+            result = await asyncio.to_thread(audit_archive_service.archive_expired_logs, logs_collection)
+            if result["archived_records"] > 0:
+                logger.info(f"Archived {result['archived_records']} audit log(s) older than {result['cutoff']}")
+        except Exception:
+            logger.exception("Error in audit archive task")
+
+        await asyncio.sleep(AUDIT_ARCHIVE_INTERVAL_HOURS * 3600)
+
+@router.on_event("startup")
+async def startup_event():
+    """Start audit log archival task on startup"""
+    if AUDIT_ARCHIVE_INTERVAL_HOURS > 0:
+        asyncio.create_task(archive_audit_logs_periodically())
+
+def verify_audit_access(current_user: TokenData, org_id: str) -> str:
+    """Verify the current user may read an organization's audit logs and return the org name"""
+    from helpers import get_organization_by_id
     
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -32,21 +57,29 @@ async def get_organization_audit_logs(
         raise HTTPException(status_code=403, detail="Access denied to this organization's audit logs")
     
     org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
+    return org["org_name"] if org else org_id
 
-    # Build query filter
-    query_filter = {
-        "$or": [
-            {"fintech_name": org_id},
-            {"fintech_name": org_name},
-            {"source_org_id": org_id},
-            {"source_org_id": org_name},
-            {"target_org_id": org_id},
-            {"target_org_id": org_name},
-        ]
-    }
+def build_audit_log_filter(
+    org_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    log_type: Optional[str] = None,
+    data_source: Optional[str] = None,
+    search: Optional[str] = None,
+    search_mode: str = "prefix"
+) -> tuple[dict, Optional[datetime], Optional[datetime]]:
+    """
+    Build the audit log query shared by the list and export endpoints
+
+    Returns:
+        Tuple of (query filter, start datetime, exclusive end datetime)
+    """
+    # org_ids holds the canonical org_id of every organization the log is about
+    query_filter = {"org_ids": org_id}
 
     # Add date range filter
+    start_datetime = None
+    end_datetime = None
     if start_date or end_date:
         date_filter = {}
         if start_date:
@@ -73,30 +106,81 @@ async def get_organization_audit_logs(
     if data_source:
         query_filter["data_source"] = data_source
 
-    # Add search filter
+    # Add search filter, evaluated within the org scope above
     if search:
-        search_regex = re.compile(search, re.IGNORECASE)
-        query_filter["$or"] = [
-            {"fintech_name": search_regex},
-            {"resource_name": search_regex},
-            {"purpose": search_regex},
-            {"ip_address": search_regex},
-            {"region": search_regex},
-            {"city": search_regex},
-            {"country": search_regex}
-        ]
+        query_filter.update(build_search_filter(search, search_mode, org_id))
+
+    return query_filter, start_datetime, end_datetime
+
+def build_archive_log_filter(query_filter: dict, org_id: str, org_name: str) -> dict:
+    """
+    Adapt an audit log filter to the archive tier
+
+    Archived logs can predate org_ids and search keys, so they are matched
+    on the fields naming the organization, by either its id or its name,
+    and searches rely on the substring check alone.
+    """
+    archive_filter = {key: value for key, value in query_filter.items() if key not in ("org_ids", SEARCH_KEYS_FIELD)}
+    archive_filter["$or"] = [
+        {field: org_key}
+        for field in ARCHIVE_SCOPE_FIELDS
+        for org_key in (org_id, org_name)
+    ]
+    return archive_filter
+
+@router.get("/org/{org_id}")
+async def get_organization_audit_logs(
+    org_id: str,
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    log_type: Optional[str] = Query(None, description="Filter by log type"),
+    data_source: Optional[str] = Query(None, description="Filter by data source"),
+    search: Optional[str] = Query(None, description="Search term for fintech name, resource, purpose, IP or location"),
+    search_mode: str = Query("prefix", pattern="^(prefix|partial|word)$", description="prefix: indexed case-insensitive match from the start of a word (\"bank\" finds \"BankABC\"); partial: any substring, unindexed (\"abc\" also finds \"BankABC\"); word: whole words or phrases via the text index"),
+    limit: Optional[int] = Query(100, description="Maximum number of logs to return"),
+    offset: Optional[int] = Query(0, description="Number of logs to skip"),
+    include_archive: bool = Query(False, description="Also search logs moved to the archive tier"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Get audit logs for an organization with filtering capabilities"""
+    org_name = verify_audit_access(current_user, org_id)
+
+    query_filter, start_datetime, end_datetime = build_audit_log_filter(
+        org_id, start_date, end_date, log_type, data_source, search, search_mode
+    )
 
     # Execute query with pagination
     logs = list(logs_collection.find(query_filter).sort("created_at", -1).skip(offset).limit(limit))
 
     # Get total count for pagination
     total_count = logs_collection.count_documents(query_filter)
+    hot_count = len(logs)
+
+    # Archived logs are all older than the hot tier, so they continue the
+    # newest-first ordering once the hot results are exhausted
+    archived_count = 0
+    if include_archive:
+        # Reads archive files, so keep it off the event loop. Without extra
+        # filters, partitions outside the page are counted from the manifest.
+        archived_logs, archived_count = await asyncio.to_thread(
+            audit_archive_service.query_archive,
+            build_archive_log_filter(query_filter, org_id, org_name),
+            org_keys=[org_id, org_name],
+            start=start_datetime,
+            end=end_datetime,
+            skip=max(0, offset - total_count),
+            limit=limit - len(logs),
+            counted_org_id=None if (log_type or data_source or search) else org_id
+        )
+        logs.extend(archived_logs)
+        total_count += archived_count
 
     # Format response
     formatted_logs = []
-    for log in logs:
+    for index, log in enumerate(logs):
         formatted_logs.append({
             "id": str(log.get("_id")),
+            "tier": "hot" if index < hot_count else "archive",
             "user_id": log.get("user_id"),
             "fintech_name": log.get("fintech_name"),
             "resource_name": log.get("resource_name"),
@@ -121,9 +205,182 @@ async def get_organization_audit_logs(
         "total_count": total_count,
         "limit": limit,
         "offset": offset,
-        "has_more": total_count > offset + limit
+        "has_more": total_count > offset + limit,
+        "archived_count": archived_count
     }
 
+@router.get("/org/{org_id}/archive")
+async def get_audit_archive_partitions(
+    org_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """List archived audit log partitions that contain logs for an organization"""
+    org_name = verify_audit_access(current_user, org_id)
+
+    partitions = audit_archive_service.get_partitions_for_org([org_id, org_name])
+
+    return {
+        "hot_retention_days": audit_archive_service.hot_retention_days,
+        "hot_tier_cutoff": audit_archive_service.get_cutoff().isoformat(),
+        "partitions": partitions,
+        "archived_records": sum(p["record_count"] for p in partitions)
+    }
+
+# Fields written by the streaming export, in column order
+EXPORT_FIELDS = [
+    "id", "user_id", "fintech_name", "resource_name", "purpose", "log_type",
+    "ip_address", "region", "country", "city", "data_source", "created_at"
+]
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+EXPORT_BATCH_SIZE = int(os.getenv("AUDIT_EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "columnar": "application/x-ndjson"
+}
+
+def format_export_row(log: dict) -> dict:
+    """Flatten a log document into the export column layout"""
+    purpose = log.get("purpose")
+    return {
+        "id": str(log.get("_id")),
+        "user_id": log.get("user_id"),
+        "fintech_name": log.get("fintech_name"),
+        "resource_name": log.get("resource_name"),
+        "purpose": ", ".join(purpose) if isinstance(purpose, list) else purpose,
+        "log_type": log.get("log_type"),
+        "ip_address": log.get("ip_address"),
+        "region": log.get("region", "Unknown Location"),
+        "country": log.get("country", ""),
+        "city": log.get("city", ""),
+        "data_source": log.get("data_source"),
+        "created_at": log.get("created_at").isoformat() if log.get("created_at") else None
+    }
+
+def iter_export_chunks(rows, export_format: str):
+    """
+    Serialize export rows into text chunks of roughly EXPORT_CHUNK_BYTES
+
+    The columnar format emits one JSON object per batch of EXPORT_BATCH_SIZE
+    rows, holding an array per column.
+    """
+    buffer = io.StringIO()
+
+    if export_format == "columnar":
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield json.dumps({"columns": {f: [r[f] for r in batch] for f in EXPORT_FIELDS}, "row_count": len(batch)}) + "\n"
+                batch = []
+        if batch:
+            yield json.dumps({"columns": {f: [r[f] for r in batch] for f in EXPORT_FIELDS}, "row_count": len(batch)}) + "\n"
+        return
+
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+
+    for row in rows:
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + "\n")
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    """Compress a stream of text chunks into a gzip byte stream"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@router.get("/org/{org_id}/export")
+async def export_organization_audit_logs(
+    org_id: str,
+    request: Request,
+    export_format: str = Query("ndjson", alias="format", description="Export format: ndjson, csv or columnar"),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    log_type: Optional[str] = Query(None, description="Filter by log type"),
+    data_source: Optional[str] = Query(None, description="Filter by data source"),
+    search: Optional[str] = Query(None, description="Search term for fintech name, resource, purpose, IP or location"),
+    search_mode: str = Query("prefix", pattern="^(prefix|partial|word)$", description="prefix: indexed case-insensitive match from the start of a word (\"bank\" finds \"BankABC\"); partial: any substring, unindexed (\"abc\" also finds \"BankABC\"); word: whole words or phrases via the text index"),
+    include_archive: bool = Query(False, description="Also export logs moved to the archive tier"),
+    compress: bool = Query(False, alias="gzip", description="Gzip the export as it streams"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Stream an organization's full audit history with the same filters as the list endpoint"""
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format. Use ndjson, csv or columnar")
+
+    org_name = verify_audit_access(current_user, org_id)
+
+    query_filter, start_datetime, end_datetime = build_audit_log_filter(
+        org_id, start_date, end_date, log_type, data_source, search, search_mode
+    )
+
+    # Record the export itself in the audit trail up front, so aborted
+    # exports are audited too, but keep that entry out of the export
+    export_log = logs_collection.insert_one({
+        "user_id": current_user.user_id,
+        "fintech_name": org_name,
+        "resource_name": "audit_log_export",
+        "purpose": "Audit log export",
+        "log_type": "audit_log_export",
+        "ip_address": get_client_ip(request),
+        "data_source": "organization",
+        "created_at": datetime.utcnow(),
+        "organization_id": org_id,
+        "export_format": export_format
+    })
+
+    def iter_rows():
+        # Hot tier first (newest first), then the older archive tier
+        cursor = logs_collection.find({**query_filter, "_id": {"$ne": export_log.inserted_id}}, EXPORT_PROJECTION).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+        try:
+            for log in cursor:
+                yield format_export_row(log)
+        finally:
+            cursor.close()
+
+        if include_archive:
+            for log in audit_archive_service.iter_archived_logs(
+                build_archive_log_filter(query_filter, org_id, org_name), org_keys=[org_id, org_name], start=start_datetime, end=end_datetime
+            ):
+                yield format_export_row(log)
+
+    chunks = iter_export_chunks(iter_rows(), export_format)
+    extension = "ndjson" if export_format == "columnar" else export_format
+    filename = f"audit_logs_{org_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Content-Type-Options": "nosniff",
+            "Cache-Control": "no-store"
+        }
+    )
+
 @router.get("/org/{org_id}/summary")
 async def get_audit_summary(
     org_id: str,
@@ -132,31 +389,17 @@ async def get_audit_summary(
     current_user: TokenData = Depends(get_current_user)
 ):
     """Get audit summary statistics for an organization"""
-    from helpers import get_organization_by_id, users_collection
-    
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
     # Check if user is from the requested organization
     if user.get("user_type") == "organization" and user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied to this organization's audit logs")
-    
-    org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
 
     # Build query filter
-    query_filter = {
-        "$or": [
-            {"fintech_name": org_id},
-            {"fintech_name": org_name},
-            {"source_org_id": org_id},
-            {"source_org_id": org_name},
-            {"target_org_id": org_id},
-            {"target_org_id": org_name},
-        ]
-    }
+    query_filter = {"org_ids": org_id}
 
     # Add date range filter
     if start_date or end_date:
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends, Body, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import datetime, timedelta
-import bcrypt
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import logging
 from typing import Optional
 import asyncio
 from dotenv import load_dotenv
@@ -20,14 +20,17 @@ from models import (
     UserPIIEntry, UserPIIMap, PIIInput
 )
 from jwt_utils import create_access_token, get_current_user, get_token_expiry_time
-from helpers import users_collection, user_pii_collection, encrypt_pii, decrypt_pii, validate_password_strength, logs_collection, get_client_ip
+from helpers import users_collection, policies_collection, pii_store, encrypt_pii, decrypt_pii, validate_password_strength, logs_collection, get_client_ip, get_request_user
 from routers.pii_tokenizer import tokenize_aadhaar, tokenize_pan
+from services.password_hasher import password_hasher, PasswordHasherBusy
+from services.org_cache import organization_cache
 
 # Load environment variables
 load_dotenv()
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
 
 # Email configuration
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -47,14 +50,19 @@ def get_next_user_id() -> int:
         return last_user["userid"] + 1
     return 1
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+async def hash_password(password: str) -> str:
+    """Hash password using bcrypt on the password hashing pool"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again shortly", headers={"Retry-After": "1"})
 
-def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    """Verify password against hash on the password hashing pool"""
+    try:
+        return await password_hasher.verify(password, hashed)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please try again shortly", headers={"Retry-After": "1"})
 
 def generate_otp() -> str:
     """Generate 6-digit OTP"""
@@ -261,7 +269,7 @@ async def register_user(user_data: UserRegistration):
         raise HTTPException(status_code=400, detail=message)
     
     # Hash password
-    password_hash = hash_password(user_data.password)
+    password_hash = await hash_password(user_data.password)
     
     # Generate verification token
     verification_token = generate_verification_token()
@@ -318,7 +326,10 @@ async def register_organization(user_data: UserRegistration):
     """Register a new organization"""
     user_data.user_type = "organization"
     print(f"🔍 DEBUG: Organization registration - organization_id: {user_data.organization_id}")
-    return await register_user(user_data)
+    response = await register_user(user_data)
+    # The organization may have been created or updated alongside its admin
+    organization_cache.invalidate(user_data.organization_id)
+    return response
 
 @router.get("/verify-email")
 async def verify_email_link(token: str, email: str):
@@ -397,7 +408,7 @@ async def login_user(login_data: UserLogin, request: Request):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Verify password
-    if not verify_password(login_data.password, user["password_hash"]):
+    if not await verify_password(login_data.password, user["password_hash"]):
         # Log failed login attempt
         await log_failed_login_attempt(login_data.email, None, request)
         raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -590,17 +601,12 @@ async def get_user(user_id: int, current_user: TokenData = Depends(get_current_u
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: TokenData = Depends(get_current_user)):
     """Get current user information from JWT token"""
-    print(f"🔍 DEBUG: /auth/me called for user: {current_user.email} (ID: {current_user.user_id})")
+    logger.debug(f"/auth/me called for user_id {current_user.user_id}")
     try:
-        user = users_collection.find_one({"userid": current_user.user_id})
+        user = get_request_user(current_user.user_id)
         if not user:
-            print(f"❌ DEBUG: User not found in database for ID: {current_user.user_id}")
             raise HTTPException(status_code=404, detail="User not found")
 
-        print(f"✅ DEBUG: User found in database")
-        print(f"🔍 DEBUG: User document keys: {list(user.keys())}")
-        print(f"🔍 DEBUG: User document: {user}")
-
         # Handle missing username field - use email or full_name as fallback
         username = user.get("username") or user.get("email").split("@")[0] or "user"
 
@@ -616,12 +622,10 @@ async def get_current_user_info(current_user: TokenData = Depends(get_current_us
             created_at=user["created_at"]
         )
 
-        print(f"🎉 DEBUG: Successfully created UserResponse for: {username}")
         return user_response
 
     except Exception as e:
-        print(f"❌ DEBUG: Error in /auth/me: {str(e)}")
-        print(f"❌ DEBUG: Error type: {type(e)}")
+        logger.exception(f"Error in /auth/me for user_id {current_user.user_id}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.post("/refresh-token", response_model=Token)
@@ -629,7 +633,7 @@ async def refresh_token(current_user: TokenData = Depends(get_current_user)):
     """Refresh JWT token"""
     
     # Verify user still exists and is verified
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -652,7 +656,6 @@ async def refresh_token(current_user: TokenData = Depends(get_current_user)):
 @router.post("/user-pii/add")
 async def add_user_pii(user_id: int, resource: str, pii_value: str):
     """Add or update a user's PII (encrypt, tokenize, store)"""
-    from datetime import datetime
     from routers.pii_tokenizer import (
         tokenize_aadhaar, tokenize_pan, tokenize_account, tokenize_ifsc,
         tokenize_creditcard, tokenize_debitcard, tokenize_gst,
@@ -685,49 +688,72 @@ async def add_user_pii(user_id: int, resource: str, pii_value: str):
     
     # Encrypt
     encrypted = encrypt_pii(pii_value)
-    entry = {
-        "resource": resource,
-        "original": encrypted,
-        "token": token,
-        "created_at": datetime.utcnow()
-    }
-    
-    # Upsert - first ensure user document exists
-    user_pii_collection.update_one(
-        {"user_id": user_id},
-        {"$setOnInsert": {"user_id": user_id, "pii": []}},
-        upsert=True
-    )
-    
-    # Then update the specific PII entry
-    user_pii_collection.update_one(
-        {"user_id": user_id, "pii.resource": resource},
-        {"$set": {"pii.$": entry}},
-        upsert=False
-    )
     
-    # If no existing entry was found, add new one
-    user_pii_collection.update_one(
-        {"user_id": user_id, "pii.resource": {"$ne": resource}},
-        {"$push": {"pii": entry}},
-        upsert=False
-    )
+    # Upsert the (user, resource) entry in one atomic write
+    pii_store.upsert(user_id, resource, encrypted, token)
     
     return {"status": "success", "resource": resource, "token": token}
 
 @router.get("/user-pii/{user_id}")
 async def get_user_pii(user_id: int):
     """Fetch all PII for a user (admin/internal use)"""
-    doc = user_pii_collection.find_one({"user_id": user_id})
-    if not doc:
+    entries = pii_store.get_entries(user_id)
+    if not entries:
         return {"pii": []}
     # Decrypt originals for internal use
     pii = [
         {**entry, "original": decrypt_pii(entry["original"])}
-        for entry in doc.get("pii", [])
+        for entry in entries
     ]
     return {"user_id": user_id, "pii": pii}
 
+@router.get("/user-pii/lookup/{resource}/{token}")
+async def lookup_pii_by_token(resource: str, token: str, current_user: TokenData = Depends(get_current_user)):
+    """
+    Resolve a PII token to its owners and encrypted records (organization admins only)
+
+    Only users who share this resource with the caller's organization
+    through a policy that has not been revoked are returned.
+    """
+    user = users_collection.find_one({"userid": current_user.user_id}, {"user_type": 1, "organization_id": 1})
+    if not user or user.get("user_type") != "organization" or not user.get("organization_id"):
+        raise HTTPException(status_code=403, detail="Only organization admins can look up PII tokens")
+    
+    resource = resource.strip().lower()
+    entries = pii_store.find_by_token(token, resource)
+    if entries:
+        shared_user_ids = set(policies_collection.distinct("user_id", {
+            "user_id": {"$in": [entry["user_id"] for entry in entries]},
+            "org_ids": user["organization_id"],
+            "resource_name": resource,
+            "is_revoked": {"$ne": True}
+        }))
+        entries = [entry for entry in entries if entry["user_id"] in shared_user_ids]
+    if not entries:
+        raise HTTPException(status_code=404, detail="Token not found")
+    
+    return {
+        "resource": resource,
+        "token": token,
+        "matches": [
+            {
+                "user_id": entry["user_id"],
+                "original": entry["original"],
+                "created_at": entry["created_at"].isoformat() if entry.get("created_at") else None
+            }
+            for entry in entries
+        ]
+    }
+
+@router.get("/password-hasher/metrics")
+async def get_password_hasher_metrics(current_user: TokenData = Depends(get_current_user)):
+    """Queue depth and timings of the password hashing pool (organization admins only)"""
+    user = users_collection.find_one({"userid": current_user.user_id}, {"user_type": 1})
+    if not user or user.get("user_type") != "organization":
+        raise HTTPException(status_code=403, detail="Only organization admins can view password hashing metrics")
+    
+    return password_hasher.metrics()
+
 class EmailCheckRequest(BaseModel):
     email: EmailStr
 
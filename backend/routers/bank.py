@@ -6,15 +6,16 @@ from fastapi.encoders import jsonable_encoder
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from models import PIIInput, UserInputPII
-from helpers import users_collection, user_pii_collection, generate_policy_signature, encrypt_pii, decrypt_pii
+from helpers import users_collection, pii_store, generate_policy_signature, encrypt_pii, decrypt_pii
 from routers.pii_tokenizer import (
     tokenize_aadhaar, tokenize_pan, tokenize_account, tokenize_ifsc,
     tokenize_creditcard, tokenize_debitcard, tokenize_gst,
     tokenize_itform16, tokenize_upi, tokenize_passport, tokenize_dl
 )
 from routers.auth import generate_otp, send_email_otp
-from routers.policy import create_policy_internal
+from routers.policy import create_policies_batch
 from routers.websocket import send_user_update
+from services.session_store import create_session_store
 import uuid
 from pydantic import BaseModel, EmailStr
 
@@ -44,8 +45,8 @@ TOKENIZER_MAP = {
     "drivinglicense": tokenize_dl
 }
 
-# In-memory session store (for demo; use Redis/DB in prod)
-sessions = {}
+# OTP sessions expire automatically; see OTP_SESSION_BACKEND
+sessions = create_session_store("bank")
 
 class BankConsentRequest(BaseModel):
     email: EmailStr
@@ -85,19 +86,18 @@ def bank_consent(data: BankConsentRequest, background_tasks: BackgroundTasks):
     if not pii_inputs:
         raise HTTPException(status_code=400, detail="No PII provided")
     
-    # Match all PII
-    pii_doc = user_pii_collection.find_one({"user_id": user_id})
-    if not pii_doc:
-        raise HTTPException(status_code=404, detail="No PII records found for this user")
-    
-    matched_pii = []
+    # Match all PII: tokenize every submitted value, then match them against the user's entries in one query
+    submitted_tokens = []
     for resource, value in pii_inputs:
         tokenizer = TOKENIZER_MAP.get(resource)
         if not tokenizer:
             raise HTTPException(status_code=400, detail=f"Unsupported resource type: {resource}")
-        
-        token = tokenizer(PIIInput(pii_value=value))["token"]
-        entry = next((entry for entry in pii_doc.get("pii", []) if entry["resource"] == resource and entry["token"] == token), None)
+        submitted_tokens.append((resource, tokenizer(PIIInput(pii_value=value))["token"]))
+    
+    token_matches = pii_store.find_by_tokens(user_id, submitted_tokens)
+    matched_pii = []
+    for resource, token in submitted_tokens:
+        entry = token_matches.get((resource, token))
         if not entry:
             raise HTTPException(status_code=404, detail=f"{resource} does not match records")
         matched_pii.append({"resource": resource, "token": token, "original": entry["original"]})
@@ -107,14 +107,14 @@ def bank_consent(data: BankConsentRequest, background_tasks: BackgroundTasks):
     session_id = str(uuid.uuid4())
     
     # Store session with expiry
-    sessions[session_id] = {
+    sessions.set(session_id, {
         "user_id": user_id,
         "pii": matched_pii,
         "email": data.email,
         "otp": otp,
         "created_at": datetime.utcnow(),
         "expires_at": datetime.utcnow() + timedelta(minutes=10)
-    }
+    })
     
     # Send OTP
     background_tasks.add_task(send_email_otp, data.email, otp)
@@ -128,35 +128,39 @@ async def bank_verify_otp(data: BankVerifyOtpRequest, request: Request):
         raise HTTPException(status_code=404, detail="Session not found or expired")
     
     if datetime.utcnow() > session["expires_at"]:
-        del sessions[data.session_id]
+        sessions.delete(data.session_id)
         raise HTTPException(status_code=400, detail="Session expired. Please try again.")
     
-    if session["otp"] != data.otp:
+    if not sessions.verify_otp(session, data.otp):
         raise HTTPException(status_code=400, detail="Invalid OTP")
     
-    # Create policies for matched PII
-    created_policies = []
+    # Get client IP
+    client_ip = "unknown"
+    if request:
+        forwarded_for = request.headers.get("X-Forwarded-For")
+        if forwarded_for:
+            client_ip = forwarded_for.split(",")[0].strip()
+        elif request.headers.get("X-Real-IP"):
+            client_ip = request.headers.get("X-Real-IP")
+        elif request.client:
+            client_ip = request.client.host
+    
+    # Create policies for matched PII in one batch
+    policy_items = []
     for pii in session["pii"]:
         try:
             pii_value = decrypt_pii(pii["original"])
         except Exception:
             pii_value = pii["original"]
         
-        # Get client IP
-        client_ip = "unknown"
-        if request:
-            forwarded_for = request.headers.get("X-Forwarded-For")
-            if forwarded_for:
-                client_ip = forwarded_for.split(",")[0].strip()
-            elif request.headers.get("X-Real-IP"):
-                client_ip = request.headers.get("X-Real-IP")
-            elif request.client:
-                client_ip = request.client.host
-        
-        policy_input = UserInputPII(pii_value=pii_value, resource=pii["resource"])
-        policy_result = create_policy_internal(policy_input, user_id=session["user_id"], ip_address=client_ip, contract_override=contract)
-        created_policies.append(policy_result)
-        
+        policy_items.append({
+            "data": UserInputPII(pii_value=pii_value, resource=pii["resource"]),
+            "user_id": session["user_id"],
+            "contract_override": contract
+        })
+    created_policies = create_policies_batch(policy_items, ip_address=client_ip)
+    
+    for policy_result in created_policies:
         # Send WebSocket update for each created policy
         await send_user_update(
             user_id=str(session["user_id"]),
@@ -165,7 +169,7 @@ async def bank_verify_otp(data: BankVerifyOtpRequest, request: Request):
         )
     
     # Cleanup session
-    del sessions[data.session_id]
+    sessions.delete(data.session_id)
     
     return jsonable_encoder({
         "message": "Consent and policy creation successful",
@@ -188,6 +192,7 @@ def bank_resend_otp(data: BankResendOtpRequest, background_tasks: BackgroundTask
     session["otp"] = new_otp
     session["created_at"] = datetime.utcnow()
     session["expires_at"] = datetime.utcnow() + timedelta(minutes=10)
+    sessions.set(data.session_id, session)
     
     # Send new OTP
     background_tasks.add_task(send_email_otp, data.email, new_otp)
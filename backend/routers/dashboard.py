@@ -0,0 +1,97 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from datetime import datetime
+import asyncio
+
+from helpers import alerts_collection, get_organization_by_id, get_request_user
+from jwt_utils import get_current_user, TokenData
+from routers.policy import fetch_org_access_logs, fetch_org_dashboard_data_categories, compute_compliance_metrics
+from routers.websocket import format_dashboard_audit_log, find_dashboard_audit_logs
+from services.dashboard_cache import dashboard_snapshot_cache, SECTION_TTLS, invalidate_org_dashboard
+
+router = APIRouter(prefix="/dashboard", tags=["Organization Dashboard"])
+
+def fetch_dashboard_audit_logs(org_id: str, limit: int) -> list:
+    """Fetch the most recent dashboard audit logs for an organization"""
+    return [format_dashboard_audit_log(log) for log in find_dashboard_audit_logs(org_id, limit)]
+
+def count_unread_alerts(org_id: str) -> dict:
+    return {"unread_count": alerts_collection.count_documents({"org_id": org_id, "is_read": False})}
+
+@router.get("/org/{org_id}/snapshot")
+async def get_org_dashboard_snapshot(
+    org_id: str,
+    logs_limit: int = Query(50, ge=1, le=500, description="Number of recent logs per activity feed"),
+    refresh: bool = Query(False, description="Bypass cached sections"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get everything the organization dashboard needs in one call
+
+    Combines recent access logs, dashboard audit logs, data categories,
+    compliance metrics and the unread alert count. The organization is
+    resolved once, uncached sections are queried concurrently, and each
+    section is cached briefly per organization.
+    """
+    user = get_request_user(current_user.user_id)
+    if not user:
+        raise HTTPException(status_code=403, detail="User not found")
+
+    if user.get("user_type") == "organization" and user.get("organization_id") != org_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    org = get_organization_by_id(org_id)
+    if not org:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    org_name = org["org_name"]
+
+    loaders = {
+        "access_logs": lambda: fetch_org_access_logs(org_id, logs_limit),
+        "audit_logs": lambda: fetch_dashboard_audit_logs(org_id, logs_limit),
+        "data_categories": lambda: fetch_org_dashboard_data_categories(org)["data_categories"],
+        "compliance": lambda: compute_compliance_metrics(org_id),
+        "unread_alerts": lambda: count_unread_alerts(org_id)["unread_count"],
+    }
+
+    # Activity feeds are cached per limit so differently sized views don't collide
+    def cache_key(section: str):
+        if section in ("access_logs", "audit_logs"):
+            return (org_id, section, logs_limit)
+        return (org_id, section)
+
+    snapshot = {}
+    missing = []
+    for section in loaders:
+        cached = None if refresh else dashboard_snapshot_cache.get(cache_key(section))
+        if cached is not None:
+            snapshot[section] = cached
+        else:
+            missing.append(section)
+
+    if missing:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(loaders[section]) for section in missing)
+        )
+        for section, result in zip(missing, results):
+            dashboard_snapshot_cache.set(cache_key(section), result, SECTION_TTLS[section])
+            snapshot[section] = result
+
+    return {
+        "org_id": org_id,
+        "org_name": org_name,
+        "generated_at": datetime.utcnow().isoformat(),
+        "cached_sections": [section for section in loaders if section not in missing],
+        **snapshot
+    }
+
+@router.post("/org/{org_id}/snapshot/invalidate")
+async def invalidate_org_dashboard_snapshot(
+    org_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Drop the cached dashboard snapshot for an organization"""
+    user = get_request_user(current_user.user_id)
+    if not user or user.get("organization_id") != org_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    invalidate_org_dashboard(org_id)
+    return {"message": "Dashboard snapshot invalidated"}
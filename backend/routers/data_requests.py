@@ -4,7 +4,7 @@ import uuid
 import csv
 import hashlib
 import hmac
-from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, Form, BackgroundTasks
 from datetime import datetime, timedelta
 from fastapi.encoders import jsonable_encoder
 from pymongo import MongoClient
@@ -15,14 +15,21 @@ from fastapi.responses import FileResponse
 import io
 from cryptography.fernet import Fernet
 import base64
+import logging
 
 from models import (
     DataAccessRequest, CreateDataRequest, RespondToRequest,
     InterOrgContract, CreateInterOrgContract
 )
-from helpers import users_collection, user_pii_collection, policies_collection, logs_collection
+from helpers import users_collection, pii_store, policies_collection, logs_collection, get_client_ip, get_request_user
 from jwt_utils import get_current_user, TokenData
 from routers.websocket import send_user_update
+from services.bulk_requests import resolve_bulk_request_users, insert_in_chunks
+from services.contract_index import contract_permission_index
+from services.org_cache import organization_cache
+from services.org_identity import OrgStampedCollection, stamp_data_request
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -33,14 +40,22 @@ client = MongoClient(MONGO_URL)
 db = client.get_database("PedolOne")
 
 # Collections
-data_requests_collection = db.get_collection("data_requests")
+# Inserts resolve target_org_id from target_org_name (see services.org_identity)
+data_requests_collection = OrgStampedCollection(db.get_collection("data_requests"), stamp_data_request)
 inter_org_contracts_collection = db.get_collection("inter_org_contracts")
-organizations_collection = db.get_collection("organizations")
 
 # Create indexes
 data_requests_collection.create_index("expires_at", expireAfterSeconds=0)
 data_requests_collection.create_index([("target_user_id", 1), ("status", 1)])
 data_requests_collection.create_index([("requester_org_id", 1), ("status", 1)])
+data_requests_collection.create_index("target_org_id")
+data_requests_collection.create_index([("bulk_request_id", 1), ("status", 1)])
+data_requests_collection.create_index("response_claim", sparse=True)
+
+# Policies created per insert_many when approving bulk requests
+BULK_POLICY_BATCH_SIZE = int(os.getenv("BULK_POLICY_BATCH_SIZE", "500"))
+# Data requests written per insert_many when creating bulk requests
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "1000"))
 
 # Add new models for bulk requests
 class CreateBulkDataRequest(BaseModel):
@@ -51,6 +66,13 @@ class CreateBulkDataRequest(BaseModel):
     retention_window: str = "30 days"
     request_message: Optional[str] = None
 
+class BulkRespondRequest(BaseModel):
+    status: str  # "approved" or "rejected"
+    response_message: Optional[str] = None
+    include_request_ids: Optional[List[str]] = None  # Only respond to these requests
+    exclude_request_ids: Optional[List[str]] = None  # Leave these requests pending
+    generate_export: bool = True  # Queue the CSV export after approval
+
 class CSVFileMetadata(BaseModel):
     file_id: str
     original_filename: str
@@ -79,8 +101,8 @@ def decrypt_file_content(encrypted_content: str) -> bytes:
     return cipher_suite.decrypt(encrypted_bytes)
 
 def get_organization_by_id(org_id: str):
-    """Get organization by ID"""
-    return organizations_collection.find_one({"org_id": org_id})
+    """Get organization by ID (served from organization_cache)"""
+    return organization_cache.get_by_id(org_id)
 
 def get_user_by_email(email: str):
     """Get user by email"""
@@ -153,7 +175,7 @@ async def send_data_request(
     """Send a data access request to a user"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can send data requests")
     
@@ -192,72 +214,31 @@ async def send_data_request(
     
     # If we have a target_org_name but no target_org_id, try to find the org by name
     if target_org_name != "Unknown Organization" and not target_org_id:
-        org_by_name = organizations_collection.find_one({"org_name": target_org_name})
-        if org_by_name:
-            target_org_id = org_by_name["org_id"]
+        target_org_id = organization_cache.get_id_by_name(target_org_name)
     
     # Check if there's an active contract between the organizations
     if target_org_id:
         # Get all active contracts between the organizations
-        active_contracts = list(inter_org_contracts_collection.find({
-            "$or": [
-                {"source_org_id": org["org_id"], "target_org_id": target_org_id},
-                {"source_org_id": target_org_id, "target_org_id": org["org_id"]}
-            ],
-            "status": "active",
-            "approval_status": "approved"
-        }))
-        
-        if not active_contracts:
+        permissions = contract_permission_index.for_org(org["org_id"])
+        if not permissions.contracts_with(target_org_id):
             raise HTTPException(
                 status_code=400, 
                 detail="No active inter-organization contracts found. Please establish a contract before sending data requests."
             )
         
         # Check if any contract allows the requested resources and purposes
-        contract_allowed_resources = []
         contract_allowed_purposes = {}
         supporting_contracts = []
-        
-        for active_contract in active_contracts:
-            contract_resources = []
-            contract_purposes = {}
-            
-            # Handle both old and new contract structures
-            if active_contract.get("resources_allowed"):
-                # New structure with ContractResource objects
-                for resource in active_contract.get("resources_allowed", []):
-                    if isinstance(resource, dict) and "resource_name" in resource:
-                        resource_name = resource["resource_name"]
-                        contract_resources.append(resource_name)
-                        # Store allowed purposes for this resource
-                        if "purpose" in resource:
-                            contract_purposes[resource_name] = resource["purpose"]
-                    else:
-                        # Fallback if resource is just a string
-                        contract_resources.append(str(resource))
-            elif active_contract.get("allowed_resources"):
-                # Old structure with simple list
-                allowed_resources = active_contract.get("allowed_resources", [])
-                if isinstance(allowed_resources, str):
-                    contract_resources = [allowed_resources]
-                else:
-                    contract_resources = allowed_resources
-            
-            # Check if this contract supports the requested resources
-            unauthorized_resources = [r for r in request_data.requested_resources if r not in contract_resources]
-            if not unauthorized_resources:
-                # This contract supports all requested resources
-                contract_allowed_resources.extend(contract_resources)
-                contract_allowed_purposes.update(contract_purposes)
-                supporting_contracts.append({
-                    "contract_id": active_contract["contract_id"],
-                    "contract_name": active_contract.get("contract_name", "Legacy Contract"),
-                    "contract_type": active_contract.get("contract_type", "data_sharing")
-                })
-        
-        # Remove duplicates
-        contract_allowed_resources = list(set(contract_allowed_resources))
+        for entry in permissions.supporting_contracts(target_org_id, request_data.requested_resources):
+            # Store allowed purposes for each resource
+            for resource_name, grant in entry["resources"].items():
+                if grant["purpose"] is not None:
+                    contract_allowed_purposes[resource_name] = grant["purpose"]
+            supporting_contracts.append({
+                "contract_id": entry["contract"]["contract_id"],
+                "contract_name": entry["contract"].get("contract_name", "Legacy Contract"),
+                "contract_type": entry["contract"].get("contract_type", "data_sharing")
+            })
         
         if not supporting_contracts:
             raise HTTPException(
@@ -290,11 +271,10 @@ async def send_data_request(
         )
     
     # Check if user has the requested PII data
-    user_pii = user_pii_collection.find_one({"user_id": target_user["userid"]})
-    if not user_pii:
+    available_resources = pii_store.list_resources(target_user["userid"])
+    if not available_resources:
         raise HTTPException(status_code=404, detail="User has no PII data")
     
-    available_resources = [pii["resource"] for pii in user_pii.get("pii", [])]
     missing_resources = [r for r in request_data.requested_resources if r not in available_resources]
     
     if missing_resources:
@@ -380,7 +360,7 @@ async def create_csv_file(
     """Create CSV file for bulk data request with detokenized PII data"""
     
     # Verify user is from requesting organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can create CSV files")
     
@@ -399,16 +379,13 @@ async def create_csv_file(
         if not target_user:
             continue
         
-        # Get PII data for each requested resource
+        # Get the user's PII entries for the requested resources
+        user_pii = pii_store.get_entries_by_resource(request["target_user_id"], request["requested_resources"])
+        user_has_pii = bool(user_pii) or bool(pii_store.list_resources(request["target_user_id"]))
+        
         for resource in request["requested_resources"]:
-            # First find the user's PII document
-            user_pii_doc = user_pii_collection.find_one({
-                "user_id": request["target_user_id"]
-            })
-            
-            if user_pii_doc and "pii" in user_pii_doc:
-                # Find the specific resource within the PII array
-                pii_entry = next((pii for pii in user_pii_doc["pii"] if pii["resource"] == resource), None)
+            if user_has_pii:
+                pii_entry = user_pii.get(resource)
                 
                 if pii_entry:
                     # Get the PII value - try to decrypt if it's encrypted, otherwise use as-is
@@ -561,7 +538,7 @@ async def view_csv_file(
         raise HTTPException(status_code=404, detail="File not found")
     
     # Check access permissions
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -950,7 +927,7 @@ async def get_bulk_requests(
     """Get bulk data requests for an organization"""
     
     # Verify user is from this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -1002,7 +979,7 @@ async def get_sent_requests(org_id: str, current_user: TokenData = Depends(get_c
     """Get all data access requests sent by an organization"""
     
     # Verify user is admin of this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -1029,37 +1006,17 @@ async def get_organization_data_requests(org_id: str):
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    org_name = org["org_name"]
-    
     # Get requests where this org is the requester (sent requests)
     sent_requests = list(data_requests_collection.find({
         "requester_org_id": org_id
     }))
     
-    # Get requests where this org is the target (received requests)
-    # First try to find by target_org_id
+    # Get requests where this org is the target (received requests); requests
+    # that only named the target org have target_org_id filled in on write
     received_requests = list(data_requests_collection.find({
         "target_org_id": org_id
     }))
     
-    # Also check for any requests that might have this org as target_org_name
-    # This handles cases where target_org_id is null but target_org_name is set
-    name_based_requests = list(data_requests_collection.find({
-        "target_org_name": org_name
-    }))
-    
-    # Combine both results, avoiding duplicates
-    all_received_requests = received_requests + name_based_requests
-    # Remove duplicates based on request_id
-    seen_ids = set()
-    unique_received_requests = []
-    for req in all_received_requests:
-        if req["request_id"] not in seen_ids:
-            seen_ids.add(req["request_id"])
-            unique_received_requests.append(req)
-    
-    received_requests = unique_received_requests
-    
     # Combine and sort by created_at (newest first)
     all_requests = sent_requests + received_requests
     all_requests.sort(key=lambda x: x.get("created_at", datetime.min), reverse=True)
@@ -1193,7 +1150,7 @@ async def respond_to_request(
     
     # Verify user can respond to this request
     # Allow the target user OR an admin of the target organization to respond
-    current_user_doc = users_collection.find_one({"userid": current_user.user_id})
+    current_user_doc = get_request_user(current_user.user_id)
     if not current_user_doc:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -1240,73 +1197,53 @@ async def respond_to_request(
     
     # If approved, create policies automatically based on inter-organization contracts
     if response_data.status == "approved":
-        from routers.policy import create_policy_internal
+        from routers.policy import create_policies_batch
         from models import UserInputPII
         
-        # Get active contract between organizations
-        active_contract = inter_org_contracts_collection.find_one({
-            "$or": [
-                {"source_org_id": request["requester_org_id"], "target_org_id": request.get("target_org_id")},
-                {"source_org_id": request.get("target_org_id"), "target_org_id": request["requester_org_id"]}
-            ],
-            "status": "active"
-        })
+        # Get an active contract between organizations that policies can be created under
+        contract_entry = contract_permission_index.for_org(request["requester_org_id"]).policy_contract_with(
+            request.get("target_org_id"), approved_only=False
+        )
+        active_contract = contract_entry["contract"] if contract_entry else None
         
         # Get user's PII data
-        user_pii = user_pii_collection.find_one({"user_id": current_user.user_id})
-        if user_pii:
+        user_pii = pii_store.get_entries_by_resource(current_user.user_id, request["requested_resources"])
+        if user_pii and active_contract:
+            contract_allowed_resources = contract_entry["policy_resources"]
+            
+            # Policies are shared with the requesting organization under this contract
+            policy_contract = {
+                **active_contract,
+                "organization_name": request["requester_org_name"],
+                "organization_id": request["requester_org_id"]
+            }
+            
+            from helpers import decrypt_pii
+            policy_items = []
             for resource in request["requested_resources"]:
-                # Check if resource is allowed by contract
-                contract_allowed_resources = []
-                
-                # Handle both old and new contract structures
-                if active_contract.get("resources_allowed"):
-                    # New structure with ContractResource objects
-                    for contract_resource in active_contract.get("resources_allowed", []):
-                        if isinstance(contract_resource, dict) and "resource_name" in contract_resource:
-                            contract_allowed_resources.append(contract_resource["resource_name"])
-                        else:
-                            # Fallback if resource is just a string
-                            contract_allowed_resources.append(str(contract_resource))
-                elif active_contract.get("allowed_resources"):
-                    # Old structure with simple list
-                    allowed_resources = active_contract.get("allowed_resources", [])
-                    if isinstance(allowed_resources, str):
-                        contract_allowed_resources = [allowed_resources]
-                    else:
-                        contract_allowed_resources = allowed_resources
-                
-                if active_contract and resource in contract_allowed_resources:
-                    pii_entry = next((pii for pii in user_pii.get("pii", []) if pii["resource"] == resource), None)
-                    if pii_entry:
-                        try:
-                            from helpers import decrypt_pii
-                            pii_value = decrypt_pii(pii_entry["original"])
-                            
-                            # Get client IP
-                            client_ip = "unknown"
-                            if http_request:
-                                forwarded_for = http_request.headers.get("X-Forwarded-For")
-                                if forwarded_for:
-                                    client_ip = forwarded_for.split(",")[0].strip()
-                                elif http_request.headers.get("X-Real-IP"):
-                                    client_ip = http_request.headers.get("X-Real-IP")
-                                elif http_request.client:
-                                    client_ip = http_request.client.host
-                            
-                            # Create policy with contract information
-                            policy_input = UserInputPII(pii_value=pii_value, resource=resource)
-                            create_policy_internal(
-                                policy_input, 
-                                user_id=current_user.user_id,
-                                ip_address=client_ip,
-                                target_org_id=request["requester_org_id"],
-                                contract_id=active_contract["contract_id"]
-                            )
-                        except Exception as e:
-                            print(f"Error creating policy for {resource}: {e}")
-                else:
-                    print(f"Resource {resource} not allowed by contract or no active contract found")
+                if resource not in contract_allowed_resources:
+                    print(f"Resource {resource} not allowed by contract")
+                    continue
+                pii_entry = user_pii.get(resource)
+                if not pii_entry:
+                    continue
+                try:
+                    policy_items.append({
+                        "data": UserInputPII(pii_value=decrypt_pii(pii_entry["original"]), resource=resource),
+                        "user_id": current_user.user_id,
+                        "contract_override": policy_contract,
+                        "target_org_id": request["requester_org_id"]
+                    })
+                except Exception as e:
+                    print(f"Error preparing policy for {resource}: {e}")
+            
+            # Create all approved policies in one batch
+            try:
+                create_policies_batch(policy_items, ip_address=get_client_ip(http_request) if http_request else "unknown")
+            except Exception as e:
+                print(f"Error creating policies for request {response_data.request_id}: {e}")
+        elif not active_contract:
+            print(f"No active contract found for request {response_data.request_id}")
     
     # Send WebSocket notification to requester organization
     await send_user_update(
@@ -1378,7 +1315,7 @@ async def get_available_organizations_for_requests(
     """Get all organizations with active contracts that can receive data requests from this organization"""
     
     # Verify user is admin of this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -1387,94 +1324,33 @@ async def get_available_organizations_for_requests(
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    # Find all active contracts where this org is the source
-    active_contracts = list(inter_org_contracts_collection.find({
-        "source_org_id": org_id,
-        "status": "active"
-    }))
-    
-    # Also find contracts where this org is the target (bidirectional contracts)
-    target_contracts = list(inter_org_contracts_collection.find({
-        "target_org_id": org_id,
-        "status": "active"
-    }))
-    
-    # Combine and process contracts
+    # Every active contract this org is party to, in either direction,
+    # lets it send requests to the other organization
+    permissions = contract_permission_index.for_org(org_id)
     available_organizations = {}
     
-    # Process source contracts (this org can send requests to target orgs)
-    for contract in active_contracts:
-        target_org_id = contract["target_org_id"]
-        target_org_name = contract["target_org_name"]
-        
-        if target_org_id not in available_organizations:
-            available_organizations[target_org_id] = {
-                "org_id": target_org_id,
-                "org_name": target_org_name,
-                "allowed_resources": [],
-                "allowed_purposes": {},
-                "contract_id": contract["contract_id"]
-            }
-        
-        # Add allowed resources and purposes from this contract
-        if contract.get("resources_allowed"):
-            for resource in contract.get("resources_allowed", []):
-                if isinstance(resource, dict) and "resource_name" in resource:
-                    resource_name = resource["resource_name"]
-                    if resource_name not in available_organizations[target_org_id]["allowed_resources"]:
-                        available_organizations[target_org_id]["allowed_resources"].append(resource_name)
-                    
-                    # Add purposes for this resource
-                    if "purpose" in resource:
-                        if resource_name not in available_organizations[target_org_id]["allowed_purposes"]:
-                            available_organizations[target_org_id]["allowed_purposes"][resource_name] = []
-                        available_organizations[target_org_id]["allowed_purposes"][resource_name].extend(resource["purpose"])
-        
-        elif contract.get("allowed_resources"):
-            allowed_resources = contract.get("allowed_resources", [])
-            if isinstance(allowed_resources, str):
-                allowed_resources = [allowed_resources]
-            
-            for resource in allowed_resources:
-                if resource not in available_organizations[target_org_id]["allowed_resources"]:
-                    available_organizations[target_org_id]["allowed_resources"].append(resource)
-    
-    # Process target contracts (bidirectional - this org can also send requests to source orgs)
-    for contract in target_contracts:
-        source_org_id = contract["source_org_id"]
-        source_org_name = contract["source_org_name"]
-        
-        if source_org_id not in available_organizations:
-            available_organizations[source_org_id] = {
-                "org_id": source_org_id,
-                "org_name": source_org_name,
-                "allowed_resources": [],
-                "allowed_purposes": {},
-                "contract_id": contract["contract_id"]
-            }
+    for counterpart_org_id in permissions.by_counterpart:
+        entries = permissions.contracts_with(counterpart_org_id, approved_only=False)
+        if not entries:
+            continue
+        first_contract = entries[0]["contract"]
+        org_data = {
+            "org_id": counterpart_org_id,
+            "org_name": first_contract["target_org_name"] if first_contract["source_org_id"] == org_id else first_contract["source_org_name"],
+            "allowed_resources": [],
+            "allowed_purposes": {},
+            "contract_id": first_contract["contract_id"]
+        }
         
-        # Add allowed resources and purposes from this contract
-        if contract.get("resources_allowed"):
-            for resource in contract.get("resources_allowed", []):
-                if isinstance(resource, dict) and "resource_name" in resource:
-                    resource_name = resource["resource_name"]
-                    if resource_name not in available_organizations[source_org_id]["allowed_resources"]:
-                        available_organizations[source_org_id]["allowed_resources"].append(resource_name)
-                    
-                    # Add purposes for this resource
-                    if "purpose" in resource:
-                        if resource_name not in available_organizations[source_org_id]["allowed_purposes"]:
-                            available_organizations[source_org_id]["allowed_purposes"][resource_name] = []
-                        available_organizations[source_org_id]["allowed_purposes"][resource_name].extend(resource["purpose"])
+        # Add allowed resources and purposes from each contract
+        for entry in entries:
+            for resource_name, grant in entry["resources"].items():
+                if resource_name not in org_data["allowed_resources"]:
+                    org_data["allowed_resources"].append(resource_name)
+                if grant["purpose"] is not None:
+                    org_data["allowed_purposes"].setdefault(resource_name, []).extend(grant["purpose"])
         
-        elif contract.get("allowed_resources"):
-            allowed_resources = contract.get("allowed_resources", [])
-            if isinstance(allowed_resources, str):
-                allowed_resources = [allowed_resources]
-            
-            for resource in allowed_resources:
-                if resource not in available_organizations[source_org_id]["allowed_resources"]:
-                    available_organizations[source_org_id]["allowed_resources"].append(resource)
+        available_organizations[counterpart_org_id] = org_data
     
     # Remove duplicates from purposes lists
     for org_data in available_organizations.values():
@@ -1500,7 +1376,7 @@ async def get_approved_data_pii(
         raise HTTPException(status_code=400, detail="Data request is not approved")
     
     # Verify user is from the requesting organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -1510,7 +1386,7 @@ async def get_approved_data_pii(
     
     # Get the target user's PII data
     target_user_id = request["target_user_id"]
-    user_pii = user_pii_collection.find_one({"user_id": target_user_id})
+    user_pii = pii_store.get_entries(target_user_id, request["requested_resources"])
     
     if not user_pii:
         raise HTTPException(status_code=404, detail="No PII data found for this user")
@@ -1523,7 +1399,7 @@ async def get_approved_data_pii(
     # Filter PII data to only include requested resources that were approved
     approved_pii_data = []
     
-    for pii_entry in user_pii.get("pii", []):
+    for pii_entry in user_pii:
         if pii_entry["resource"] in request["requested_resources"]:
             try:
                 from helpers import decrypt_pii
@@ -1585,7 +1461,7 @@ async def get_bulk_approved_data(
     """Get CSV file with all approved data requests for an organization"""
     
     # Verify user is from the requesting organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -1608,16 +1484,13 @@ async def get_bulk_approved_data(
         if not target_user:
             continue
         
-        # Get PII data for each requested resource
+        # Get the user's PII entries for the requested resources
+        user_pii = pii_store.get_entries_by_resource(request["target_user_id"], request["requested_resources"])
+        user_has_pii = bool(user_pii) or bool(pii_store.list_resources(request["target_user_id"]))
+        
         for resource in request["requested_resources"]:
-            # First find the user's PII document
-            user_pii_doc = user_pii_collection.find_one({
-                "user_id": request["target_user_id"]
-            })
-            
-            if user_pii_doc and "pii" in user_pii_doc:
-                # Find the specific resource within the PII array
-                pii_entry = next((pii for pii in user_pii_doc["pii"] if pii["resource"] == resource), None)
+            if user_has_pii:
+                pii_entry = user_pii.get(resource)
                 
                 if pii_entry:
                     # Get the PII value - try to decrypt if it's encrypted, otherwise use as-is
@@ -1751,12 +1624,8 @@ async def create_bulk_data_request(
 ):
     """Create a bulk data request for multiple users"""
     
-    # Debug logging
-    print(f"Received bulk request data: {request_data}")
-    print(f"Current user: {current_user.user_id}")
-    
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can send bulk data requests")
     
@@ -1771,67 +1640,40 @@ async def create_bulk_data_request(
         raise HTTPException(status_code=404, detail="Target organization not found")
     
     # Check if there's an active contract between the organizations
-    active_contracts = list(inter_org_contracts_collection.find({
-        "$or": [
-            {"source_org_id": org["org_id"], "target_org_id": request_data.target_org_id},
-            {"source_org_id": request_data.target_org_id, "target_org_id": org["org_id"]}
-        ],
-        "status": "active",
-        "approval_status": "approved"
-    }))
-    
-    if not active_contracts:
+    if not contract_permission_index.for_org(org["org_id"]).contracts_with(request_data.target_org_id):
         raise HTTPException(
             status_code=400, 
             detail="No active inter-organization contracts found. Please establish a contract before sending bulk data requests."
         )
     
+    if not request_data.selected_users:
+        raise HTTPException(status_code=400, detail="No users selected")
+    
     # Verify all target users exist and belong to the target organization
-    target_users = []
-    for user_id in request_data.selected_users:
-        target_user = users_collection.find_one({"userid": user_id})
-        if not target_user:
-            raise HTTPException(status_code=404, detail=f"Target user with ID {user_id} not found")
-        
-        # Check if user belongs to target organization through multiple methods
-        user_belongs_to_target = False
-        
-        # Method 1: Direct organization_id field
-        if target_user.get("organization_id") == request_data.target_org_id:
-            user_belongs_to_target = True
-        
-        # Method 2: Check if user has policies with the target organization
-        if not user_belongs_to_target:
-            user_policies = list(policies_collection.find({
-                "user_id": user_id,
-                "$or": [
-                    {"target_org_id": request_data.target_org_id},
-                    {"shared_with": target_org["org_name"]}
-                ]
-            }))
-            if user_policies:
-                user_belongs_to_target = True
-        
-        if not user_belongs_to_target:
-            raise HTTPException(status_code=400, detail=f"User {user_id} does not belong to target organization")
-        
-        target_users.append(target_user)
+    target_users, missing_users, outside_users = resolve_bulk_request_users(
+        users_collection,
+        policies_collection,
+        request_data.selected_users,
+        request_data.target_org_id
+    )
+    if missing_users:
+        raise HTTPException(status_code=404, detail=f"Target user with ID {missing_users[0]} not found")
+    if outside_users:
+        raise HTTPException(status_code=400, detail=f"User {outside_users[0]} does not belong to target organization")
     
     # Create bulk request ID
     bulk_request_id = str(uuid.uuid4())
     
+    # Calculate expiration date
+    retention_days = int(request_data.retention_window.split()[0])
+    created_at = datetime.utcnow()
+    expires_at = created_at + timedelta(days=retention_days)
+    
     # Create individual data requests for each user
     created_requests = []
     for target_user in target_users:
-        request_id = str(uuid.uuid4())
-        
-        # Calculate expiration date
-        retention_days = int(request_data.retention_window.split()[0])
-        expires_at = datetime.utcnow() + timedelta(days=retention_days)
-        
-        # Create data request
         data_request = {
-            "request_id": request_id,
+            "request_id": str(uuid.uuid4()),
             "bulk_request_id": bulk_request_id,  # Link to bulk request
             "requester_org_id": org["org_id"],
             "requester_org_name": org["org_name"],
@@ -1845,19 +1687,18 @@ async def create_bulk_data_request(
             "retention_window": request_data.retention_window,
             "request_message": request_data.request_message,
             "status": "pending",
-            "created_at": datetime.utcnow(),
+            "created_at": created_at,
             "expires_at": expires_at,
             "is_bulk_request": True,  # Mark as bulk request
-            "bulk_request_size": len(request_data.selected_users)
+            "bulk_request_size": len(target_users)
         }
         
         # Generate HMAC signature for data request integrity
-        signature = generate_data_request_signature(data_request)
-        data_request["integrity_signature"] = signature
-        
-        data_requests_collection.insert_one(data_request)
+        data_request["integrity_signature"] = generate_data_request_signature(data_request)
         created_requests.append(data_request)
     
+    insert_in_chunks(data_requests_collection, created_requests, BULK_INSERT_CHUNK_SIZE)
+    
     # Log the bulk request creation
     client_ip = http_request.client.host if http_request else "unknown"
     log_entry = {
@@ -1872,7 +1713,7 @@ async def create_bulk_data_request(
         "bulk_request_id": bulk_request_id,
         "requester_org_id": org["org_id"],
         "target_org_id": request_data.target_org_id,
-        "user_count": len(request_data.selected_users),
+        "user_count": len(target_users),
         "resources_requested": request_data.requested_resources
     }
     logs_collection.insert_one(log_entry)
@@ -1899,7 +1740,7 @@ async def get_bulk_request_details(
         raise HTTPException(status_code=404, detail="Bulk request not found")
     
     # Verify user has access to this bulk request
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -1930,6 +1771,7 @@ async def get_bulk_request_details(
         "request_message": requests[0]["request_message"],
         "created_at": requests[0]["created_at"].isoformat(),
         "expires_at": requests[0]["expires_at"].isoformat(),
+        "csv_file_id": requests[0].get("csv_file_id"),
         "requests": [
             {
                 "request_id": req["request_id"],
@@ -1942,239 +1784,384 @@ async def get_bulk_request_details(
         ]
     }
 
-@router.post("/approve-bulk-request/{bulk_request_id}")
-async def approve_bulk_request(
-    bulk_request_id: str,
-    current_user: TokenData = Depends(get_current_user),
-    http_request: Request = None
-):
-    """Approve all requests in a bulk request and generate encrypted CSV"""
+BULK_CSV_FIELDS = ["email", "full_name", "resource_type", "purpose", "value", "request_id", "requested_at", "expires_at"]
+
+def apply_bulk_response(bulk_request_id: str, response_data: BulkRespondRequest, current_user: TokenData, client_ip: str) -> dict:
+    """
+    Apply an approve/reject decision to the pending requests of a bulk request
+
+    The selection is resolved with one query and the status change is applied
+    with a single update_many that tags the rows with a per-call claim token.
+    Approvals then create policies, in batches, only for the rows this call
+    moved out of pending; rows a concurrent responder got to first are left
+    alone. Without a contract that grants resources, approvals create no
+    policies.
+
+    Returns:
+        Summary of the bulk request and how many requests were updated
+    """
+    if response_data.status not in ("approved", "rejected"):
+        raise HTTPException(status_code=400, detail="Status must be 'approved' or 'rejected'")
+    
+    bulk = data_requests_collection.find_one(
+        {"bulk_request_id": bulk_request_id},
+        {"bulk_request_id": 1, "requester_org_id": 1, "requester_org_name": 1, "target_org_id": 1, "target_org_name": 1}
+    )
+    if not bulk:
+        raise HTTPException(status_code=404, detail="Bulk request not found")
     
-    # Get all requests for this bulk request
-    requests = list(data_requests_collection.find({"bulk_request_id": bulk_request_id}))
+    # Verify user is from target organization
+    user = get_request_user(current_user.user_id)
+    if not user or user.get("organization_id") != bulk["target_org_id"]:
+        raise HTTPException(status_code=403, detail="Only target organization can respond to bulk requests")
+    
+    # Resolve the selection: pending requests, narrowed by include/exclude lists
+    selection = {"bulk_request_id": bulk_request_id, "status": "pending"}
+    request_id_filter = {}
+    if response_data.include_request_ids is not None:
+        request_id_filter["$in"] = response_data.include_request_ids
+    if response_data.exclude_request_ids:
+        request_id_filter["$nin"] = response_data.exclude_request_ids
+    if request_id_filter:
+        selection["request_id"] = request_id_filter
+    
+    selected = list(data_requests_collection.find(
+        selection,
+        {"request_id": 1, "target_user_id": 1, "requested_resources": 1}
+    ))
+    if not selected:
+        raise HTTPException(status_code=400, detail="No pending requests to respond to")
     
+    # Policies are created under a contract with resource grants. Legacy
+    # contracts only list allowed_resources; those approvals still go
+    # through, like single responses, just without policies.
+    contract_entry = None
+    if response_data.status == "approved":
+        contract_entry = contract_permission_index.for_org(bulk["requester_org_id"]).policy_contract_with(
+            bulk["target_org_id"], approved_only=False
+        )
+        if not contract_entry:
+            logger.warning(
+                f"Bulk request {bulk_request_id} approved without policies: no active contract with "
+                f"resource grants between {bulk['requester_org_id']} and {bulk['target_org_id']}"
+            )
+    
+    request_ids = [req["request_id"] for req in selected]
+    response_claim = str(uuid.uuid4())
+    result = data_requests_collection.update_many(
+        {"request_id": {"$in": request_ids}, "status": "pending"},
+        {
+            "$set": {
+                "status": response_data.status,
+                "response_message": response_data.response_message,
+                "responded_at": datetime.utcnow(),
+                "responded_by": current_user.user_id,
+                "response_claim": response_claim
+            }
+        }
+    )
+    
+    policies_created = 0
+    if contract_entry and result.modified_count:
+        claimed = list(data_requests_collection.find(
+            {"response_claim": response_claim},
+            {"request_id": 1, "target_user_id": 1, "requested_resources": 1}
+        ))
+        policies_created = create_bulk_policies(bulk, claimed, client_ip, contract_entry)
+    
+    logs_collection.insert_one({
+        "user_id": current_user.user_id,
+        "fintech_name": bulk["target_org_name"],
+        "resource_name": "bulk_data_approval" if response_data.status == "approved" else "bulk_data_rejection",
+        "purpose": f"Bulk data request {response_data.status}",
+        "log_type": f"bulk_data_{response_data.status}",
+        "ip_address": client_ip,
+        "data_source": "organization",
+        "created_at": datetime.utcnow(),
+        "bulk_request_id": bulk_request_id,
+        "requester_org_id": bulk["requester_org_id"],
+        "target_org_id": bulk["target_org_id"],
+        "responded_requests": result.modified_count,
+        "policies_created": policies_created
+    })
+    
+    return {
+        "bulk_request_id": bulk_request_id,
+        "requester_org_id": bulk["requester_org_id"],
+        "status": response_data.status,
+        "selected_requests": len(selected),
+        "updated_requests": result.modified_count,
+        "policies_created": policies_created
+    }
+
+def create_bulk_policies(bulk: dict, selected: List[dict], client_ip: str, contract_entry: dict) -> int:
+    """
+    Create policies for the approved requests of a bulk request
+
+    All users' PII is fetched with a single $in query, then policies are
+    written in batches of BULK_POLICY_BATCH_SIZE.
+
+    Args:
+        contract_entry: Contract index entry from policy_contract_with
+
+    Returns:
+        Number of policies created
+    """
+    from routers.policy import create_policies_batch
+    from models import UserInputPII
+    from helpers import decrypt_pii
+    
+    active_contract = contract_entry["contract"]
+    allowed_resources = contract_entry["policy_resources"]
+    
+    # Policies are shared with the requesting organization under this contract
+    policy_contract = {
+        **active_contract,
+        "organization_name": bulk["requester_org_name"],
+        "organization_id": bulk["requester_org_id"]
+    }
+    
+    user_ids = list({req["target_user_id"] for req in selected})
+    pii_by_user = pii_store.get_entries_for_users(user_ids)
+    
+    policy_items = []
+    for req in selected:
+        user_pii = pii_by_user.get(req["target_user_id"], {})
+        for resource in req["requested_resources"]:
+            pii_entry = user_pii.get(resource)
+            if resource not in allowed_resources or not pii_entry:
+                continue
+            try:
+                pii_value = decrypt_pii(pii_entry["original"])
+            except Exception:
+                pii_value = pii_entry["original"]
+            policy_items.append({
+                "data": UserInputPII(pii_value=pii_value, resource=resource),
+                "user_id": req["target_user_id"],
+                "contract_override": policy_contract,
+                "target_org_id": bulk["requester_org_id"]
+            })
+    
+    created = 0
+    for i in range(0, len(policy_items), BULK_POLICY_BATCH_SIZE):
+        batch = policy_items[i:i + BULK_POLICY_BATCH_SIZE]
+        try:
+            created += len(create_policies_batch(batch, ip_address=client_ip))
+        except Exception:
+            # A single invalid value or contract grant rejects its batch; the
+            # requests are already approved, so retry the batch item by item
+            for item in batch:
+                try:
+                    created += len(create_policies_batch([item], ip_address=client_ip))
+                except Exception as e:
+                    print(f"Skipping policy for user {item['user_id']}, resource {item['data'].resource}: {getattr(e, 'detail', e)}")
+    return created
+
+def generate_bulk_export(bulk_request_id: str, created_by: int) -> dict:
+    """
+    Build the view-only CSV export for the approved requests of a bulk request
+
+    Users and PII for every approved request are fetched with one $in query
+    each. The file is recorded in csv_files_collection and linked from every
+    request of the bulk.
+
+    Returns:
+        The stored file metadata
+    """
+    requests = list(data_requests_collection.find(
+        {"bulk_request_id": bulk_request_id},
+        {"request_id": 1, "status": 1, "target_user_id": 1, "requested_resources": 1, "purpose": 1,
+         "created_at": 1, "expires_at": 1, "requester_org_id": 1, "target_org_id": 1, "target_org_name": 1}
+    ))
     if not requests:
         raise HTTPException(status_code=404, detail="Bulk request not found")
     
-    # Verify user is from target organization
-    user = users_collection.find_one({"userid": current_user.user_id})
-    if not user or user.get("organization_id") != requests[0]["target_org_id"]:
-        raise HTTPException(status_code=403, detail="Only target organization can approve bulk requests")
-    
-    # Check if all requests are pending
-    pending_requests = [req for req in requests if req["status"] == "pending"]
-    if not pending_requests:
-        raise HTTPException(status_code=400, detail="No pending requests to approve")
-    
-    # Approve all pending requests
-    approved_count = 0
-    for request in pending_requests:
-        data_requests_collection.update_one(
-            {"request_id": request["request_id"]},
-            {
-                "$set": {
-                    "status": "approved",
-                    "responded_at": datetime.utcnow(),
-                    "responded_by": current_user.user_id
-                }
-            }
-        )
-        approved_count += 1
+    approved = [req for req in requests if req["status"] == "approved"]
+    user_ids = list({req["target_user_id"] for req in approved})
+    users_by_id = {
+        doc["userid"]: doc
+        for doc in users_collection.find({"userid": {"$in": user_ids}}, {"userid": 1, "email": 1, "full_name": 1})
+    }
+    pii_by_user = pii_store.get_entries_for_users(user_ids)
     
-    # Generate encrypted CSV file with all approved data
-    try:
-        # Collect data for CSV
-        csv_data = []
-        
-        print(f"Processing {len(requests)} requests for bulk request {bulk_request_id}")
-        
-        # Get updated requests after approval
-        updated_requests = list(data_requests_collection.find({"bulk_request_id": bulk_request_id}))
-        
-        for request in updated_requests:
-            if request["status"] == "approved":
-                print(f"Processing approved request {request['request_id']} for user {request['target_user_id']}")
-                # Get target user info
-                target_user = users_collection.find_one({"userid": request["target_user_id"]})
-                if not target_user:
-                    print(f"Target user {request['target_user_id']} not found")
-                    continue
-                
-                print(f"Target user found: {target_user.get('email', 'N/A')}")
-                print(f"Requested resources: {request['requested_resources']}")
-                
-                # Get PII data for each requested resource
-                for resource in request["requested_resources"]:
-                    # First find the user's PII document
-                    user_pii_doc = user_pii_collection.find_one({
-                        "user_id": request["target_user_id"]
-                    })
-                    
-                    if user_pii_doc and "pii" in user_pii_doc:
-                        print(f"Found PII document for user {request['target_user_id']} with {len(user_pii_doc['pii'])} PII entries")
-                        print(f"Available resources: {[pii.get('resource', 'N/A') for pii in user_pii_doc['pii']]}")
-                        
-                        # Find the specific resource within the PII array
-                        pii_entry = next((pii for pii in user_pii_doc["pii"] if pii["resource"] == resource), None)
-                        
-                        if pii_entry:
-                            print(f"Found PII entry for resource {resource}")
-                            
-                            # Get the PII value - try to decrypt if it's encrypted, otherwise use as-is
-                            pii_value = pii_entry["original"]
-                            
-                            # Check if the value is encrypted (try to decrypt it)
-                            try:
-                                from helpers import decrypt_pii
-                                # Try to decrypt - if it fails, it's probably plain text
-                                decrypted_value = decrypt_pii(pii_value)
-                                print(f"Successfully decrypted PII value for {resource}")
-                            except Exception as e:
-                                # If decryption fails, use the original value as-is (it's already plain text)
-                                decrypted_value = pii_value
-                                print(f"Using plain text PII value for {resource} (not encrypted)")
-                            
-                            csv_data.append({
-                                "email": target_user.get("email", "N/A"),
-                                "full_name": target_user.get("full_name", "N/A"),
-                                "resource_type": resource,
-                                "purpose": ", ".join(request["purpose"]) if isinstance(request["purpose"], list) else request["purpose"],
-                                "value": decrypted_value,
-                                "request_id": request["request_id"],
-                                "requested_at": request["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
-                                "expires_at": request["expires_at"].strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                        else:
-                            print(f"No PII data found for user {request['target_user_id']}, resource {resource}")
-                            csv_data.append({
-                                "email": target_user.get("email", "N/A"),
-                                "full_name": target_user.get("full_name", "N/A"),
-                                "resource_type": resource,
-                                "purpose": ", ".join(request["purpose"]) if isinstance(request["purpose"], list) else request["purpose"],
-                                "value": "No data available",
-                                "request_id": request["request_id"],
-                                "requested_at": request["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
-                                "expires_at": request["expires_at"].strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                    else:
-                        print(f"No PII document found for user {request['target_user_id']}")
-                        csv_data.append({
-                            "email": target_user.get("email", "N/A"),
-                            "full_name": target_user.get("full_name", "N/A"),
-                            "resource_type": resource,
-                            "purpose": ", ".join(request["purpose"]) if isinstance(request["purpose"], list) else request["purpose"],
-                            "value": "No PII document found",
-                            "request_id": request["request_id"],
-                            "requested_at": request["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
-                            "expires_at": request["expires_at"].strftime("%Y-%m-%d %H:%M:%S")
-                        })
-        
-        if not csv_data:
-            print(f"No CSV data collected for bulk request {bulk_request_id}")
-            print(f"Total requests: {len(requests)}")
-            print(f"Approved requests: {len([r for r in requests if r['status'] == 'approved'])}")
-            # Instead of raising an error, create a CSV with available data or placeholder
+    from helpers import decrypt_pii
+    csv_data = []
+    for request in approved:
+        target_user = users_by_id.get(request["target_user_id"])
+        if not target_user:
+            continue
+        user_pii = pii_by_user.get(request["target_user_id"])
+        for resource in request["requested_resources"]:
+            if user_pii is None:
+                value = "No PII document found"
+            elif resource not in user_pii:
+                value = "No data available"
+            else:
+                # Try to decrypt - if it fails, the value is stored as plain text
+                value = user_pii[resource]["original"]
+                try:
+                    value = decrypt_pii(value)
+                except Exception:
+                    pass
             csv_data.append({
-                "email": "No data available",
-                "full_name": "No data available", 
-                "resource_type": "No data available",
-                "purpose": "No data available",
-                "value": "No PII data found for the requested resources",
-                "request_id": "N/A",
-                "requested_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
-                "expires_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+                "email": target_user.get("email", "N/A"),
+                "full_name": target_user.get("full_name", "N/A"),
+                "resource_type": resource,
+                "purpose": ", ".join(request["purpose"]) if isinstance(request["purpose"], list) else request["purpose"],
+                "value": value,
+                "request_id": request["request_id"],
+                "requested_at": request["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
+                "expires_at": request["expires_at"].strftime("%Y-%m-%d %H:%M:%S")
             })
-        
-        print(f"Collected {len(csv_data)} records for CSV export")
-        
-        # Create CSV content
-        output = io.StringIO()
-        fieldnames = ["email", "full_name", "resource_type", "purpose", "value", "request_id", "requested_at", "expires_at"]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
+    
+    if not csv_data:
+        # Instead of failing, create a CSV with a placeholder row
+        now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        csv_data.append({
+            "email": "No data available",
+            "full_name": "No data available",
+            "resource_type": "No data available",
+            "purpose": "No data available",
+            "value": "No PII data found for the requested resources",
+            "request_id": "N/A",
+            "requested_at": now,
+            "expires_at": now
+        })
+    
+    # Generate unique file ID and filename
+    file_id = str(uuid.uuid4())
+    filename = f"bulk_data_export_{bulk_request_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    file_path = f"public/csv_files/{filename}"
+    
+    # Save CSV file to public folder
+    os.makedirs("public/csv_files", exist_ok=True)
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=BULK_CSV_FIELDS)
         writer.writeheader()
         writer.writerows(csv_data)
-        
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Generate unique file ID and filename
-        file_id = str(uuid.uuid4())
-        filename = f"bulk_data_export_{bulk_request_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        file_path = f"public/csv_files/{filename}"
-        
-        # Save CSV file to public folder
-        os.makedirs("public/csv_files", exist_ok=True)
-        with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-            csvfile.write(csv_content)
-        
-        # Store encrypted file metadata
-        file_metadata = {
-            "file_id": file_id,
-            "bulk_request_id": bulk_request_id,
-            "original_filename": filename,
-            "file_path": file_path,
-            "access_policy": {
-                "view_only": True,
-                "no_download": True,
-                "no_copy": True,
-                "no_edit": True,
-                "no_print": True,
-                "web_only": True,
-                "expires_at": (datetime.utcnow() + timedelta(days=7)).isoformat(),
-                "allowed_orgs": [requests[0]["requester_org_id"]],
-                "created_by": current_user.user_id
-            },
-            "created_by": current_user.user_id,
-            "created_at": datetime.utcnow(),
-            "expires_at": datetime.utcnow() + timedelta(days=7),
-            "org_id": requests[0]["requester_org_id"],
-            "record_count": len(csv_data),
-            "bulk_request_id": bulk_request_id
-        }
-        
-        csv_files_collection.insert_one(file_metadata)
-        
-        # Update bulk request with file ID
-        data_requests_collection.update_many(
-            {"bulk_request_id": bulk_request_id},
-            {"$set": {"csv_file_id": file_id}}
-        )
-        
-        # Log the approval and export
-        client_ip = http_request.client.host if http_request else "unknown"
-        log_entry = {
-            "user_id": current_user.user_id,
-            "fintech_name": requests[0]["target_org_name"],
-            "resource_name": "bulk_data_approval",
-            "purpose": "Bulk data request approval and export",
-            "log_type": "bulk_data_approved",
-            "ip_address": client_ip,
-            "data_source": "organization",
-            "created_at": datetime.utcnow(),
-            "bulk_request_id": bulk_request_id,
-            "requester_org_id": requests[0]["requester_org_id"],
-            "target_org_id": requests[0]["target_org_id"],
-            "approved_requests": approved_count,
-            "exported_records": len(csv_data),
-            "file_id": file_id
-        }
-        logs_collection.insert_one(log_entry)
-        
-        return {
-            "message": f"Bulk request approved successfully. {approved_count} requests approved.",
+    
+    requester_org_id = requests[0]["requester_org_id"]
+    file_metadata = {
+        "file_id": file_id,
+        "bulk_request_id": bulk_request_id,
+        "original_filename": filename,
+        "file_path": file_path,
+        "access_policy": {
+            "view_only": True,
+            "no_download": True,
+            "no_copy": True,
+            "no_edit": True,
+            "no_print": True,
+            "web_only": True,
+            "expires_at": (datetime.utcnow() + timedelta(days=7)).isoformat(),
+            "allowed_orgs": [requester_org_id],
+            "created_by": created_by
+        },
+        "created_by": created_by,
+        "created_at": datetime.utcnow(),
+        "expires_at": datetime.utcnow() + timedelta(days=7),
+        "org_id": requester_org_id,
+        "record_count": len(csv_data)
+    }
+    csv_files_collection.insert_one(file_metadata)
+    
+    # Update bulk request with file ID
+    data_requests_collection.update_many(
+        {"bulk_request_id": bulk_request_id},
+        {"$set": {"csv_file_id": file_id}}
+    )
+    
+    logs_collection.insert_one({
+        "user_id": created_by,
+        "fintech_name": requests[0]["target_org_name"],
+        "resource_name": "bulk_data_export",
+        "purpose": "Bulk data request export",
+        "log_type": "bulk_data_exported",
+        "data_source": "organization",
+        "created_at": datetime.utcnow(),
+        "bulk_request_id": bulk_request_id,
+        "requester_org_id": requester_org_id,
+        "target_org_id": requests[0]["target_org_id"],
+        "exported_records": len(csv_data),
+        "file_id": file_id
+    })
+    
+    return file_metadata
+
+def generate_bulk_export_in_background(bulk_request_id: str, created_by: int) -> None:
+    try:
+        generate_bulk_export(bulk_request_id, created_by)
+    except Exception as e:
+        print(f"Error generating CSV file for bulk request {bulk_request_id}: {e}")
+
+@router.post("/bulk-request/{bulk_request_id}/respond")
+async def respond_to_bulk_request(
+    bulk_request_id: str,
+    response_data: BulkRespondRequest,
+    background_tasks: BackgroundTasks,
+    current_user: TokenData = Depends(get_current_user),
+    http_request: Request = None
+):
+    """
+    Approve or reject the pending requests of a bulk request
+
+    include_request_ids limits the response to those requests and
+    exclude_request_ids leaves the listed requests pending. Approvals queue
+    the CSV export in the background; its csv_file_id appears on the bulk
+    request details once it is ready.
+    """
+    client_ip = get_client_ip(http_request) if http_request else "unknown"
+    summary = apply_bulk_response(bulk_request_id, response_data, current_user, client_ip)
+    
+    if response_data.status == "approved" and response_data.generate_export:
+        background_tasks.add_task(generate_bulk_export_in_background, bulk_request_id, current_user.user_id)
+        summary["export_status"] = "queued"
+    
+    # Send WebSocket notification to requester organization
+    await send_user_update(
+        user_id=str(summary["requester_org_id"]),
+        update_type="bulk_request_responded",
+        data={
             "bulk_request_id": bulk_request_id,
-            "approved_requests": approved_count,
-            "csv_file_id": file_id,
-            "view_url": f"/data-requests/view-csv/{file_id}",
-            "record_count": len(csv_data),
-            "expires_at": file_metadata["expires_at"].isoformat()
+            "status": response_data.status,
+            "updated_requests": summary["updated_requests"]
         }
-        
+    )
+    
+    return {
+        "message": f"Bulk request {response_data.status}. {summary['updated_requests']} requests updated.",
+        **summary
+    }
+
+@router.post("/approve-bulk-request/{bulk_request_id}")
+async def approve_bulk_request(
+    bulk_request_id: str,
+    current_user: TokenData = Depends(get_current_user),
+    http_request: Request = None
+):
+    """Approve all requests in a bulk request and generate encrypted CSV"""
+    client_ip = get_client_ip(http_request) if http_request else "unknown"
+    summary = apply_bulk_response(bulk_request_id, BulkRespondRequest(status="approved"), current_user, client_ip)
+    
+    # Generate encrypted CSV file with all approved data
+    try:
+        file_metadata = generate_bulk_export(bulk_request_id, current_user.user_id)
     except Exception as e:
         print(f"Error generating CSV file: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error generating CSV file: {str(e)}")
+    
+    return {
+        "message": f"Bulk request approved successfully. {summary['updated_requests']} requests approved.",
+        "bulk_request_id": bulk_request_id,
+        "approved_requests": summary["updated_requests"],
+        "policies_created": summary["policies_created"],
+        "csv_file_id": file_metadata["file_id"],
+        "view_url": f"/data-requests/view-csv/{file_metadata['file_id']}",
+        "record_count": file_metadata["record_count"],
+        "expires_at": file_metadata["expires_at"].isoformat()
+    }
 
 @router.get("/download-csv/{file_id}")
 async def download_csv_file(
@@ -2189,7 +2176,7 @@ async def download_csv_file(
         raise HTTPException(status_code=404, detail="File not found")
     
     # Check access permissions
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Response
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, Query, Response, Request, BackgroundTasks
 from fastapi.responses import StreamingResponse, FileResponse
 from datetime import datetime, timedelta
 from typing import List, Optional
@@ -9,19 +9,20 @@ import hmac
 import shutil
 import base64
 import json
+import re
+import asyncio
 from pathlib import Path
-import PyPDF2
 import io
+import jwt
 
 from helpers import (
-    users_collection, 
-    organizations_collection, 
     inter_org_contracts_collection,
     logs_collection,
     get_organization_by_id,
-    get_client_ip
+    get_client_ip,
+    get_request_user
 )
-from jwt_utils import get_current_user, TokenData
+from jwt_utils import get_current_user, TokenData, create_access_token, SECRET_KEY, ALGORITHM
 from models import (
     FileRequest, 
     SharedFile, 
@@ -29,6 +30,11 @@ from models import (
     UploadFileRequest, 
     DirectFileShare
 )
+from services.file_ingest import stage_upload, UploadTooLarge
+from services.blob_store import BlobStore
+from services.storage_sweeper import StorageSweeper
+from services.segmented_crypto import SegmentEncryptor, DecryptionError, DecryptingReader, iter_decrypted_range, read_layout, encrypt_bytes, decrypt_bytes
+from services.pdf_index import PdfPageIndex, extract_page_pdf
 
 router = APIRouter(prefix="/file-sharing", tags=["File Sharing"])
 
@@ -43,8 +49,41 @@ def get_file_collections():
         db = get_database()
         file_requests_collection = db["file_requests"]
         shared_files_collection = db["shared_files"]
+        # Listings filter on one side of the exchange and sort by date
+        file_requests_collection.create_index([("requester_org_id", 1), ("created_at", -1)])
+        file_requests_collection.create_index([("target_org_id", 1), ("created_at", -1)])
+        file_requests_collection.create_index("request_id")
+        shared_files_collection.create_index([("sender_org_id", 1), ("uploaded_at", -1)])
+        shared_files_collection.create_index([("receiver_org_id", 1), ("uploaded_at", -1)])
+        shared_files_collection.create_index("file_id")
     return file_requests_collection, shared_files_collection
 
+# Fields returned by the listings; signatures, storage paths and sweep state are left out
+FILE_REQUEST_LIST_PROJECTION = {
+    "_id": 0, "request_id": 1, "contract_id": 1, "requester_org_id": 1, "requester_org_name": 1,
+    "target_org_id": 1, "target_org_name": 1, "file_description": 1, "file_category": 1, "status": 1,
+    "created_at": 1, "expires_at": 1, "approved_at": 1, "rejected_at": 1, "rejection_reason": 1,
+    "uploaded_file_id": 1, "uploaded_file_name": 1, "uploaded_file_size": 1, "uploaded_at": 1, "uploaded_by": 1
+}
+SHARED_FILE_LIST_PROJECTION = {
+    "_id": 0, "file_id": 1, "contract_id": 1, "sender_org_id": 1, "sender_org_name": 1,
+    "receiver_org_id": 1, "receiver_org_name": 1, "file_name": 1, "file_description": 1, "file_category": 1,
+    "file_size": 1, "uploaded_at": 1, "expires_at": 1, "access_count": 1, "last_accessed": 1
+}
+
+def org_side_filter(org_id: str, direction: Optional[str], own_field: str, other_field: str) -> dict:
+    """
+    Match records on one or both sides of an exchange
+
+    A single side is a plain equality on its indexed field; both sides is
+    an $or whose branches each use their own (field, date) index.
+    """
+    if direction == "outgoing":
+        return {own_field: org_id}
+    if direction == "incoming":
+        return {other_field: org_id}
+    return {"$or": [{own_field: org_id}, {other_field: org_id}]}
+
 # Create file storage directory - use absolute path to ensure it's created in the right location
 FILE_STORAGE_DIR = Path(os.path.join(os.path.dirname(__file__), "public", "shared_files"))
 FILE_STORAGE_DIR.mkdir(parents=True, exist_ok=True)
@@ -55,6 +94,53 @@ if not FILE_STORAGE_DIR.exists():
 
 print(f"📁 File storage directory: {FILE_STORAGE_DIR.absolute()}")
 
+# Shared file content, stored once per unique SHA-256
+blob_store = None
+
+def get_blob_store() -> BlobStore:
+    global blob_store
+    if blob_store is None:
+        from helpers import get_database
+        blob_store = BlobStore(
+            FILE_STORAGE_DIR / "blobs",
+            get_database()["file_blobs"],
+            on_delete=[lambda sha256: get_pdf_page_index().delete(sha256)]
+        )
+        blob_store.ensure_indexes()
+    return blob_store
+
+# Page count, offsets, text and thumbnails of stored PDFs
+pdf_page_index = None
+
+def get_pdf_page_index() -> PdfPageIndex:
+    global pdf_page_index
+    if pdf_page_index is None:
+        from helpers import get_database
+        pdf_page_index = PdfPageIndex(get_database()["pdf_pages"])
+        pdf_page_index.ensure_indexes()
+    return pdf_page_index
+
+# Deletes expired shares and CSV exports along with their content
+storage_sweeper = None
+
+def get_storage_sweeper() -> StorageSweeper:
+    global storage_sweeper
+    if storage_sweeper is None:
+        from helpers import get_database
+        _, shared_files_collection = get_file_collections()
+        storage_sweeper = StorageSweeper(shared_files_collection, get_database()["csv_files"], get_blob_store())
+        storage_sweeper.ensure_indexes()
+    return storage_sweeper
+
+STORAGE_SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL_SECONDS", "3600"))
+
+# Largest PDF accepted for sharing
+MAX_SHARED_FILE_BYTES = 50 * 1024 * 1024
+
+# The viewer shell loads the PDF from the content endpoint with a short-lived token
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+FILE_CONTENT_TOKEN_MINUTES = int(os.getenv("FILE_CONTENT_TOKEN_MINUTES", "15"))
+
 def generate_file_id():
     return str(uuid.uuid4())
 
@@ -84,18 +170,123 @@ def validate_pdf_file(file: UploadFile) -> bool:
         return True
 
 def encrypt_pdf_content(content: bytes) -> bytes:
-    """Store PDF content without encryption for now (encryption was corrupting files)"""
-    # For now, return content as-is to prevent corruption
-    # In production, implement proper encryption that doesn't break PDF structure
-    return content
+    """Encrypt PDF content in memory using the segmented at-rest format"""
+    return encrypt_bytes(content)
 
 def decrypt_pdf_content(encrypted_content: bytes) -> bytes:
-    """Return PDF content as-is (no decryption needed)"""
-    # For now, return content as-is since we're not encrypting
-    return encrypted_content
+    """Decrypt PDF content produced by encrypt_pdf_content"""
+    return decrypt_bytes(encrypted_content)
+
+def iter_shared_file_range(shared_file: dict, start: int = 0, end: Optional[int] = None, chunk_size: int = 64 * 1024):
+    """
+    Yield plaintext bytes [start, end) of a stored shared file
+
+    Encrypted files are decrypted segment by segment, so only the requested
+    range is read. Files stored before encryption at rest are served as-is.
+    """
+    with open(shared_file["file_path"], "rb") as f:
+        if shared_file.get("is_encrypted"):
+            yield from iter_decrypted_range(f, start, end)
+            return
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+def open_shared_file(shared_file: dict):
+    """Open a stored shared file as a seekable stream of its plaintext"""
+    f = open(shared_file["file_path"], "rb")
+    if not shared_file.get("is_encrypted"):
+        return f
+    try:
+        return io.BufferedReader(DecryptingReader(f), buffer_size=64 * 1024)
+    except Exception:
+        f.close()
+        raise
+
+def index_blob_pages(sha256: str) -> None:
+    """
+    Build the page index for a stored PDF, once per unique content
+
+    Runs after the upload response; the blob record tracks the index
+    status so re-uploads of the same document are not parsed again.
+    """
+    store = get_blob_store()
+    if not store.update_metadata(sha256, {"pdf_index": {"status": "indexing", "started_at": datetime.utcnow()}}, unless_set="pdf_index"):
+        return
+    blob = store.get(sha256)
+    try:
+        with open_shared_file({"file_path": blob["path"], "is_encrypted": blob.get("is_encrypted")}) as stream:
+            summary = get_pdf_page_index().build(sha256, stream)
+        store.update_metadata(sha256, {"pdf_index": {"status": "ready", "indexed_at": datetime.utcnow(), **summary}})
+        print(f"📄 Indexed {summary['page_count']} page(s) for blob {sha256[:12]}")
+    except Exception as e:
+        print(f"❌ Error indexing PDF pages for blob {sha256[:12]}: {e}")
+        store.update_metadata(sha256, {"pdf_index": {"status": "failed", "error": str(e), "failed_at": datetime.utcnow()}})
+
+def shared_file_content_size(shared_file: dict) -> int:
+    """Plaintext size of a stored shared file, read from disk"""
+    with open(shared_file["file_path"], "rb") as f:
+        if shared_file.get("is_encrypted"):
+            return read_layout(f)[2]
+        return f.seek(0, os.SEEK_END)
+
+def parse_range_header(range_header: Optional[str], total: int) -> Optional[tuple]:
+    """
+    Parse a single-range HTTP Range header into (start, end) with end exclusive
+
+    Returns None when the whole file should be served (no header, or a
+    multi-range or non-byte range, which servers may ignore).
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    if not range_header:
+        return None
+    match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, total - length), total
+    start = int(first)
+    end = total if not last else min(int(last) + 1, total)
+    if start >= total or start >= end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+def create_file_content_token(file_id: str, org_id: str) -> str:
+    """Create a short-lived token granting an organization read access to one file's content"""
+    return create_access_token(
+        {"scope": "file_content", "file_id": file_id, "org_id": org_id},
+        expires_delta=timedelta(minutes=FILE_CONTENT_TOKEN_MINUTES)
+    )
+
+def verify_file_content_token(token: str, file_id: str) -> Optional[str]:
+    """Return the organization a content token was issued to, or None if it is not valid for this file"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    if payload.get("scope") != "file_content" or payload.get("file_id") != file_id:
+        return None
+    return payload.get("org_id")
 
 def generate_file_integrity_signature(file_content: bytes, metadata: dict) -> str:
     """Generate HMAC-SHA256 signature for file integrity"""
+    return generate_file_integrity_signature_for_hash(hashlib.sha256(file_content).hexdigest(), metadata)
+
+def generate_file_integrity_signature_for_hash(content_hash: str, metadata: dict) -> str:
+    """Generate the file integrity signature from the SHA-256 hex digest of the content"""
     # Create a canonical representation of file content and metadata, handling datetime objects
     def serialize_datetime(obj):
         if isinstance(obj, datetime):
@@ -112,7 +303,6 @@ def generate_file_integrity_signature(file_content: bytes, metadata: dict) -> st
         else:
             serializable_metadata[key] = serialize_datetime(value)
     
-    content_hash = hashlib.sha256(file_content).hexdigest()
     metadata_str = json.dumps(serializable_metadata, sort_keys=True, separators=(',', ':'))
     signature_data = f"{content_hash}:{metadata_str}"
     secret_key = os.getenv("FILE_INTEGRITY_SECRET_KEY", "default-file-integrity-secret-key")
@@ -152,6 +342,23 @@ def verify_file_request_signature(request_data: dict, signature: str) -> bool:
     expected_signature = generate_file_request_signature(request_data)
     return hmac.compare_digest(signature, expected_signature)
 
+async def sweep_expired_storage_periodically():
+    """Background task that deletes expired shared files and CSV exports"""
+    while True:
+        try:
+            stats = await asyncio.to_thread(get_storage_sweeper().run_once)
+            if stats["bytes_reclaimed"] > 0:
+                print(f"Storage sweep reclaimed {stats['bytes_reclaimed']} bytes")
+        except Exception as e:
+            print(f"Error in storage sweep: {str(e)}")
+        
+        await asyncio.sleep(STORAGE_SWEEP_INTERVAL_SECONDS)
+
+@router.on_event("startup")
+async def start_storage_sweeper():
+    """Start the expired storage sweeper on startup"""
+    asyncio.create_task(sweep_expired_storage_periodically())
+
 @router.post("/request-file")
 async def create_file_request(
     request_data: CreateFileRequest,
@@ -160,7 +367,7 @@ async def create_file_request(
     """Create a file request for a specific contract"""
     
     # Verify user is from requesting organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can create file requests")
     
@@ -227,12 +434,15 @@ async def create_file_request(
 async def get_file_requests(
     org_id: str,
     status: Optional[str] = Query(None, description="Filter by status"),
+    direction: Optional[str] = Query(None, pattern="^(outgoing|incoming)$", description="outgoing: requests made by this organization, incoming: requests made to it"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of requests to return"),
+    offset: int = Query(0, ge=0, description="Number of requests to skip"),
     current_user: TokenData = Depends(get_current_user)
 ):
-    """Get file requests for an organization"""
+    """Get file requests for an organization, newest first, with pagination"""
     
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -242,18 +452,19 @@ async def get_file_requests(
     file_requests_collection, _ = get_file_collections()
     
     # Build query filter
-    query_filter = {
-        "$or": [
-            {"requester_org_id": org_id},
-            {"target_org_id": org_id}
-        ]
-    }
+    query_filter = org_side_filter(org_id, direction, "requester_org_id", "target_org_id")
     
     if status:
         query_filter["status"] = status
     
-    # Get file requests
-    requests = list(file_requests_collection.find(query_filter).sort("created_at", -1))
+    # Get one page of file requests
+    requests = list(
+        file_requests_collection.find(query_filter, FILE_REQUEST_LIST_PROJECTION)
+        .sort("created_at", -1)
+        .skip(offset)
+        .limit(limit)
+    )
+    total_count = file_requests_collection.count_documents(query_filter)
     
     # Format response
     formatted_requests = []
@@ -281,7 +492,13 @@ async def get_file_requests(
             "is_requester": req["requester_org_id"] == org_id
         })
     
-    return {"file_requests": formatted_requests}
+    return {
+        "file_requests": formatted_requests,
+        "total_count": total_count,
+        "limit": limit,
+        "offset": offset,
+        "has_more": (offset + limit) < total_count
+    }
 
 @router.post("/approve-request/{request_id}")
 async def approve_file_request(
@@ -291,7 +508,7 @@ async def approve_file_request(
     """Approve a file request"""
     
     # Verify user is from target organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can approve file requests")
     
@@ -347,7 +564,7 @@ async def reject_file_request(
     """Reject a file request"""
     
     # Verify user is from target organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can reject file requests")
     
@@ -399,6 +616,7 @@ async def reject_file_request(
 @router.post("/upload-file/{request_id}")
 async def upload_file_for_request(
     request_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     file_description: Optional[str] = Form(None),
     current_user: TokenData = Depends(get_current_user)
@@ -406,7 +624,7 @@ async def upload_file_for_request(
     """Upload a PDF file for an approved file request"""
     
     # Verify user is from target organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can upload files")
     
@@ -429,60 +647,64 @@ async def upload_file_for_request(
     if not validate_pdf_file(file):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Read file content
-    content = await file.read()
-    if len(content) > 50 * 1024 * 1024:  # 50MB limit
+    # Stream the upload to disk in chunks, hashing and encrypting it on the way
+    try:
+        staged = await stage_upload(file, FILE_STORAGE_DIR, MAX_SHARED_FILE_BYTES, encryptor=SegmentEncryptor())
+    except UploadTooLarge:
         raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
     
-    # Encrypt file content
-    encrypted_content = encrypt_pdf_content(content)
-    
-    # Generate file ID and save file
+    # Store the content once per unique SHA-256; repeat shares only add a reference
     file_id = generate_file_id()
-    file_path = FILE_STORAGE_DIR / f"{file_id}.pdf"
-    
-    with open(file_path, "wb") as f:
-        f.write(encrypted_content)
+    blob = get_blob_store().put(staged)
+    file_path = Path(blob["path"])
+    background_tasks.add_task(index_blob_pages, staged.sha256)
     
     # Get proper organization names
-    sender_org = organizations_collection.find_one({"org_id": user_org_id})
+    sender_org = get_organization_by_id(user_org_id)
     sender_org_name = sender_org.get("org_name", "Unknown") if sender_org else "Unknown"
     
     # Create shared file record
-    shared_file = SharedFile(
-        file_id=file_id,
-        contract_id=file_request["contract_id"],
-        sender_org_id=user_org_id,
-        sender_org_name=sender_org_name,
-        receiver_org_id=file_request["requester_org_id"],
-        receiver_org_name=file_request["requester_org_name"],
-        file_name=file.filename,
-        file_description=file_description or file_request["file_description"],
-        file_category=file_request["file_category"],
-        file_size=len(content),
-        file_path=str(file_path),
-        uploaded_at=datetime.utcnow(),
-        uploaded_by=str(current_user.user_id),  # Convert to string as expected by model
-        expires_at=file_request["expires_at"],
-        is_encrypted=False  # Set to False since we're not encrypting
-    )
+    try:
+        shared_file = SharedFile(
+            file_id=file_id,
+            contract_id=file_request["contract_id"],
+            sender_org_id=user_org_id,
+            sender_org_name=sender_org_name,
+            receiver_org_id=file_request["requester_org_id"],
+            receiver_org_name=file_request["requester_org_name"],
+            file_name=file.filename,
+            file_description=file_description or file_request["file_description"],
+            file_category=file_request["file_category"],
+            file_size=staged.size,
+            file_path=str(file_path),
+            uploaded_at=datetime.utcnow(),
+            uploaded_by=str(current_user.user_id),  # Convert to string as expected by model
+            expires_at=file_request["expires_at"],
+            is_encrypted=True
+        )
     
-    # Insert shared file record
-    shared_file_data = shared_file.model_dump(by_alias=True, exclude={"id"})
+        # Insert shared file record
+        shared_file_data = shared_file.model_dump(by_alias=True, exclude={"id"})
     
-    # Generate HMAC signature for file integrity
-    file_metadata = {
-        "file_id": file_id,
-        "file_name": file.filename,
-        "file_size": len(content),
-        "uploaded_at": shared_file_data["uploaded_at"].isoformat(),
-        "sender_org_id": user_org_id,
-        "receiver_org_id": file_request["requester_org_id"]
-    }
-    integrity_signature = generate_file_integrity_signature(content, file_metadata)
-    shared_file_data["integrity_signature"] = integrity_signature
+        # Generate HMAC signature for file integrity
+        file_metadata = {
+            "file_id": file_id,
+            "file_name": file.filename,
+            "file_size": staged.size,
+            "uploaded_at": shared_file_data["uploaded_at"].isoformat(),
+            "sender_org_id": user_org_id,
+            "receiver_org_id": file_request["requester_org_id"]
+        }
+        integrity_signature = generate_file_integrity_signature_for_hash(staged.sha256, file_metadata)
+        shared_file_data["integrity_signature"] = integrity_signature
+        shared_file_data["content_sha256"] = staged.sha256
     
-    shared_files_collection.insert_one(shared_file_data)
+        shared_files_collection.insert_one(shared_file_data)
+    except Exception as e:
+        # Drop the reference put() took so the blob does not outlive a failed upload
+        print(f"❌ [Upload] Error creating file record: {e}")
+        get_blob_store().release(staged.sha256)
+        raise HTTPException(status_code=500, detail=f"Error creating file record: {str(e)}")
     
     # Update file request
     file_requests_collection.update_one(
@@ -492,7 +714,7 @@ async def upload_file_for_request(
                 "status": "completed",
                 "uploaded_file_id": file_id,
                 "uploaded_file_name": file.filename,
-                "uploaded_file_size": len(content),
+                "uploaded_file_size": staged.size,
                 "uploaded_at": datetime.utcnow(),
                 "uploaded_by": str(current_user.user_id)  # Convert to string as expected by model
             }
@@ -512,7 +734,7 @@ async def upload_file_for_request(
         "created_at": datetime.utcnow(),
         "file_request_id": request_id,
         "file_id": file_id,
-        "file_size": len(content)
+        "file_size": staged.size
     }
     logs_collection.insert_one(log_entry)
     
@@ -520,11 +742,12 @@ async def upload_file_for_request(
         "message": "File uploaded successfully",
         "file_id": file_id,
         "file_name": file.filename,
-        "file_size": len(content)
+        "file_size": staged.size
     }
 
 @router.post("/direct-share")
 async def direct_file_share(
+    background_tasks: BackgroundTasks,
     target_org_id: str = Form(...),
     file_description: str = Form(...),
     file_category: str = Form("contract"),
@@ -553,7 +776,7 @@ async def direct_file_share(
         raise HTTPException(status_code=422, detail="file is required")
     
     # Verify user is from organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization users can share files")
     
@@ -568,20 +791,17 @@ async def direct_file_share(
     if not validate_pdf_file(file):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Read file content
-    content = await file.read()
-    if len(content) > 50 * 1024 * 1024:  # 50MB limit
+    # Stream the upload to disk in chunks, hashing and encrypting it on the way
+    try:
+        staged = await stage_upload(file, FILE_STORAGE_DIR, MAX_SHARED_FILE_BYTES, encryptor=SegmentEncryptor())
+    except UploadTooLarge:
         raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
     
-    # Encrypt file content
-    encrypted_content = encrypt_pdf_content(content)
-    
-    # Generate file ID and save file
+    # Store the content once per unique SHA-256; repeat shares only add a reference
     file_id = generate_file_id()
-    file_path = FILE_STORAGE_DIR / f"{file_id}.pdf"
-    
-    with open(file_path, "wb") as f:
-        f.write(encrypted_content)
+    blob = get_blob_store().put(staged)
+    file_path = Path(blob["path"])
+    background_tasks.add_task(index_blob_pages, staged.sha256)
     
     # Parse expiration date
     expiration_date = None
@@ -594,7 +814,7 @@ async def direct_file_share(
         expiration_date = datetime.utcnow() + timedelta(days=30)
     
     # Get proper organization names
-    sender_org = organizations_collection.find_one({"org_id": user.get("organization_id")})
+    sender_org = get_organization_by_id(user.get("organization_id"))
     sender_org_name = sender_org.get("org_name", "Unknown") if sender_org else "Unknown"
     
     print(f"🔍 [Direct Share] Sender org: {sender_org_name} (ID: {user.get('organization_id')})")
@@ -612,12 +832,12 @@ async def direct_file_share(
             file_name=file.filename,
             file_description=file_description,
             file_category=file_category,
-            file_size=len(content),
+            file_size=staged.size,
             file_path=str(file_path),
             uploaded_at=datetime.utcnow(),
             uploaded_by=str(current_user.user_id),  # Convert to string as expected by model
             expires_at=expiration_date,
-            is_encrypted=False  # Set to False since we're not encrypting
+            is_encrypted=True
         )
         
         print(f"✅ [Direct Share] SharedFile model created successfully")
@@ -629,13 +849,14 @@ async def direct_file_share(
         file_metadata = {
             "file_id": file_id,
             "file_name": file.filename,
-            "file_size": len(content),
+            "file_size": staged.size,
             "uploaded_at": shared_file_data["uploaded_at"].isoformat(),
             "sender_org_id": user.get("organization_id"),
             "receiver_org_id": target_org_id
         }
-        integrity_signature = generate_file_integrity_signature(content, file_metadata)
+        integrity_signature = generate_file_integrity_signature_for_hash(staged.sha256, file_metadata)
         shared_file_data["integrity_signature"] = integrity_signature
+        shared_file_data["content_sha256"] = staged.sha256
         
         shared_files_collection.insert_one(shared_file_data)
         print(f"✅ [Direct Share] File record inserted into database with integrity signature")
@@ -643,6 +864,7 @@ async def direct_file_share(
     except Exception as e:
         print(f"❌ [Direct Share] Error creating SharedFile model: {e}")
         print(f"❌ [Direct Share] Error type: {type(e)}")
+        get_blob_store().release(staged.sha256)
         raise HTTPException(status_code=500, detail=f"Error creating file record: {str(e)}")
     
     # Log the direct file share
@@ -658,7 +880,7 @@ async def direct_file_share(
         "created_at": datetime.utcnow(),
         "file_id": file_id,
         "target_org_id": target_org_id,
-        "file_size": len(content)
+        "file_size": staged.size
     }
     logs_collection.insert_one(log_entry)
     
@@ -666,18 +888,23 @@ async def direct_file_share(
         "message": "File shared successfully",
         "file_id": file_id,
         "file_name": file.filename,
-        "file_size": len(content)
+        "file_size": staged.size
     }
 
 @router.get("/shared-files/{org_id}")
 async def get_shared_files(
     org_id: str,
+    direction: Optional[str] = Query(None, pattern="^(outgoing|incoming)$", description="outgoing: files sent by this organization, incoming: files it received"),
+    status: Optional[str] = Query(None, pattern="^(active|expired)$", description="Filter by expiry status"),
+    file_category: Optional[str] = Query(None, description="Filter by file category"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum number of files to return"),
+    offset: int = Query(0, ge=0, description="Number of files to skip"),
     current_user: TokenData = Depends(get_current_user)
 ):
-    """Get shared files for an organization"""
+    """Get shared files for an organization, newest first, with pagination"""
     
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         raise HTTPException(status_code=403, detail="User not found")
     
@@ -686,13 +913,26 @@ async def get_shared_files(
     
     _, shared_files_collection = get_file_collections()
     
-    # Get shared files
-    shared_files = list(shared_files_collection.find({
-        "$or": [
-            {"sender_org_id": org_id},
-            {"receiver_org_id": org_id}
-        ]
-    }).sort("uploaded_at", -1))
+    # Build query filter
+    query_filter = org_side_filter(org_id, direction, "sender_org_id", "receiver_org_id")
+    
+    now = datetime.utcnow()
+    if status == "active":
+        query_filter["expires_at"] = {"$gt": now}
+    elif status == "expired":
+        query_filter["expires_at"] = {"$lte": now}
+    
+    if file_category:
+        query_filter["file_category"] = file_category
+    
+    # Get one page of shared files
+    shared_files = list(
+        shared_files_collection.find(query_filter, SHARED_FILE_LIST_PROJECTION)
+        .sort("uploaded_at", -1)
+        .skip(offset)
+        .limit(limit)
+    )
+    total_count = shared_files_collection.count_documents(query_filter)
     
     # Format response
     formatted_files = []
@@ -712,10 +952,17 @@ async def get_shared_files(
             "expires_at": file["expires_at"].isoformat(),
             "access_count": file.get("access_count", 0),
             "last_accessed": file.get("last_accessed", ""),
-            "is_sender": file["sender_org_id"] == org_id
+            "is_sender": file["sender_org_id"] == org_id,
+            "is_expired": now > file["expires_at"]
         })
     
-    return {"shared_files": formatted_files}
+    return {
+        "shared_files": formatted_files,
+        "total_count": total_count,
+        "limit": limit,
+        "offset": offset,
+        "has_more": (offset + limit) < total_count
+    }
 
 @router.get("/view-file/{file_id}")
 async def view_shared_file(
@@ -727,7 +974,7 @@ async def view_shared_file(
     print(f"🔍 [View File] Access attempt for file_id: {file_id} by user: {current_user.user_id}")
     
     # Verify user has access to this file
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         print(f"❌ [View File] Access denied - User not found or not organization user")
         raise HTTPException(status_code=403, detail="Only organization users can view shared files")
@@ -765,25 +1012,6 @@ async def view_shared_file(
         print(f"❌ [View File] File not found on disk: {file_path}")
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    # Read file content
-    try:
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-        
-        print(f"📄 [View File] File size: {len(file_content)} bytes")
-        
-        # Check if it's a valid PDF
-        if not file_content.startswith(b'%PDF'):
-            print(f"⚠️ [View File] File doesn't start with PDF signature")
-            # Try to serve it anyway, browser might handle it
-        
-        # For now, serve the file as-is since we removed encryption
-        pdf_content = file_content
-        
-    except Exception as e:
-        print(f"❌ [View File] Error reading file: {e}")
-        raise HTTPException(status_code=500, detail="Error reading file")
-    
     # Update access count and last accessed
     shared_files_collection.update_one(
         {"file_id": file_id},
@@ -794,7 +1022,7 @@ async def view_shared_file(
     )
     
     # Get proper organization name for logging
-    user_org = organizations_collection.find_one({"org_id": user_org_id})
+    user_org = get_organization_by_id(user_org_id)
     user_org_name = user_org.get("org_name", "Unknown") if user_org else "Unknown"
     
     # Log the file access with detailed information
@@ -817,9 +1045,10 @@ async def view_shared_file(
     
     print(f"✅ [View File] File access granted for user {current_user.user_id} from org {user_org_id}")
     
-    # Convert PDF to base64 for embedding in secure HTML
-    import base64
-    pdf_base64 = base64.b64encode(pdf_content).decode('utf-8')
+    # The PDF itself is streamed by the content endpoint so the viewer can
+    # load it incrementally with Range requests
+    content_token = create_file_content_token(file_id, user_org_id)
+    content_url = f"{BACKEND_URL}/file-sharing/content/{file_id}?token={content_token}"
     
     # Create secure HTML wrapper with copy protection
     secure_html = f"""
@@ -1005,7 +1234,7 @@ async def view_shared_file(
         <div class="pdf-container">
             <embed 
                 class="pdf-embed"
-                src="data:application/pdf;base64,{pdf_base64}#toolbar=0&navpanes=0&scrollbar=0&statusbar=0&messages=0&scrollbar=0&view=FitH"
+                src="{content_url}#toolbar=0&navpanes=0&scrollbar=0&statusbar=0&messages=0&scrollbar=0&view=FitH"
                 type="application/pdf"
                 width="100%"
                 height="100%"
@@ -1026,6 +1255,97 @@ async def view_shared_file(
         }
     ) 
 
+# Fields needed to authorize and read a shared file's content
+CONTENT_PROJECTION = {"_id": 0, "file_path": 1, "is_encrypted": 1, "content_sha256": 1, "expires_at": 1, "sender_org_id": 1, "receiver_org_id": 1}
+
+def get_shared_file_for_content_token(file_id: str, token: str) -> dict:
+    """Load a shared file for a content request, checking the token, access and expiry"""
+    token_org_id = verify_file_content_token(token, file_id)
+    if not token_org_id:
+        raise HTTPException(status_code=403, detail="Invalid or expired content token")
+    
+    _, shared_files_collection = get_file_collections()
+    shared_file = shared_files_collection.find_one({"file_id": file_id}, CONTENT_PROJECTION)
+    if not shared_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    if token_org_id not in [shared_file["sender_org_id"], shared_file["receiver_org_id"]]:
+        raise HTTPException(status_code=403, detail="Access denied to this file")
+    
+    if datetime.utcnow() > shared_file["expires_at"]:
+        raise HTTPException(status_code=400, detail="File has expired")
+    
+    return shared_file
+
+def get_shared_file_for_user(file_id: str, current_user: TokenData) -> tuple:
+    """Load a shared file for an organization user, returning (shared_file, user_org_id)"""
+    user = get_request_user(current_user.user_id)
+    if not user or user.get("user_type") != "organization":
+        raise HTTPException(status_code=403, detail="Only organization users can view shared files")
+    
+    _, shared_files_collection = get_file_collections()
+    shared_file = shared_files_collection.find_one({"file_id": file_id}, CONTENT_PROJECTION)
+    if not shared_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    user_org_id = user.get("organization_id")
+    if user_org_id not in [shared_file["sender_org_id"], shared_file["receiver_org_id"]]:
+        raise HTTPException(status_code=403, detail="Access denied to this file")
+    
+    if datetime.utcnow() > shared_file["expires_at"]:
+        raise HTTPException(status_code=400, detail="File has expired")
+    
+    return shared_file, user_org_id
+
+@router.get("/content/{file_id}")
+async def get_shared_file_content(
+    file_id: str,
+    request: Request,
+    token: str = Query(..., description="Content token issued by the viewer")
+):
+    """
+    Stream a shared PDF, honouring HTTP Range requests
+
+    Authorized by the short-lived token embedded in the viewer shell from
+    /view-file, since the browser's PDF viewer cannot send the bearer token.
+    The file is read and decrypted only for the requested byte range.
+    """
+    shared_file = get_shared_file_for_content_token(file_id, token)
+    
+    try:
+        total = shared_file_content_size(shared_file)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+    except DecryptionError:
+        raise HTTPException(status_code=500, detail="File failed integrity check")
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": "inline",
+        "X-Content-Type-Options": "nosniff",
+        "Cache-Control": "no-store, private"
+    }
+    
+    try:
+        byte_range = parse_range_header(request.headers.get("range"), total)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+    
+    if byte_range is None:
+        start, end, status_code = 0, total, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{total}"
+    headers["Content-Length"] = str(end - start)
+    
+    return StreamingResponse(
+        iter_shared_file_range(shared_file, start, end),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers
+    )
+
 
 
 @router.get("/organizations-with-contracts/{org_id}")
@@ -1038,7 +1358,7 @@ async def get_organizations_with_file_contracts(
     print(f"🔍 DEBUG: Getting organizations with contracts for org_id: {org_id}")
     
     # Verify user has access to this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user:
         print(f"❌ DEBUG: User not found for user_id: {current_user.user_id}")
         raise HTTPException(status_code=403, detail="User not found")
@@ -1095,4 +1415,97 @@ async def get_organizations_with_file_contracts(
             print(f"⚠️ DEBUG: Organization not found for ID: {org_id_from_contract}")
     
     print(f"📋 DEBUG: Returning {len(organizations)} organizations")
-    return {"organizations": organizations} 
\ No newline at end of file
+    return {"organizations": organizations}
+
+@router.get("/files/{file_id}/pages")
+async def get_shared_file_pages(
+    file_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get the page index of a shared PDF
+
+    Returns the page count and per-page offsets, sizes and thumbnail
+    availability, plus a content token for fetching individual pages from
+    /content/{file_id}/pages/{page}.
+    """
+    shared_file, user_org_id = get_shared_file_for_user(file_id, current_user)
+    
+    blob = get_blob_store().get(shared_file["content_sha256"]) if shared_file.get("content_sha256") else None
+    index = (blob or {}).get("pdf_index")
+    if not index:
+        raise HTTPException(status_code=404, detail="Page index not available for this file")
+    
+    pages = get_pdf_page_index().list_pages(shared_file["content_sha256"]) if index["status"] == "ready" else []
+    return {
+        "file_id": file_id,
+        "index_status": index["status"],
+        "page_count": index.get("page_count"),
+        "pages": pages,
+        "content_token": create_file_content_token(file_id, user_org_id)
+    }
+
+@router.get("/files/{file_id}/search")
+async def search_shared_file_text(
+    file_id: str,
+    q: str = Query(..., min_length=2, max_length=200, description="Text to search for"),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Search the text layer of a shared PDF, returning matching pages with snippets"""
+    shared_file, _ = get_shared_file_for_user(file_id, current_user)
+    if not shared_file.get("content_sha256"):
+        raise HTTPException(status_code=404, detail="Page index not available for this file")
+    
+    results = get_pdf_page_index().search(shared_file["content_sha256"], q, limit)
+    return {"file_id": file_id, "query": q, "results": results}
+
+@router.get("/content/{file_id}/pages/{page_number}")
+async def get_shared_file_page(
+    file_id: str,
+    page_number: int,
+    token: str = Query(..., description="Content token from the page index")
+):
+    """Get a single page of a shared PDF as a standalone PDF"""
+    shared_file = get_shared_file_for_content_token(file_id, token)
+    
+    def build_page():
+        with open_shared_file(shared_file) as stream:
+            return extract_page_pdf(stream, page_number)
+    
+    try:
+        page_pdf = await asyncio.to_thread(build_page)
+    except IndexError:
+        raise HTTPException(status_code=404, detail="Page not found")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+    except DecryptionError:
+        raise HTTPException(status_code=500, detail="File failed integrity check")
+    
+    return Response(
+        content=page_pdf,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": "inline",
+            "X-Content-Type-Options": "nosniff",
+            "Cache-Control": "no-store, private"
+        }
+    )
+
+@router.get("/content/{file_id}/pages/{page_number}/thumbnail")
+async def get_shared_file_page_thumbnail(
+    file_id: str,
+    page_number: int,
+    token: str = Query(..., description="Content token from the page index")
+):
+    """Get the PNG thumbnail of a page, if thumbnails were rendered at ingest"""
+    shared_file = get_shared_file_for_content_token(file_id, token)
+    thumbnail = get_pdf_page_index().get_thumbnail(shared_file.get("content_sha256"), page_number) if shared_file.get("content_sha256") else None
+    if not thumbnail:
+        raise HTTPException(status_code=404, detail="Thumbnail not available")
+    
+    return Response(
+        content=thumbnail,
+        media_type="image/png",
+        headers={"Cache-Control": "private, max-age=300"}
+    )
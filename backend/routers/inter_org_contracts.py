@@ -15,9 +15,10 @@ from models import (
     InterOrgContract, CreateInterOrgContract, UpdateInterOrgContract, RespondToContract,
     ContractResource, ContractUpdateRequest, ContractDeletionRequest, ContractActionRequest, ContractVersion, ContractAuditLog
 )
-from helpers import users_collection, policies_collection, logs_collection, get_organization_by_id, organizations_collection
+from helpers import policies_collection, logs_collection, get_organization_by_id, organizations_collection, get_request_user
 from jwt_utils import get_current_user, TokenData
 from routers.websocket import send_user_update
+from services.contract_index import contract_permission_index
 
 load_dotenv()
 
@@ -98,7 +99,7 @@ async def create_inter_org_contract(
     print(f"DEBUG: current_user: {current_user}")
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     print(f"DEBUG: Found user: {user}")
     
     if not user:
@@ -185,6 +186,7 @@ async def create_inter_org_contract(
     # Insert into database - exclude id field to let MongoDB generate new _id
     contract_data = contract.model_dump(by_alias=True, exclude={"id"})
     result = inter_org_contracts_collection.insert_one(contract_data)
+    contract_permission_index.invalidate(source_org["org_id"], target_org["org_id"])
     
     # Send WebSocket notification to target organization
     await send_user_update(
@@ -243,7 +245,7 @@ async def get_organization_contracts(org_id: str, current_user: TokenData = Depe
         raise HTTPException(status_code=500, detail="Database connection error")
     
     # Verify user is admin of this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     print(f"DEBUG: Found user: {user}")
     
     if not user:
@@ -358,7 +360,7 @@ async def update_inter_org_contract(
     """Update an existing inter-organization contract"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can update contracts")
     
@@ -437,6 +439,7 @@ async def update_inter_org_contract(
     # Insert update contract - exclude id field to let MongoDB generate new _id
     update_contract_data = update_contract.model_dump(by_alias=True, exclude={"id"})
     result = inter_org_contracts_collection.insert_one(update_contract_data)
+    contract_permission_index.invalidate(original_contract["source_org_id"], original_contract["target_org_id"])
     
     # Send WebSocket notification to target organization
     await send_user_update(
@@ -465,7 +468,7 @@ async def respond_to_contract(
         raise HTTPException(status_code=404, detail="Contract not found")
     
     # Verify user is admin of the target organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can respond to contracts")
     
@@ -499,11 +502,13 @@ async def respond_to_contract(
                     {"contract_id": contract["original_contract_id"]},
                     {"$set": original_update}
                 )
+                contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
     
     inter_org_contracts_collection.update_one(
         {"contract_id": response_data.contract_id},
         {"$set": update_data}
     )
+    contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
     
     # Send WebSocket notification to source organization
     await send_user_update(
@@ -568,7 +573,7 @@ async def get_active_contracts(org_id: str, current_user: TokenData = Depends(ge
     """Get all active contracts for an organization"""
     
     # Verify user is admin of this organization
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("organization_id") != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
@@ -710,7 +715,7 @@ async def update_contract(
     """Update an existing contract (requires approval from other organization)"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can update contracts")
     
@@ -786,6 +791,7 @@ async def update_contract(
         {"contract_id": existing_contract["contract_id"]},
         {"$set": updated_contract_data}
     )
+    contract_permission_index.invalidate(existing_contract["source_org_id"], existing_contract["target_org_id"])
     
     # Log the update request
     client_ip = get_client_ip(http_request)
@@ -844,7 +850,7 @@ async def request_contract_deletion(
     """Request deletion of a contract (requires approval from other organization)"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can delete contracts")
     
@@ -879,6 +885,7 @@ async def request_contract_deletion(
         {"contract_id": deletion_data.contract_id},
         {"$set": deletion_request}
     )
+    contract_permission_index.invalidate(existing_contract["source_org_id"], existing_contract["target_org_id"])
     
     # Log the deletion request
     client_ip = get_client_ip(http_request)
@@ -929,7 +936,7 @@ async def approve_contract_action(
     """Approve or reject contract actions (updates, deletions)"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can approve contract actions")
     
@@ -987,6 +994,7 @@ async def approve_contract_action(
                         }
                     }
                 )
+                contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
                 
                 await log_contract_action(
                     contract_id=action_data.contract_id,
@@ -1017,6 +1025,7 @@ async def approve_contract_action(
                     }
                 }
             )
+            contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
             
             await log_contract_action(
                 contract_id=action_data.contract_id,
@@ -1058,6 +1067,7 @@ async def approve_contract_action(
                     }
                 }
             )
+            contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
             
             await log_contract_action(
                 contract_id=action_data.contract_id,
@@ -1085,6 +1095,7 @@ async def approve_contract_action(
                     }
                 }
             )
+            contract_permission_index.invalidate(contract["source_org_id"], contract["target_org_id"])
             
             await log_contract_action(
                 contract_id=action_data.contract_id,
@@ -1110,7 +1121,7 @@ async def get_contract_versions(
     """Get version history for a contract"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can view contract versions")
     
@@ -1155,7 +1166,7 @@ async def get_contract_audit_logs(
     """Get audit logs for a contract"""
     
     # Verify current user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can view contract audit logs")
     
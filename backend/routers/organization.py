@@ -1,18 +1,20 @@
 import json
-from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi import APIRouter, HTTPException, Request, Depends, Query, Response
 from datetime import datetime
 from fastapi.encoders import jsonable_encoder
 from typing import List, Optional
 from pydantic import BaseModel
 
 from helpers import (
-    organizations_collection, users_collection, user_pii_collection, 
+    organizations_collection, users_collection, pii_store, 
     policies_collection, logs_collection, get_organization_by_id,
-    get_organization_clients, encrypt_pii, decrypt_pii
+    get_organization_clients, aggregate_organization_clients,
+    encrypt_pii, decrypt_pii, get_request_user
 )
 from routers.auth import get_current_user
 from jwt_utils import TokenData
-from routers.policy import create_policy_internal
+from routers.policy import create_policies_batch
+from services.contract_index import contract_permission_index
 from routers.pii_tokenizer import (
     tokenize_aadhaar, tokenize_pan, tokenize_account, tokenize_ifsc,
     tokenize_creditcard, tokenize_debitcard, tokenize_gst,
@@ -86,10 +88,17 @@ async def get_organizations():
     return {"organizations": organizations}
 
 @router.get("/{org_id}/clients")
-async def get_organization_clients_endpoint(org_id: str, current_user: TokenData = Depends(get_current_user)):
+async def get_organization_clients_endpoint(
+    org_id: str,
+    sort_by: str = Query("created_at", pattern="^(created_at|username|full_name|user_id|last_consent_date)$", description="Field to sort clients by"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of clients to return; all of them when omitted"),
+    offset: int = Query(0, ge=0, description="Number of clients to skip"),
+    current_user: TokenData = Depends(get_current_user)
+):
     """Get all clients (users who have shared data) for an organization"""
     # Verify user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can access this endpoint")
     
@@ -99,15 +108,21 @@ async def get_organization_clients_endpoint(org_id: str, current_user: TokenData
         raise HTTPException(status_code=404, detail="Organization not found")
     
     # Get clients through policies
-    clients = get_organization_clients(org_id)
+    clients, total_count = get_organization_clients(org_id, sort_by, sort_order, offset, limit)
     
-    return {"clients": clients}
+    return {
+        "clients": clients,
+        "total_count": total_count,
+        "limit": limit,
+        "offset": offset,
+        "has_more": limit is not None and (offset + limit) < total_count
+    }
 
 @router.get("/{org_id}/clients/{user_id}/pii")
 async def get_client_pii(org_id: str, user_id: int, current_user: TokenData = Depends(get_current_user)):
     """Get PII data for a specific client"""
     # Verify user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can access this endpoint")
     
@@ -117,28 +132,19 @@ async def get_client_pii(org_id: str, user_id: int, current_user: TokenData = De
         raise HTTPException(status_code=404, detail="Organization not found")
     
     # Verify user has shared data with this org (has policies)
-    # Check for policies using both target_org_id and shared_with (org name)
+    # org_ids covers both target_org_id and shared_with (org name)
     user_policies = list(policies_collection.find({
         "user_id": user_id,
-        "$or": [
-            {"target_org_id": org_id},
-            {"shared_with": org.get("org_name", "")}
-        ],
+        "org_ids": org_id,
         "is_revoked": {"$ne": True}
     }))
     
     if not user_policies:
         raise HTTPException(status_code=404, detail=f"User has not shared data with this organization. User ID: {user_id}, Org ID: {org_id}, Org Name: {org.get('org_name', 'N/A')}")
     # Get user's PII data
-    user_pii_doc = user_pii_collection.find_one({"user_id": user_id})
-    if not user_pii_doc:
-        return {"pii": [], "active_policies": []}
-    # Filter PII by resources that user has policies for
+    # Only fetch PII for resources that user has policies for
     policy_resources = set([policy["resource_name"] for policy in user_policies])
-    accessible_pii = [
-        pii for pii in user_pii_doc.get("pii", [])
-        if pii["resource"] in policy_resources
-    ]
+    accessible_pii = pii_store.get_entries(user_id, policy_resources)
     # Detokenize (decrypt) the PII values
     from helpers import decrypt_pii
     pii_data = []
@@ -175,7 +181,7 @@ async def share_data_with_organization(
 ):
     """Share user data with another organization (inter-organization sharing)"""
     # Verify user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can share data")
     
@@ -204,39 +210,19 @@ async def share_data_with_organization(
         raise HTTPException(status_code=403, detail="Source organization does not have access to this user's data")
     
     # Get user's PII data
-    user_pii_doc = user_pii_collection.find_one({"user_id": request.user_id})
-    if not user_pii_doc:
+    if not pii_store.list_resources(request.user_id):
         raise HTTPException(status_code=404, detail="No PII data found for this user")
     
     # Check for active contracts between the organizations
     
-    active_contracts = list(inter_org_contracts_collection.find({
-        "$or": [
-            {"source_org_id": org_id, "target_org_id": request.target_org_id},
-            {"source_org_id": request.target_org_id, "target_org_id": org_id}
-        ],
-        "status": "active",
-        "approval_status": "approved"
-    }))
-    
-    if not active_contracts:
+    permissions = contract_permission_index.for_org(org_id)
+    if not permissions.contracts_with(request.target_org_id):
         raise HTTPException(status_code=400, detail="No active contracts found between the organizations")
     
     # Find contracts that support the requested resources
-    supporting_contracts = []
-    for contract in active_contracts:
-        contract_resources = []
-        if contract.get("resources_allowed"):
-            for resource in contract.get("resources_allowed", []):
-                if isinstance(resource, dict) and "resource_name" in resource:
-                    contract_resources.append(resource["resource_name"])
-                else:
-                    contract_resources.append(str(resource))
-        
-        # Check if this contract supports all requested resources
-        unauthorized_resources = [r for r in request.resources if r not in contract_resources]
-        if not unauthorized_resources:
-            supporting_contracts.append(contract)
+    supporting_contracts = [
+        entry["contract"] for entry in permissions.supporting_contracts(request.target_org_id, request.resources)
+    ]
     
     if not supporting_contracts:
         raise HTTPException(
@@ -248,18 +234,17 @@ async def share_data_with_organization(
     selected_contract = supporting_contracts[0]
     
     # Filter PII by requested resources and available data
-    available_pii = [
-        pii for pii in user_pii_doc.get("pii", [])
-        if pii["resource"] in request.resources
-    ]
+    available_pii = pii_store.get_entries(request.user_id, request.resources)
     
     if not available_pii:
         raise HTTPException(status_code=404, detail="No PII data found for requested resources")
     
-    # Create policies for each resource
-    created_policies = []
+    # Create policies for all resources in one batch
     client_ip = get_client_ip(http_request) if http_request else "unknown"
+    from models import UserInputPII
     
+    policy_items = []
+    access_logs = []
     for pii in available_pii:
         # Find matching contract resource
         contract_resource = next(
@@ -274,21 +259,16 @@ async def share_data_with_organization(
         decrypted_pii = decrypt_pii(pii["original"])
         
         # Create policy for inter-org sharing using the selected contract
-        from models import UserInputPII
-        policy_input = UserInputPII(pii_value=decrypted_pii, resource=pii["resource"])
-        policy_result = create_policy_internal(
-            policy_input, 
-            user_id=request.user_id,
-            ip_address=client_ip,
-            contract_override=selected_contract,
-            source_org_id=org_id,
-            target_org_id=request.target_org_id
-        )
-        
-        created_policies.append(policy_result)
+        policy_items.append({
+            "data": UserInputPII(pii_value=decrypted_pii, resource=pii["resource"]),
+            "user_id": request.user_id,
+            "contract_override": selected_contract,
+            "source_org_id": org_id,
+            "target_org_id": request.target_org_id
+        })
         
         # Log inter-org data sharing
-        log_entry = {
+        access_logs.append({
             "user_id": request.user_id,
             "fintech_name": target_org["org_name"],
             "resource_name": pii["resource"],
@@ -301,8 +281,11 @@ async def share_data_with_organization(
             "contract_id": selected_contract["contract_id"],
             "contract_name": selected_contract.get("contract_name", "Legacy Contract"),
             "created_at": datetime.utcnow()
-        }
-        logs_collection.insert_one(log_entry)
+        })
+    
+    created_policies = create_policies_batch(policy_items, ip_address=client_ip)
+    if access_logs:
+        logs_collection.insert_many(access_logs)
     
     return {
         "message": f"Data shared successfully with {target_org['org_name']} using contract '{selected_contract.get('contract_name', 'Legacy Contract')}'",
@@ -319,7 +302,7 @@ async def share_data_with_organization(
 async def get_data_requests(org_id: str, current_user: TokenData = Depends(get_current_user)):
     """Get data requests received by this organization"""
     # Verify user is an organization admin
-    user = users_collection.find_one({"userid": current_user.user_id})
+    user = get_request_user(current_user.user_id)
     if not user or user.get("user_type") != "organization":
         raise HTTPException(status_code=403, detail="Only organization admins can access this endpoint")
     
@@ -368,59 +351,43 @@ async def get_organization(org_id: str):
     }
 
 @router.get("/{org_id}/users")
-async def get_organization_users(org_id: str):
-    """Get all users managed by an organization"""
-    # Get organization details to find the org name
-    org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
-    
-    # Get users who have policies with this organization (by ID or name)
-    user_policies = list(policies_collection.find({
-        "$or": [
-            {"target_org_id": org_id},
-            {"shared_with": org_name}
-        ]
-    }))
-    
-    # Get unique user IDs
-    user_ids = list(set([policy["user_id"] for policy in user_policies]))
+async def get_organization_users(
+    org_id: str,
+    response: Response,
+    sort_by: str = Query("last_consent_date", pattern="^(last_consent_date|active_policies_count|username|full_name|user_id)$", description="Field to sort users by"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of users to return; all of them when omitted"),
+    offset: int = Query(0, ge=0, description="Number of users to skip"),
+):
+    """
+    Get users managed by an organization
+
+    The body stays a plain list; the total number of users is returned in
+    the X-Total-Count header for paging.
+    """
+    # Users who have policies with this organization (by ID or name)
+    clients, total_count = aggregate_organization_clients(
+        org_id, include_shared_with=True,
+        sort_by=sort_by, sort_order=sort_order, offset=offset, limit=limit,
+        include_access_counts=True
+    )
+    response.headers["X-Total-Count"] = str(total_count)
     
-    # Get user details
     users = []
-    for user_id in user_ids:
-        user = users_collection.find_one({"userid": user_id})
-        if user:
-            # Get user's shared resources
-            user_policies_for_org = [p for p in user_policies if p["user_id"] == user_id]
-            shared_resources = list(set([p["resource_name"] for p in user_policies_for_org]))
-            
-            # Get active policies count
-            active_policies = len([p for p in user_policies_for_org if not p.get("is_revoked", False)])
-            
-            # Get last consent date
-            last_consent = None
-            if user_policies_for_org:
-                latest_policy = max(user_policies_for_org, key=lambda x: x.get("created_at", datetime.min))
-                last_consent = latest_policy.get("created_at")
-            
-            # Get total data access count from audit logs
-            data_access_count = logs_collection.count_documents({
-                "user_id": user_id,
-                "target_org_id": org_id,
-                "log_type": "data_access"
-            })
-            
-            users.append({
-                "user_id": user["userid"],
-                "username": user["username"],
-                "full_name": user["full_name"],
-                "email": user["email"],
-                "phone_number": user["phone_number"],
-                "shared_resources": shared_resources,
-                "active_policies_count": active_policies,
-                "last_consent_date": last_consent.isoformat() if last_consent else None,
-                "total_data_access_count": data_access_count
-            })
+    for client in clients:
+        user = client["user"]
+        last_consent = client.get("last_consent_date")
+        users.append({
+            "user_id": user["userid"],
+            "username": user["username"],
+            "full_name": user["full_name"],
+            "email": user["email"],
+            "phone_number": user["phone_number"],
+            "shared_resources": client["shared_resources"],
+            "active_policies_count": client["active_policies_count"],
+            "last_consent_date": last_consent.isoformat() if last_consent else None,
+            "total_data_access_count": client["total_data_access_count"]
+        })
     
     return users
 
@@ -441,37 +408,40 @@ async def get_all_organizations():
     return {"organizations": organizations}
 
 @router.get("/{org_id}/all-users")
-async def get_all_users_by_organization(org_id: str):
-    """Get all users that have shared data with a specific organization"""
+async def get_all_users_by_organization(
+    org_id: str,
+    sort_by: str = Query("username", pattern="^(username|full_name|user_id|last_consent_date)$", description="Field to sort users by"),
+    sort_order: str = Query("asc", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximum number of users to return; all of them when omitted"),
+    offset: int = Query(0, ge=0, description="Number of users to skip"),
+):
+    """Get users that have shared data with a specific organization"""
     # Get organization details
     org = get_organization_by_id(org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    org_name = org["org_name"]
-    
-    # Get users who have policies with this organization (by ID or name)
-    user_policies = list(policies_collection.find({
-        "$or": [
-            {"target_org_id": org_id},
-            {"shared_with": org_name}
-        ]
-    }))
-    
-    # Get unique user IDs
-    user_ids = list(set([policy["user_id"] for policy in user_policies]))
-    
-    # Get user details
-    users = []
-    for user_id in user_ids:
-        user = users_collection.find_one({"userid": user_id})
-        if user:
-            users.append({
-                "user_id": user["userid"],
-                "username": user["username"],
-                "full_name": user["full_name"],
-                "email": user["email"],
-                "phone_number": user["phone_number"]
-            })
+    # Users who have policies with this organization (by ID or name)
+    clients, total_count = aggregate_organization_clients(
+        org_id, include_shared_with=True,
+        sort_by=sort_by, sort_order=sort_order, offset=offset, limit=limit
+    )
+    
+    users = [
+        {
+            "user_id": client["user"]["userid"],
+            "username": client["user"]["username"],
+            "full_name": client["user"]["full_name"],
+            "email": client["user"]["email"],
+            "phone_number": client["user"]["phone_number"]
+        }
+        for client in clients
+    ]
     
-    return {"users": users} 
\ No newline at end of file
+    return {
+        "users": users,
+        "total_count": total_count,
+        "limit": limit,
+        "offset": offset,
+        "has_more": limit is not None and (offset + limit) < total_count
+    } 
\ No newline at end of file
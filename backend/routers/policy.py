@@ -6,9 +6,12 @@ from fastapi.encoders import jsonable_encoder
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from models import PIIInput
-from typing import Optional
+from typing import List, Optional
 
-from helpers import generate_policy_signature
+from helpers import generate_policy_signatures
+from services.dashboard_cache import invalidate_org_dashboard
+from services.compliance_summary import ComplianceSummaryStore
+from services.org_identity import OrgStampedCollection, stamp_log, stamp_policy
 from routers.pii_tokenizer import (
     tokenize_aadhaar, tokenize_pan, tokenize_account, tokenize_ifsc,
     tokenize_creditcard, tokenize_debitcard, tokenize_gst,
@@ -24,11 +27,20 @@ router = APIRouter(prefix="/policy", tags=["Policy"])
 MONGO_URL = os.getenv("MONGO_URL")
 client = MongoClient(MONGO_URL)
 db = client.get_database("PedolOne")
-policies_collection = db.get_collection("policy")
+# Inserts are stamped with canonical org ids (see services.org_identity)
+policies_collection = OrgStampedCollection(db.get_collection("policy"), stamp_policy)
 policies_collection.create_index("expiry", expireAfterSeconds=0)
+policies_collection.create_index("target_org_id")
+policies_collection.create_index("shared_with")
+policies_collection.create_index([("user_id", 1), ("target_org_id", 1)])
+policies_collection.create_index([("org_ids", 1), ("user_id", 1)])
+
+# Compliance counts per organization, recomputed only when stale
+compliance_summaries = ComplianceSummaryStore(db.get_collection("policy_compliance_summaries"), policies_collection)
 
 # New: logs collection for audit logs
-logs_collection = db.get_collection("logs")
+logs_collection = OrgStampedCollection(db.get_collection("logs"), stamp_log)
+logs_collection.create_index([("related_org_ids", 1), ("created_at", -1)])
 
 with open("routers/contract.json") as f:
     contract = json.load(f)
@@ -50,81 +62,134 @@ TOKENIZER_MAP = {
 
 def create_policy_internal(data: UserInputPII, user_id: int, ip_address: str = None, contract_override: Optional[dict] = None, source_org_id: str = None, target_org_id: str = None):
     """Internal function to create policy with additional parameters for inter-org sharing"""
-    pii_value = data.pii_value.strip()
-    resource = data.resource.strip().lower()
+    return create_policies_batch([{
+        "data": data,
+        "user_id": user_id,
+        "contract_override": contract_override,
+        "source_org_id": source_org_id,
+        "target_org_id": target_org_id
+    }], ip_address=ip_address)[0]
 
-    # Use override contract if provided, else default
-    use_contract = contract_override if contract_override is not None else contract
+def create_policies_batch(items: List[dict], ip_address: str = None) -> List[dict]:
+    """
+    Create many policies in one round trip
 
-    if resource not in TOKENIZER_MAP:
-        raise HTTPException(status_code=400, detail=f"Unsupported resource type: {resource}")
+    Every item is tokenized and checked against its contract before anything
+    is written, so an invalid item rejects the whole batch. Policies are then
+    signed together and written with a single insert_many, followed by one
+    insert_many for their consent logs.
 
-    matched = next((r for r in use_contract["resources_allowed"] if r["resource_name"] == resource), None)
-    if not matched:
-        raise HTTPException(status_code=404, detail=f"{resource} not allowed by contract")
+    Args:
+        items: Dicts with "data" (UserInputPII) and "user_id", and optionally
+            "contract_override", "source_org_id" and "target_org_id"
+        ip_address: Client IP recorded on the consent logs
 
-    try:
-        token_response = TOKENIZER_MAP[resource](PIIInput(pii_value=pii_value))
-        token = token_response["token"]
-    except HTTPException as e:
-        raise e
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    Returns:
+        The created policies, in the same order as items
+    """
+    if not items:
+        return []
 
     created_at = datetime.utcnow()
-    retention_days = int(matched["retention_window"].split()[0])
-    expiry = created_at + timedelta(days=retention_days)
-
-    policy_data = {
-        "tokenid": token,
-        "resource_name": resource,
-        "purpose": matched["purpose"],
-        "shared_with": use_contract["organization_name"],
-        "contract_id": use_contract["contract_id"],
-        "retention_window": matched["retention_window"],
-        "created_at": created_at,
-        "expiry": expiry,
-        "user_id": user_id
-    }
-    
-    # Add inter-org sharing fields if provided
-    if source_org_id:
-        policy_data["source_org_id"] = source_org_id
-    if target_org_id:
-        policy_data["target_org_id"] = target_org_id
-
-    signature_payload = json.dumps(
-        {k: str(v) if isinstance(v, datetime) else v for k, v in policy_data.items()},
-        sort_keys=True
-    )
-    policy_data["signature"] = generate_policy_signature(signature_payload)
-
-    result = policies_collection.insert_one(policy_data)
-    policy_data["_id"] = str(result.inserted_id)
-
-    # Write to logs collection using LogEntry model
-    log_entry = LogEntry(
-        user_id=user_id,
-        fintech_name=use_contract["organization_name"],
-        fintech_id=str(use_contract.get("organization_id") or use_contract.get("org_id") or ""),
-        resource_name=resource,
-        purpose=matched["purpose"] if isinstance(matched["purpose"], list) else [matched["purpose"]],
-        log_type="consent",
-        ip_address=ip_address,
-        data_source="individual",
-        created_at=created_at,
-        source_org_id=source_org_id,
-        target_org_id=target_org_id if target_org_id else None
-    ).dict(by_alias=True)
-    # If target_org_id is set, set data_source to organization
-    if target_org_id:
-        log_entry["data_source"] = "organization"
-    # Remove _id if None to avoid duplicate key error
-    if log_entry.get("_id") is None:
-        log_entry.pop("_id")
-    logs_collection.insert_one(log_entry)
-
-    return jsonable_encoder(policy_data)
+    policies = []
+    log_entries = []
+
+    for item in items:
+        data = item["data"]
+        user_id = item["user_id"]
+        source_org_id = item.get("source_org_id")
+        target_org_id = item.get("target_org_id")
+
+        pii_value = data.pii_value.strip()
+        resource = data.resource.strip().lower()
+
+        # Use override contract if provided, else default
+        use_contract = item.get("contract_override") if item.get("contract_override") is not None else contract
+
+        if resource not in TOKENIZER_MAP:
+            raise HTTPException(status_code=400, detail=f"Unsupported resource type: {resource}")
+
+        matched = next((r for r in use_contract["resources_allowed"] if r["resource_name"] == resource), None)
+        if not matched:
+            raise HTTPException(status_code=404, detail=f"{resource} not allowed by contract")
+
+        try:
+            token_response = TOKENIZER_MAP[resource](PIIInput(pii_value=pii_value))
+            token = token_response["token"]
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        retention_days = int(matched["retention_window"].split()[0])
+        expiry = created_at + timedelta(days=retention_days)
+
+        policy_data = {
+            "tokenid": token,
+            "resource_name": resource,
+            "purpose": matched["purpose"],
+            "shared_with": use_contract["organization_name"],
+            "contract_id": use_contract["contract_id"],
+            "retention_window": matched["retention_window"],
+            "created_at": created_at,
+            "expiry": expiry,
+            "user_id": user_id
+        }
+        
+        # Add inter-org sharing fields if provided
+        if source_org_id:
+            policy_data["source_org_id"] = source_org_id
+        if target_org_id:
+            policy_data["target_org_id"] = target_org_id
+        policies.append(policy_data)
+
+        # Write to logs collection using LogEntry model
+        log_entry = LogEntry(
+            user_id=user_id,
+            fintech_name=use_contract["organization_name"],
+            fintech_id=str(use_contract.get("organization_id") or use_contract.get("org_id") or ""),
+            resource_name=resource,
+            purpose=matched["purpose"] if isinstance(matched["purpose"], list) else [matched["purpose"]],
+            log_type="consent",
+            ip_address=ip_address,
+            data_source="individual",
+            created_at=created_at,
+            source_org_id=source_org_id,
+            target_org_id=target_org_id if target_org_id else None
+        ).dict(by_alias=True)
+        # If target_org_id is set, set data_source to organization
+        if target_org_id:
+            log_entry["data_source"] = "organization"
+        # Remove _id if None to avoid duplicate key error
+        if log_entry.get("_id") is None:
+            log_entry.pop("_id")
+        log_entries.append(log_entry)
+
+    signature_payloads = [
+        json.dumps(
+            {k: str(v) if isinstance(v, datetime) else v for k, v in policy_data.items()},
+            sort_keys=True
+        )
+        for policy_data in policies
+    ]
+    for policy_data, signature in zip(policies, generate_policy_signatures(signature_payloads)):
+        policy_data["signature"] = signature
+
+    result = policies_collection.insert_many(policies)
+    for policy_data, inserted_id in zip(policies, result.inserted_ids):
+        policy_data["_id"] = str(inserted_id)
+    compliance_summaries.invalidate(org_id for policy_data in policies for org_id in policy_data.get("org_ids", []))
+
+    logs_collection.insert_many(log_entries)
+
+    # Policy-derived dashboard sections are stale for every org involved
+    affected_orgs = set()
+    for log_entry in log_entries:
+        affected_orgs.update([log_entry["fintech_id"], log_entry.get("source_org_id"), log_entry.get("target_org_id")])
+    for org_id in affected_orgs:
+        invalidate_org_dashboard(org_id, "data_categories", "compliance", "access_logs")
+
+    return [jsonable_encoder(policy_data) for policy_data in policies]
 
 @router.post("/input")
 def create_policy(data: UserInputPII, user_id: int, contract_override: Optional[dict] = None):
@@ -247,28 +312,26 @@ async def get_organization_data_categories(org_id: str):
 @router.get("/compliance/org/{org_id}")
 async def get_organization_compliance_metrics(org_id: str):
     """Get compliance metrics for an organization"""
-    # Get organization details to find the org name
-    from helpers import get_organization_by_id
-    org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
-    
-    # Get all policies for this organization (by ID or name)
-    policies = list(policies_collection.find({
-        "$or": [
-            {"target_org_id": org_id},
-            {"shared_with": org_name}
-        ]
-    }))
-    
-    total_policies = len(policies)
-    active_policies = len([p for p in policies if not p.get("is_revoked", False)])
-    
+    return compute_compliance_metrics(org_id)
+
+def compute_compliance_metrics(org_id: str) -> list:
+    """
+    Compute compliance metrics for an already-resolved organization
+
+    Counts come from the organization's materialized compliance summary,
+    which is only recomputed after its policies change or expire.
+    """
+    counts = compliance_summaries.get_counts(org_id)
+    total_policies = counts.get("total", 0)
+
+    def percentage(key):
+        return round((counts.get(key, 0) / total_policies * 100), 1) if total_policies > 0 else 0
+
     # Calculate compliance metrics
     metrics = []
     
     # Data Processing Consent
-    consent_policies = len([p for p in policies if p.get("consent_given", False)])
-    consent_percentage = round((consent_policies / total_policies * 100), 1) if total_policies > 0 else 0
+    consent_percentage = percentage("consent")
     metrics.append({
         "metric": "Data Processing Consent",
         "value": f"{consent_percentage}%",
@@ -276,8 +339,7 @@ async def get_organization_compliance_metrics(org_id: str):
     })
     
     # Purpose Limitation
-    purpose_limited = len([p for p in policies if p.get("purpose") and len(p["purpose"]) <= 3])
-    purpose_percentage = round((purpose_limited / total_policies * 100), 1) if total_policies > 0 else 0
+    purpose_percentage = percentage("purpose_limited")
     metrics.append({
         "metric": "Purpose Limitation",
         "value": f"{purpose_percentage}%",
@@ -285,8 +347,7 @@ async def get_organization_compliance_metrics(org_id: str):
     })
     
     # Data Minimization
-    minimized = len([p for p in policies if p.get("resource_name") in ["aadhaar", "pan", "account"]])
-    minimization_percentage = round((minimized / total_policies * 100), 1) if total_policies > 0 else 0
+    minimization_percentage = percentage("minimized")
     metrics.append({
         "metric": "Data Minimization",
         "value": f"{minimization_percentage}%",
@@ -294,8 +355,7 @@ async def get_organization_compliance_metrics(org_id: str):
     })
     
     # Retention Compliance
-    retention_compliant = len([p for p in policies if p.get("retention_window") and "30" in p["retention_window"]])
-    retention_percentage = round((retention_compliant / total_policies * 100), 1) if total_policies > 0 else 0
+    retention_percentage = percentage("retention_compliant")
     metrics.append({
         "metric": "Retention Compliance",
         "value": f"{retention_percentage}%",
@@ -315,18 +375,8 @@ async def get_organization_compliance_metrics(org_id: str):
 @router.get("/org/{org_id}/data_categories")
 async def get_organization_data_categories(org_id: str):
     """Get data categories and usage statistics for an organization"""
-    # Get organization details to find the org name
-    from helpers import get_organization_by_id
-    org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
-    
-    # Get all policies for this organization (by ID or name)
-    policies = list(policies_collection.find({
-        "$or": [
-            {"target_org_id": org_id},
-            {"shared_with": org_name}
-        ]
-    }))
+    # Get all policies for this organization (org_ids covers target_org_id and shared_with)
+    policies = list(policies_collection.find({"org_ids": org_id}, {"_id": 0, "user_id": 1, "resource_name": 1}))
     
     # Count unique users
     unique_users = len(set([p["user_id"] for p in policies]))
@@ -360,21 +410,12 @@ async def get_organization_data_categories(org_id: str):
 @router.get("/org-dashboard/{org_id}/logs")
 def get_org_access_logs(org_id: str, limit: int = 50):
     """Get recent access logs for an organization's PII by fintech_id, requester_org_id, responder_org_id, or target_org_id"""
-    # Get organization details to find the org name
-    from helpers import get_organization_by_id
-    org = get_organization_by_id(org_id)
-    org_name = org["org_name"] if org else org_id
-    
+    return fetch_org_access_logs(org_id, limit)
+
+def fetch_org_access_logs(org_id: str, limit: int = 50) -> list:
+    """Fetch recent access logs that mention an organization in any org field (see related_org_ids)"""
     logs = list(logs_collection.find(
-        {"$or": [
-            {"fintech_id": org_id},
-            {"requester_org_id": org_id},
-            {"responder_org_id": org_id},
-            {"target_org_id": org_id},
-            {"source_org_id": org_id},
-            {"organization_id": org_id},  # For login logs
-            {"fintech_name": org_name}  # Fallback for logs that use org name
-        ]},
+        {"related_org_ids": org_id},
         sort=[("created_at", -1)],
         limit=limit
     ))
@@ -389,12 +430,15 @@ def get_org_access_logs(org_id: str, limit: int = 50):
 @router.get("/org-dashboard/{org_id}/data_categories")
 def get_org_dashboard_data_categories(org_id: str):
     """Return data categories for an organization dashboard using contract_id."""
-    from helpers import organizations_collection
-    org = organizations_collection.find_one({"org_id": org_id})
+    from helpers import get_organization_by_id
+    org = get_organization_by_id(org_id)
+    return fetch_org_dashboard_data_categories(org)
+
+def fetch_org_dashboard_data_categories(org: Optional[dict]) -> dict:
+    """Compute dashboard data categories for an already-resolved organization"""
     if not org or not org.get("contract_id"):
         return {"data_categories": []}
     contract_id = org["contract_id"]
-    print(contract_id)
     # Use the same logic as get_data_categories_for_contract
     pipeline = [
         {"$match": {"contract_id": contract_id}},
@@ -430,16 +474,8 @@ def get_org_contract_logs(org_id: str, limit: int = 20):
     # Then get logs only for active contracts
     logs = list(logs_collection.find(
         {
-            "$and": [
-                {"log_type": {"$in": ["contract_creation", "contract_request_approved", "contract_request_rejected"]}},
-                {"$or": [
-                    {"source_org_id": org_id},
-                    {"target_org_id": org_id},
-                    {"requester_org_id": org_id},
-                    {"responder_org_id": org_id},
-                    {"organization_id": org_id}
-                ]}
-            ]
+            "related_org_ids": org_id,
+            "log_type": {"$in": ["contract_creation", "contract_request_approved", "contract_request_rejected"]}
         },
         sort=[("created_at", -1)],
         limit=limit
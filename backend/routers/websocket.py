@@ -1,7 +1,10 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import Dict, List, Optional
+import base64
 import json
 from datetime import datetime
+from bson import ObjectId
 from pymongo import MongoClient
 from jwt_utils import verify_token
 from fastapi import status
@@ -81,28 +84,128 @@ async def send_user_update(user_id: str, update_type: str, data: dict):
     }
     await manager.broadcast_to_user(user_id, message)
 
+# Backs the newest-first keyset pagination of the dashboard audit feed
+logs_collection.create_index([("fintech_id", 1), ("created_at", -1), ("_id", -1)])
+
+DASHBOARD_LOG_FIELDS = [
+    "user_id", "fintech_name", "fintech_id", "resource_name", "purpose", "log_type",
+    "ip_address", "region", "country", "city", "data_source", "source_org_id",
+    "target_org_id", "created_at"
+]
+DASHBOARD_LOG_PROJECTION = {field: 1 for field in DASHBOARD_LOG_FIELDS}
+
+# Pages larger than this are serialized incrementally instead of in one go
+DASHBOARD_STREAM_THRESHOLD = 200
+
+def encode_log_cursor(log: dict) -> str:
+    """Encode the sort position of a log as an opaque pagination cursor"""
+    raw = f"{log['created_at'].isoformat()}|{log['_id']}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_log_cursor(cursor: str) -> tuple:
+    """Decode a pagination cursor into its (created_at, _id) sort position"""
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), ObjectId(log_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def find_dashboard_audit_logs(org_id: str, limit: Optional[int] = None, before: Optional[str] = None, skip: int = 0):
+    """
+    Open a newest-first cursor over an organization's dashboard audit logs
+
+    Args:
+        org_id: The organization ID matched against fintech_id
+        limit: Maximum number of logs to return, all when None
+        before: Cursor of the last log on the previous page
+        skip: Number of logs to skip
+
+    Returns:
+        A projected pymongo cursor sorted by (created_at, _id) descending
+    """
+    query_filter = {"fintech_id": org_id}
+    if limit is not None or before:
+        # Cursors encode created_at, so paged reads only cover dated logs
+        query_filter["created_at"] = {"$type": "date"}
+    if before:
+        created_at, log_id = decode_log_cursor(before)
+        query_filter["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": log_id}}
+        ]
+    cursor = (
+        logs_collection.find(query_filter, DASHBOARD_LOG_PROJECTION)
+        .sort([("created_at", -1), ("_id", -1)])
+        .skip(skip)
+        .batch_size(min(limit or 1000, 1000))
+    )
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    return cursor
+
+def iter_dashboard_logs_json(cursor):
+    """Serialize dashboard logs as a JSON array, one log at a time"""
+    yield "["
+    for count, log in enumerate(cursor):
+        yield ("," if count else "") + json.dumps(format_dashboard_audit_log(log))
+    yield "]"
+
 @router.get("/audit/org-dashboard/{org_id}")
-async def get_organization_dashboard_audit_logs(org_id: str):
-    """Get all audit logs for an organization for the dashboard (matches by fintech_id only)"""
-    logs = list(logs_collection.find({"fintech_id": org_id}))
-    logs.sort(key=lambda x: x.get("created_at", datetime.min), reverse=True)
-    formatted_logs = []
-    for log in logs:
-        formatted_logs.append({
-            "user_id": log.get("user_id"),
-            "fintech_name": log.get("fintech_name"),
-            "fintech_id": log.get("fintech_id"),
-            "resource_name": log.get("resource_name"),
-            "purpose": log.get("purpose"),
-            "log_type": log.get("log_type"),
-            "ip_address": log.get("ip_address"),
-            "region": log.get("region", "Unknown Location"),
-            "country": log.get("country", ""),
-            "city": log.get("city", ""),
-            "data_source": log.get("data_source"),
-            "source_org_id": log.get("source_org_id"),
-            "target_org_id": log.get("target_org_id"),
-            "created_at": log.get("created_at").isoformat() if log.get("created_at") else None,
-            "_id": str(log.get("_id")) if log.get("_id") else None
-        })
-    return formatted_logs 
\ No newline at end of file
+async def get_organization_dashboard_audit_logs(
+    org_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Maximum number of logs to return; all of them when omitted"),
+    before: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header")
+):
+    """
+    Get audit logs for an organization for the dashboard (matches by fintech_id only)
+
+    Logs are returned newest first as a plain list. With a limit, the
+    X-Has-More header says whether more logs follow, and X-Next-Cursor,
+    passed back as before, fetches the following page.
+    """
+    headers = {}
+    if limit is None and not before:
+        return StreamingResponse(iter_dashboard_logs_json(find_dashboard_audit_logs(org_id)), media_type="application/json")
+
+    if limit is not None and limit <= DASHBOARD_STREAM_THRESHOLD:
+        # Fetch one extra log so has_more can be answered without a count
+        logs = list(find_dashboard_audit_logs(org_id, limit + 1, before))
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        headers["X-Has-More"] = json.dumps(has_more)
+        if has_more:
+            headers["X-Next-Cursor"] = encode_log_cursor(logs[-1])
+        return JSONResponse([format_dashboard_audit_log(log) for log in logs], headers=headers)
+
+    if limit is not None:
+        # Large pages are streamed; read the page's last log and the one after it up front
+        boundary = list(find_dashboard_audit_logs(org_id, 2, before, skip=limit - 1))
+        has_more = len(boundary) == 2
+        headers["X-Has-More"] = json.dumps(has_more)
+        if has_more:
+            headers["X-Next-Cursor"] = encode_log_cursor(boundary[0])
+    return StreamingResponse(
+        iter_dashboard_logs_json(find_dashboard_audit_logs(org_id, limit, before)),
+        media_type="application/json",
+        headers=headers
+    )
+
+def format_dashboard_audit_log(log: dict) -> dict:
+    """Format a log document for the organization dashboard"""
+    return {
+        "user_id": log.get("user_id"),
+        "fintech_name": log.get("fintech_name"),
+        "fintech_id": log.get("fintech_id"),
+        "resource_name": log.get("resource_name"),
+        "purpose": log.get("purpose"),
+        "log_type": log.get("log_type"),
+        "ip_address": log.get("ip_address"),
+        "region": log.get("region", "Unknown Location"),
+        "country": log.get("country", ""),
+        "city": log.get("city", ""),
+        "data_source": log.get("data_source"),
+        "source_org_id": log.get("source_org_id"),
+        "target_org_id": log.get("target_org_id"),
+        "created_at": log.get("created_at").isoformat() if log.get("created_at") else None,
+        "_id": str(log.get("_id")) if log.get("_id") else None
+    } 
\ No newline at end of file
@@ -0,0 +1,413 @@
+import os
+import re
+import gzip
+import json
+import uuid
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterator
+import logging
+
+from bson import json_util
+from pymongo.errors import DuplicateKeyError
+
+from services.audit_search import text_matches, SEARCH_KEYS_FIELD
+from services.org_identity import canonical_org_id
+
+logger = logging.getLogger(__name__)
+
+# Fields that identify which organizations a log entry belongs to. They are
+# recorded per partition in the manifest so org-scoped queries can skip
+# archive files that cannot contain any matching entries.
+ORG_KEY_FIELDS = [
+    "fintech_id", "fintech_name", "source_org_id", "target_org_id",
+    "requester_org_id", "responder_org_id", "organization_id"
+]
+
+# Fields an archived log is matched on when scoping archive queries to an
+# organization; partitions record per-organization counts over these fields
+ARCHIVE_SCOPE_FIELDS = ["fintech_name", "source_org_id", "target_org_id"]
+
+ARCHIVE_LOCK_ID = "audit_archive"
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    """Evaluate a single field condition from a Mongo-style filter"""
+    if isinstance(condition, re.Pattern):
+        # Like Mongo, a regex also matches string members of an array
+        values = value if isinstance(value, list) else [value]
+        return any(isinstance(item, str) and condition.search(item) is not None for item in values)
+
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$gte" and not (value is not None and value >= operand):
+                return False
+            if op == "$gt" and not (value is not None and value > operand):
+                return False
+            if op == "$lte" and not (value is not None and value <= operand):
+                return False
+            if op == "$lt" and not (value is not None and value < operand):
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$regex":
+                pattern = operand if isinstance(operand, re.Pattern) else re.compile(operand)
+                if not (isinstance(value, str) and pattern.search(value)):
+                    return False
+        return True
+
+    # Equality also matches array members, the same way Mongo does
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value == condition
+
+def matches_filter(doc: Dict[str, Any], query_filter: Dict[str, Any]) -> bool:
+    """
+    Evaluate the subset of Mongo query syntax used by the audit endpoints
+    against an archived document
+
+    Args:
+        doc: The archived log document
+        query_filter: The Mongo-style filter used for the hot tier
+
+    Returns:
+        True if the document satisfies the filter
+    """
+    for key, condition in query_filter.items():
+        if key == "$or":
+            if not any(matches_filter(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches_filter(doc, sub) for sub in condition):
+                return False
+        elif key == "$text":
+            if not text_matches(doc, condition.get("$search", "")):
+                return False
+        elif not _matches_condition(doc.get(key), condition):
+            return False
+    return True
+
+class AuditArchiveService:
+    """Moves aged audit logs out of MongoDB into compressed, date-partitioned archive files"""
+
+    def __init__(self):
+        self.archive_dir = Path(os.getenv(
+            "AUDIT_ARCHIVE_DIR",
+            os.path.join(os.path.dirname(os.path.dirname(__file__)), "archive", "audit_logs")
+        ))
+        self.hot_retention_days = int(os.getenv("AUDIT_HOT_RETENTION_DAYS", "90"))
+        self.batch_size = int(os.getenv("AUDIT_ARCHIVE_BATCH_SIZE", "1000"))
+        self.manifest_path = self.archive_dir / "manifest.json"
+        # Archival holds a lease in MongoDB so only one worker process writes
+        # partitions and the manifest at a time
+        self.lease = timedelta(minutes=float(os.getenv("AUDIT_ARCHIVE_LEASE_MINUTES", "30")))
+
+    def get_cutoff(self, older_than_days: Optional[int] = None) -> datetime:
+        """Get the boundary between the hot and archive tiers"""
+        days = older_than_days if older_than_days is not None else self.hot_retention_days
+        return datetime.utcnow() - timedelta(days=days)
+
+    def load_manifest(self) -> Dict[str, Any]:
+        """Load the archive manifest, creating an empty one if none exists"""
+        if not self.manifest_path.exists():
+            return {"version": 1, "partitions": []}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Atomically replace the manifest on disk"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        manifest["updated_at"] = datetime.utcnow().isoformat()
+        tmp_path = self.manifest_path.with_suffix(f".json.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _acquire_lease(self, lock_collection, holder: str) -> bool:
+        """Take or renew the archival lease; False if another worker holds it"""
+        now = datetime.utcnow()
+        try:
+            lock_collection.find_one_and_update(
+                {"_id": ARCHIVE_LOCK_ID, "$or": [{"expires_at": {"$lte": now}}, {"holder": holder}]},
+                {"$set": {"holder": holder, "expires_at": now + self.lease}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lock document exists and is held by someone else
+            return False
+        return True
+
+    def _release_lease(self, lock_collection, holder: str) -> None:
+        lock_collection.delete_one({"_id": ARCHIVE_LOCK_ID, "holder": holder})
+
+    def _partition_path(self, day: datetime, part: int) -> Path:
+        return self.archive_dir / day.strftime("%Y") / day.strftime("%m") / f"logs_{day.strftime('%Y-%m-%d')}_part{part:03d}.ndjson.gz"
+
+    def _write_partition(self, day: datetime, docs: List[Dict[str, Any]], manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Write one day's worth of logs to a new gzip NDJSON part file"""
+        day_key = day.strftime("%Y-%m-%d")
+        part = sum(1 for p in manifest["partitions"] if p["date"] == day_key)
+        path = self._partition_path(day, part)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        org_keys = set()
+        org_counts: Dict[str, int] = {}
+        resolved: Dict[str, Optional[str]] = {}
+        digest = hashlib.sha256()
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wb") as f:
+            for doc in docs:
+                # Search keys only serve the hot-tier index; archive searches don't use them
+                doc.pop(SEARCH_KEYS_FIELD, None)
+                line = (json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + "\n").encode("utf-8")
+                digest.update(line)
+                f.write(line)
+                for field in ORG_KEY_FIELDS:
+                    if doc.get(field):
+                        org_keys.add(str(doc[field]))
+                doc_orgs = set()
+                for field in ARCHIVE_SCOPE_FIELDS:
+                    value = doc.get(field)
+                    if value:
+                        key = str(value)
+                        if key not in resolved:
+                            resolved[key] = canonical_org_id(key)
+                        doc_orgs.add(resolved[key])
+                for org_id in doc_orgs:
+                    org_counts[org_id] = org_counts.get(org_id, 0) + 1
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        return {
+            "date": day_key,
+            "path": str(path.relative_to(self.archive_dir)),
+            "record_count": len(docs),
+            "min_created_at": docs[0]["created_at"].isoformat(),
+            "max_created_at": docs[-1]["created_at"].isoformat(),
+            "org_keys": sorted(org_keys),
+            "org_counts": org_counts,
+            "sha256": digest.hexdigest(),
+            "compressed_bytes": path.stat().st_size,
+            "archived_at": datetime.utcnow().isoformat()
+        }
+
+    def _delete_archived(self, logs_collection, ids: List[Any]) -> None:
+        for i in range(0, len(ids), self.batch_size):
+            logs_collection.delete_many({"_id": {"$in": ids[i:i + self.batch_size]}})
+
+    def _commit_pending(self, logs_collection, manifest: Dict[str, Any]) -> None:
+        """
+        Finish moves interrupted between writing a partition and deleting its logs
+
+        A pending partition is complete on disk, so any of its logs still in
+        the hot tier are deleted rather than archived a second time.
+        """
+        for entry in manifest["partitions"]:
+            if entry.get("status") != "pending":
+                continue
+            ids = [doc["_id"] for doc in self._iter_partition(entry)]
+            self._delete_archived(logs_collection, ids)
+            entry["status"] = "committed"
+            self._save_manifest(manifest)
+            logger.info(f"Committed interrupted archive partition {entry['path']} ({len(ids)} logs)")
+
+    def archive_expired_logs(self, logs_collection, older_than_days: Optional[int] = None, lock_collection=None) -> Dict[str, Any]:
+        """
+        Move logs older than the hot retention window into archive partitions
+
+        Each day is written to its own part file and recorded in the manifest
+        as pending before the corresponding documents are removed from the hot
+        tier, then marked committed, so a failure part-way through never loses
+        data. The next run finishes pending partitions before archiving more,
+        so their logs are never archived twice. The run holds a lease in
+        MongoDB, renewed after every partition, and does nothing if another
+        worker holds it.
+
+        Args:
+            logs_collection: The hot-tier logs collection
+            older_than_days: Override for the configured hot retention window
+            lock_collection: Collection holding the lease, defaults to
+                audit_archive_locks in the logs database
+
+        Returns:
+            Summary of the partitions written and documents moved
+        """
+        cutoff = self.get_cutoff(older_than_days)
+        if lock_collection is None:
+            lock_collection = logs_collection.database["audit_archive_locks"]
+        holder = uuid.uuid4().hex
+        if not self._acquire_lease(lock_collection, holder):
+            logger.info("Audit archival skipped: another worker holds the lease")
+            return {"cutoff": cutoff.isoformat(), "archived_records": 0, "partitions_written": [], "skipped": True}
+
+        try:
+            # Loaded under the lease so part numbers never collide with another worker's
+            manifest = self.load_manifest()
+            self._commit_pending(logs_collection, manifest)
+            written = []
+            moved = 0
+
+            cursor = logs_collection.find(
+                {"created_at": {"$lt": cutoff}},
+                sort=[("created_at", 1)],
+                batch_size=self.batch_size
+            )
+
+            current_day = None
+            day_docs: List[Dict[str, Any]] = []
+
+            def flush():
+                nonlocal moved
+                if not day_docs:
+                    return
+                if not self._acquire_lease(lock_collection, holder):
+                    raise RuntimeError("Audit archive lease was lost")
+                entry = self._write_partition(current_day, day_docs, manifest)
+                entry["status"] = "pending"
+                manifest["partitions"].append(entry)
+                self._save_manifest(manifest)
+                self._delete_archived(logs_collection, [doc["_id"] for doc in day_docs])
+                entry["status"] = "committed"
+                self._save_manifest(manifest)
+                moved += len(day_docs)
+                written.append(entry)
+                day_docs.clear()
+
+            for doc in cursor:
+                created_at = doc.get("created_at")
+                if not isinstance(created_at, datetime):
+                    continue
+                day = datetime(created_at.year, created_at.month, created_at.day)
+                if current_day is not None and day != current_day:
+                    flush()
+                current_day = day
+                day_docs.append(doc)
+            flush()
+        finally:
+            self._release_lease(lock_collection, holder)
+
+        if moved:
+            logger.info(f"Archived {moved} audit logs into {len(written)} partitions (cutoff {cutoff.isoformat()})")
+
+        return {
+            "cutoff": cutoff.isoformat(),
+            "archived_records": moved,
+            "partitions_written": written
+        }
+
+    def _select_partitions(self, org_keys: Optional[List[str]], start: Optional[datetime], end: Optional[datetime]) -> List[Dict[str, Any]]:
+        """Prune manifest partitions by date range and org membership, newest first"""
+        selected = []
+        for partition in self.load_manifest()["partitions"]:
+            # Logs of a pending partition may still be in the hot tier
+            if partition.get("status") == "pending":
+                continue
+            if start and datetime.fromisoformat(partition["max_created_at"]) < start:
+                continue
+            if end and datetime.fromisoformat(partition["min_created_at"]) >= end:
+                continue
+            if org_keys and not set(org_keys) & set(partition.get("org_keys", [])):
+                continue
+            selected.append(partition)
+        selected.sort(key=lambda p: (p["date"], p["path"]), reverse=True)
+        return selected
+
+    def _iter_partition(self, partition: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Stream the documents of a partition, oldest first, one line at a time"""
+        path = self.archive_dir / partition["path"]
+        if not path.exists():
+            logger.warning(f"Archive partition missing on disk: {path}")
+            return
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json_util.loads(line)
+
+    def _partition_matches(self, partition: Dict[str, Any], query_filter: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Matching documents of a partition, newest first; only matches are held in memory"""
+        matches = [doc for doc in self._iter_partition(partition) if matches_filter(doc, query_filter)]
+        matches.reverse()
+        return matches
+
+    @staticmethod
+    def _known_count(partition: Dict[str, Any], org_id: Optional[str], start: Optional[datetime], end: Optional[datetime]) -> Optional[int]:
+        """
+        Matches in a partition taken from its manifest counts, or None when
+        the partition has to be scanned: no counts recorded (older
+        partitions) or the date range only covers part of it
+        """
+        if org_id is None or "org_counts" not in partition:
+            return None
+        if start and datetime.fromisoformat(partition["min_created_at"]) < start:
+            return None
+        if end and datetime.fromisoformat(partition["max_created_at"]) >= end:
+            return None
+        return partition["org_counts"].get(org_id, 0)
+
+    def iter_archived_logs(
+        self,
+        query_filter: Dict[str, Any],
+        org_keys: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield archived logs matching a filter, newest first
+
+        Args:
+            query_filter: The same Mongo-style filter used against the hot tier
+            org_keys: Organization identifiers used to prune partitions
+            start: Inclusive lower bound on created_at, used to prune partitions
+            end: Exclusive upper bound on created_at, used to prune partitions
+        """
+        for partition in self._select_partitions(org_keys, start, end):
+            yield from self._partition_matches(partition, query_filter)
+
+    def query_archive(
+        self,
+        query_filter: Dict[str, Any],
+        org_keys: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        skip: int = 0,
+        limit: int = 100,
+        counted_org_id: Optional[str] = None
+    ) -> tuple[List[Dict[str, Any]], int]:
+        """
+        Return one page of archived logs and the total number of matches
+
+        Args:
+            counted_org_id: Set when query_filter only scopes by this
+                organization (and the date range); partitions outside the
+                page are then counted from the manifest instead of read
+
+        Returns:
+            Tuple of (page of logs, total matching archived logs)
+        """
+        page = []
+        total = 0
+        for partition in self._select_partitions(org_keys, start, end):
+            count = self._known_count(partition, counted_org_id, start, end)
+            if count is not None and (total + count <= skip or len(page) >= limit):
+                total += count
+                continue
+            for doc in self._partition_matches(partition, query_filter):
+                if skip <= total < skip + limit:
+                    page.append(doc)
+                total += 1
+        return page, total
+
+    def get_partitions_for_org(self, org_keys: List[str]) -> List[Dict[str, Any]]:
+        """List manifest partitions that contain logs for any of the given org keys"""
+        return [
+            {k: v for k, v in partition.items() if k != "org_keys"}
+            for partition in self._select_partitions(org_keys, None, None)
+        ]
+
+# Global instance
+audit_archive_service = AuditArchiveService()
@@ -0,0 +1,172 @@
+import re
+from typing import Dict, Any, List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Fields covered by the audit log text index
+SEARCH_FIELDS = ["fintech_name", "resource_name", "purpose", "ip_address", "region", "city", "country"]
+
+TEXT_INDEX_NAME = "audit_log_search"
+
+# Prefix search keys: every word of the search fields and its prefixes of
+# SEARCH_PREFIX_MIN to SEARCH_PREFIX_MAX characters, stored once per
+# organization in org_ids as "<org_id>:<prefix>". One multikey index then
+# serves org-scoped prefix search; org_ids itself is an array, so it cannot
+# be the prefix key of a compound text index.
+SEARCH_KEYS_FIELD = "search_keys"
+SEARCH_KEYS_INDEX_NAME = "audit_log_search_keys"
+SEARCH_PREFIX_MIN = 2
+SEARCH_PREFIX_MAX = 16
+
+def ensure_search_index(logs_collection) -> None:
+    """
+    Create the indexes backing audit log search
+
+    The search key index serves the default prefix mode. The text index
+    serves word mode; it uses language "none" so names, resource types and
+    IP octets are indexed as-is, without stemming or stop-word removal.
+
+    Args:
+        logs_collection: The audit logs collection
+    """
+    logs_collection.create_index([(SEARCH_KEYS_FIELD, 1), ("created_at", -1)], name=SEARCH_KEYS_INDEX_NAME)
+    try:
+        logs_collection.create_index(
+            [(field, "text") for field in SEARCH_FIELDS],
+            name=TEXT_INDEX_NAME,
+            default_language="none",
+            language_override="search_language"
+        )
+    except Exception as e:
+        # A collection can only hold one text index; don't block startup on it
+        logger.error(f"Could not create audit log text index: {e}")
+
+def normalize_search(search: str) -> str:
+    """Strip characters that carry meaning in $text expressions"""
+    return " ".join(search.replace('"', " ").replace("\\", " ").split())
+
+def _words(value: Any) -> List[str]:
+    """Split a field value, or each member of a list, into lowercase words"""
+    values = value if isinstance(value, list) else [value]
+    return [word for item in values if item is not None for word in re.findall(r"[^\W_]+", str(item).lower())]
+
+def _word_prefixes(word: str) -> List[str]:
+    if len(word) < SEARCH_PREFIX_MIN:
+        return [word]
+    return [word[:n] for n in range(SEARCH_PREFIX_MIN, min(len(word), SEARCH_PREFIX_MAX) + 1)]
+
+def search_keys(doc: Dict[str, Any]) -> List[str]:
+    """Build the prefix search keys of a log entry; org_ids must already be stamped"""
+    prefixes = set()
+    for field in SEARCH_FIELDS:
+        for word in _words(doc.get(field)):
+            prefixes.update(_word_prefixes(word))
+    return sorted(f"{org_id}:{prefix}" for org_id in doc.get("org_ids", []) for prefix in prefixes)
+
+def stamp_search_keys(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Set the prefix search keys on a log entry"""
+    doc[SEARCH_KEYS_FIELD] = search_keys(doc)
+    return doc
+
+# Search modes: "prefix" (the default) matches a case-insensitive substring
+# of a field that starts at a word, through the search key index, e.g. "bank"
+# finds "BankABC" and "10.1.2" finds "10.1.25.3"; "partial" matches any
+# substring, like the original unindexed regex search, so "abc" also finds
+# "BankABC"; "word" matches whole words or phrases through the text index
+SEARCH_MODES = ("prefix", "partial", "word")
+
+def _partial_pattern(term: str) -> re.Pattern:
+    return re.compile(re.escape(term), re.IGNORECASE)
+
+def build_search_filter(search: str, mode: str = "prefix", org_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a filter fragment for an audit log search term
+
+    In "prefix" mode the index narrows the organization's logs to those
+    where every word of the term starts some word of a search field, and
+    the term is then matched as a case-insensitive substring of a field,
+    so "bank" finds "BankABC" but "abc" does not. One-letter words only
+    take part in the substring check; a term made only of those falls back
+    to "partial". In "partial" mode the term is matched as a substring of
+    any search field with no index help, evaluated over all of the
+    organization's logs. In "word" mode the text index finds logs
+    containing every word of the term, and the phrase check then requires
+    the words to appear together.
+
+    Args:
+        search: The raw search term from the request
+        mode: "prefix", "partial" or "word"
+        org_id: The organization the query is scoped to; required for "prefix"
+
+    Returns:
+        Filter fragment to merge into the audit query, or {} if the term is empty
+    """
+    term = normalize_search(search)
+    if not term:
+        return {}
+    if mode == "word":
+        return {"$text": {"$search": f'"{term}"', "$caseSensitive": False}}
+    # Wrapped in $and so it never clashes with an org scope $or
+    pattern = _partial_pattern(term)
+    search_filter = {"$and": [{"$or": [{field: pattern} for field in SEARCH_FIELDS]}]}
+    if mode == "prefix" and org_id:
+        words = {word[:SEARCH_PREFIX_MAX] for word in _words(term) if len(word) >= SEARCH_PREFIX_MIN}
+        if words:
+            # Longest first: the index scans the keys of the first element
+            search_filter[SEARCH_KEYS_FIELD] = {
+                "$all": [f"{org_id}:{word}" for word in sorted(words, key=len, reverse=True)]
+            }
+    return search_filter
+
+def text_matches(doc: Dict[str, Any], search_expression: str) -> bool:
+    """
+    Evaluate a "word" search built by build_search_filter against an in-memory document
+
+    Used for tiers that are not backed by the text index, such as archived
+    logs. Partial searches are plain regex conditions and need no helper.
+    """
+    term = normalize_search(search_expression).lower()
+    if not term:
+        return True
+    pattern = re.compile(r"(?<![0-9a-z])" + re.escape(term) + r"(?![0-9a-z])")
+    for field in SEARCH_FIELDS:
+        value = doc.get(field)
+        if value is None:
+            continue
+        values = value if isinstance(value, list) else [value]
+        for item in values:
+            if pattern.search(str(item).lower()):
+                return True
+    return False
+
+def backfill_search_keys(collection, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Set search keys on logs written before prefix search
+
+    Logs need org_ids first (see migrate_org_ids.py). Logs that already
+    have search keys are skipped, so the backfill can be re-run.
+
+    Returns:
+        Counts of documents scanned and updated
+    """
+    stats = {"scanned": 0, "updated": 0}
+    operations = []
+
+    def flush():
+        if operations:
+            stats["updated"] += collection.bulk_write(operations, ordered=False).modified_count
+            operations.clear()
+
+    projection = {field: 1 for field in SEARCH_FIELDS + ["org_ids"]}
+    for doc in collection.find({SEARCH_KEYS_FIELD: {"$exists": False}, "org_ids": {"$exists": True}}, projection, batch_size=batch_size):
+        stats["scanned"] += 1
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {SEARCH_KEYS_FIELD: search_keys(doc)}}))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+
+    logger.info(f"Backfilled search keys on {stats['updated']} of {stats['scanned']} logs")
+    return stats
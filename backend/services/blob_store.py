@@ -0,0 +1,147 @@
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable
+import logging
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """
+    Content-addressed file storage keyed by the SHA-256 of the plaintext
+
+    Each unique content is written to disk once and shared by every
+    shared_files document that references it through content_sha256. The
+    blob record counts those references; when the last one is released the
+    blob is deleted. Every time a blob record is (re)created it gets a new
+    generation, which is part of the file name, so a blob being deleted
+    can never remove the file of a blob re-created with the same content.
+    """
+
+    def __init__(self, root: Path, collection, on_delete: Optional[List[Callable[[str], None]]] = None):
+        self.root = root
+        self.collection = collection
+        # Called with the SHA-256 of each deleted blob to drop derived data
+        self.on_delete = on_delete or []
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index("refcount")
+
+    def _blob_path(self, sha256: str, generation: str) -> Path:
+        return self.root / sha256[:2] / f"{sha256}.{generation}.blob"
+
+    def put(self, staged, is_encrypted: bool = True) -> Dict[str, Any]:
+        """
+        Add a reference to the blob for a staged upload, storing it if new
+
+        When the content is already stored the staged file is discarded, so
+        repeated shares of the same document cost no extra storage.
+
+        Args:
+            staged: A services.file_ingest.StagedUpload
+            is_encrypted: Whether the staged file is in the encrypted at-rest format
+
+        Returns:
+            The blob record, with the path to read the content from
+        """
+        now = datetime.utcnow()
+        generation = uuid.uuid4().hex
+        blob = self.collection.find_one_and_update(
+            {"_id": staged.sha256},
+            {
+                "$inc": {"refcount": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {
+                    "path": str(self._blob_path(staged.sha256, generation)),
+                    "size": staged.size,
+                    "stored_size": staged.temp_path.stat().st_size,
+                    "is_encrypted": is_encrypted,
+                    "created_at": now
+                }
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+        path = Path(blob["path"])
+        if path.exists():
+            staged.discard()
+        else:
+            # First reference, or the first writer has not committed yet; the
+            # content is identical either way so the rename is safe to repeat
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staged.commit(path)
+        return blob
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": sha256})
+
+    def update_metadata(self, sha256: str, fields: Dict[str, Any], unless_set: Optional[str] = None) -> bool:
+        """
+        Set metadata fields on a blob record
+
+        Args:
+            sha256: The blob
+            fields: Fields to set
+            unless_set: Only update if this field is not set yet, letting
+                one caller claim one-off work such as indexing
+
+        Returns:
+            Whether the record was updated
+        """
+        query = {"_id": sha256}
+        if unless_set:
+            query[unless_set] = {"$exists": False}
+        return self.collection.update_one(query, {"$set": fields}).modified_count > 0
+
+    def release(self, sha256: Optional[str]) -> int:
+        """
+        Drop one reference to a blob, deleting it when none remain
+
+        Returns:
+            Bytes reclaimed on disk
+        """
+        if not sha256:
+            return 0
+        blob = self.collection.find_one_and_update(
+            {"_id": sha256, "refcount": {"$gt": 0}},
+            {"$inc": {"refcount": -1}, "$set": {"updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if not blob or blob["refcount"] > 0:
+            return 0
+        return self._delete_if_unreferenced(sha256)
+
+    def _delete_if_unreferenced(self, sha256: str) -> int:
+        # Only one caller wins the delete; a concurrent put() that re-took a
+        # reference in the meantime makes the filter miss
+        blob = self.collection.find_one_and_delete({"_id": sha256, "refcount": {"$lte": 0}})
+        if not blob:
+            return 0
+        for callback in self.on_delete:
+            try:
+                callback(sha256)
+            except Exception as e:
+                logger.error(f"Error cleaning up data derived from blob {sha256}: {e}")
+        try:
+            os.remove(blob["path"])
+        except FileNotFoundError:
+            return 0
+        return blob.get("stored_size", 0)
+
+    def collect_garbage(self, limit: int = 1000) -> Dict[str, int]:
+        """
+        Delete blobs left without references, e.g. after a crash between
+        releasing the last reference and deleting the file
+        """
+        stats = {"blobs_deleted": 0, "bytes_reclaimed": 0}
+        for blob in self.collection.find({"refcount": {"$lte": 0}}, {"_id": 1}).limit(limit):
+            reclaimed = self._delete_if_unreferenced(blob["_id"])
+            if reclaimed:
+                stats["blobs_deleted"] += 1
+                stats["bytes_reclaimed"] += reclaimed
+        return stats
@@ -0,0 +1,67 @@
+from typing import Dict, Any, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+def resolve_bulk_request_users(
+    users_collection,
+    policies_collection,
+    user_ids: List[int],
+    target_org_id: str
+) -> Tuple[List[Dict[str, Any]], List[int], List[int]]:
+    """
+    Validate the users selected for a bulk data request with set-based queries
+
+    Users are fetched with one $in lookup. Users whose organization_id does
+    not match the target organization are then checked with one policy
+    aggregation grouped by user, since holding a policy with the target
+    organization also makes a user eligible. Policies are matched on their
+    stamped org_ids, which cover both target_org_id and the shared_with
+    name, so the lookup is served by the (org_ids, user_id) index instead of
+    an $or over the two fields.
+
+    Args:
+        users_collection: The users collection
+        policies_collection: The policies collection
+        user_ids: Selected user IDs, duplicates are ignored
+        target_org_id: The organization the users must belong to
+
+    Returns:
+        Tuple of (users in selection order, missing user IDs, user IDs outside the organization)
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+
+    users_by_id = {
+        user["userid"]: user
+        for user in users_collection.find(
+            {"userid": {"$in": user_ids}},
+            {"userid": 1, "email": 1, "full_name": 1, "organization_id": 1}
+        )
+    }
+    missing = [user_id for user_id in user_ids if user_id not in users_by_id]
+
+    unlinked = [
+        user_id for user_id in user_ids
+        if user_id in users_by_id and users_by_id[user_id].get("organization_id") != target_org_id
+    ]
+    linked_by_policy = set()
+    if unlinked:
+        linked_by_policy = {
+            group["_id"]
+            for group in policies_collection.aggregate([
+                {"$match": {"org_ids": target_org_id, "user_id": {"$in": unlinked}}},
+                {"$group": {"_id": "$user_id"}}
+            ])
+        }
+    outside = [user_id for user_id in unlinked if user_id not in linked_by_policy]
+
+    users = [users_by_id[user_id] for user_id in user_ids if user_id in users_by_id]
+    return users, missing, outside
+
+def insert_in_chunks(collection, documents: List[Dict[str, Any]], chunk_size: int = 1000) -> int:
+    """Insert documents with one insert_many per chunk, returning how many were written"""
+    inserted = 0
+    for i in range(0, len(documents), chunk_size):
+        result = collection.insert_many(documents[i:i + chunk_size], ordered=False)
+        inserted += len(result.inserted_ids)
+    return inserted
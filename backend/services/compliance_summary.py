@@ -0,0 +1,134 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, Optional, Tuple
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Resources counted as minimized data
+MINIMIZED_RESOURCES = ["aadhaar", "pan", "account"]
+
+# The TTL monitor removes expired policies about once a minute, so a summary
+# computed after an expiry but before the removal is only trusted this long
+TTL_MONITOR_GRACE = timedelta(seconds=float(os.getenv("COMPLIANCE_SUMMARY_GRACE_SECONDS", "60")))
+
+def _count_where(condition) -> Dict[str, Any]:
+    return {"$sum": {"$cond": [condition, 1, 0]}}
+
+def _length_between(expression, length, low: int, high: int) -> Dict[str, Any]:
+    return {"$and": [{"$gte": [{length: expression}, low]}, {"$lte": [{length: expression}, high]}]}
+
+def _is_type(field: str, bson_type: str) -> Dict[str, Any]:
+    return {"$eq": [{"$type": field}, bson_type]}
+
+# Same rules as the original per-policy checks: a purpose list or string of
+# 1-3 items/characters, and a retention window list holding "30" or a string
+# containing it
+PURPOSE_LIMITED = {"$cond": [
+    {"$isArray": "$purpose"},
+    _length_between("$purpose", "$size", 1, 3),
+    {"$cond": [_is_type("$purpose", "string"), _length_between("$purpose", "$strLenCP", 1, 3), False]}
+]}
+RETENTION_COMPLIANT = {"$cond": [
+    {"$isArray": "$retention_window"},
+    {"$in": ["30", "$retention_window"]},
+    {"$cond": [
+        _is_type("$retention_window", "string"),
+        {"$regexMatch": {"input": "$retention_window", "regex": "30"}},
+        False
+    ]}
+]}
+
+class ComplianceSummaryStore:
+    """
+    Per-organization policy compliance counts, materialized in MongoDB
+
+    Reading a summary is a single point read. A summary is recomputed with
+    one aggregation only when it is missing, when policies were created for
+    the organization since it was computed, or when its earliest policy
+    expiry has passed and the TTL index may have removed policies.
+
+    Policy writes call invalidate(), which bumps the summary's generation;
+    a recomputation only stores its result if the generation is unchanged,
+    so counts that raced with a write are never cached. Counters are not
+    incremented in place because expired policies disappear through the TTL
+    index without the application seeing them.
+    """
+
+    def __init__(self, collection, policies_collection):
+        self.collection = collection
+        self.policies_collection = policies_collection
+
+    def invalidate(self, org_ids: Iterable[str]) -> None:
+        """Mark organizations' summaries stale; call after their policies are written"""
+        operations = [
+            UpdateOne({"_id": org_id}, {"$inc": {"generation": 1}}, upsert=True)
+            for org_id in set(org_ids) if org_id
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def _compute(self, org_id: str) -> Tuple[Dict[str, int], Optional[datetime]]:
+        """Count an organization's policies in one aggregation pass"""
+        pipeline = [
+            {"$match": {"org_ids": org_id}},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "consent": _count_where({"$eq": ["$consent_given", True]}),
+                "purpose_limited": _count_where(PURPOSE_LIMITED),
+                "minimized": _count_where({"$in": ["$resource_name", MINIMIZED_RESOURCES]}),
+                "retention_compliant": _count_where(RETENTION_COMPLIANT),
+                # $min skips nulls, so only date expiries take part
+                "next_expiry": {"$min": {"$cond": [_is_type("$expiry", "date"), "$expiry", None]}}
+            }}
+        ]
+        result = next(self.policies_collection.aggregate(pipeline), {})
+        counts = {key: result.get(key, 0) for key in ("total", "consent", "purpose_limited", "minimized", "retention_compliant")}
+        return counts, result.get("next_expiry")
+
+    def get_counts(self, org_id: str) -> Dict[str, int]:
+        """
+        Get an organization's compliance counts
+
+        Returns:
+            Counts of all policies and of those giving consent, limited in
+            purpose, minimized and retention compliant
+        """
+        now = datetime.utcnow()
+        summary = self.collection.find_one({"_id": org_id})
+        if (
+            summary
+            and summary.get("counts") is not None
+            and summary.get("counts_generation") == summary.get("generation", 0)
+            and summary["valid_until"] > now
+        ):
+            return summary["counts"]
+
+        generation = summary.get("generation", 0) if summary else 0
+        counts, next_expiry = self._compute(org_id)
+        if next_expiry is None:
+            valid_until = datetime.max
+        elif next_expiry > now:
+            valid_until = next_expiry
+        else:
+            valid_until = now + TTL_MONITOR_GRACE
+        document = {
+            "generation": generation,
+            "counts_generation": generation,
+            "counts": counts,
+            "valid_until": valid_until,
+            "computed_at": now
+        }
+        if summary is None:
+            try:
+                self.collection.insert_one({"_id": org_id, **document})
+            except DuplicateKeyError:
+                # A policy write created the summary meanwhile; recompute next time
+                pass
+        else:
+            self.collection.replace_one({"_id": org_id, "generation": generation}, document)
+        return counts
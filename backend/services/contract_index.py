@@ -0,0 +1,160 @@
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+import logging
+
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+def contract_resources(contract: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Normalize the resources a contract allows into {resource_name: grant}
+
+    Handles both the current resources_allowed list of ContractResource
+    objects and the legacy allowed_resources list of names. Legacy and
+    bare-string resources carry no purpose list, meaning any purpose is
+    allowed.
+    """
+    resources = {}
+    if contract.get("resources_allowed"):
+        for resource in contract.get("resources_allowed", []):
+            if isinstance(resource, dict) and "resource_name" in resource:
+                resources[resource["resource_name"]] = {
+                    "contract_id": contract.get("contract_id"),
+                    "purpose": resource.get("purpose"),
+                    "retention_window": resource.get("retention_window")
+                }
+            else:
+                resources[str(resource)] = {"contract_id": contract.get("contract_id"), "purpose": None, "retention_window": None}
+    elif contract.get("allowed_resources"):
+        allowed_resources = contract.get("allowed_resources", [])
+        if isinstance(allowed_resources, str):
+            allowed_resources = [allowed_resources]
+        for resource in allowed_resources:
+            resources[resource] = {"contract_id": contract.get("contract_id"), "purpose": None, "retention_window": None}
+    return resources
+
+def contract_policy_resources(contract: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    The resources policies can be created for, as {resource_name: resource}
+
+    Policy creation reads the full ContractResource object (purpose and
+    retention window) from resources_allowed, so only dict entries with a
+    resource_name count; legacy allowed_resources and bare-string entries
+    are skipped.
+    """
+    return {
+        resource["resource_name"]: resource
+        for resource in contract.get("resources_allowed") or []
+        if isinstance(resource, dict) and "resource_name" in resource
+    }
+
+class OrgContractPermissions:
+    """Active contracts of one organization, indexed by counterpart organization and resource"""
+
+    def __init__(self, org_id: str, contracts: List[Dict[str, Any]]):
+        self.org_id = org_id
+        # counterpart org_id -> [{"contract": doc, "resources": {name: grant}}]
+        self.by_counterpart: Dict[str, List[Dict[str, Any]]] = {}
+        # (counterpart org_id, resource) -> [(entry, grant)]
+        self.grants: Dict[tuple, List[tuple]] = {}
+
+        for contract in contracts:
+            counterpart = contract["target_org_id"] if contract.get("source_org_id") == org_id else contract.get("source_org_id")
+            entry = {
+                "contract": contract,
+                "resources": contract_resources(contract),
+                "policy_resources": contract_policy_resources(contract)
+            }
+            self.by_counterpart.setdefault(counterpart, []).append(entry)
+            for resource_name, grant in entry["resources"].items():
+                self.grants.setdefault((counterpart, resource_name), []).append((entry, grant))
+
+    @staticmethod
+    def _is_usable(entry: Dict[str, Any], approved_only: bool) -> bool:
+        contract = entry["contract"]
+        if approved_only and contract.get("approval_status") != "approved":
+            return False
+        ends_at = contract.get("ends_at")
+        return not (isinstance(ends_at, datetime) and ends_at <= datetime.utcnow())
+
+    def contracts_with(self, counterpart_org_id: str, approved_only: bool = True) -> List[Dict[str, Any]]:
+        """Active contracts with another organization, as {"contract", "resources"} entries"""
+        return [
+            entry for entry in self.by_counterpart.get(counterpart_org_id, [])
+            if self._is_usable(entry, approved_only)
+        ]
+
+    def policy_contract_with(self, counterpart_org_id: str, approved_only: bool = True) -> Optional[Dict[str, Any]]:
+        """The first active contract with another organization that policies can be created under, or None"""
+        for entry in self.contracts_with(counterpart_org_id, approved_only):
+            if entry["policy_resources"]:
+                return entry
+        return None
+
+    def supporting_contracts(self, counterpart_org_id: str, resources: Iterable[str], approved_only: bool = True) -> List[Dict[str, Any]]:
+        """Active contracts with another organization that allow every one of the given resources"""
+        resources = list(resources)
+        return [
+            entry for entry in self.contracts_with(counterpart_org_id, approved_only)
+            if all(resource in entry["resources"] for resource in resources)
+        ]
+
+    def resource_grants(self, counterpart_org_id: str, resource: str, approved_only: bool = True) -> List[Dict[str, Any]]:
+        """Purpose and retention grants for one resource across all active contracts with another organization"""
+        return [
+            grant for entry, grant in self.grants.get((counterpart_org_id, resource), [])
+            if self._is_usable(entry, approved_only)
+        ]
+
+    def is_allowed(self, counterpart_org_id: str, resource: str, purpose: Optional[str] = None, approved_only: bool = True) -> bool:
+        """Check whether any active contract allows a resource, and optionally a purpose for it"""
+        for grant in self.resource_grants(counterpart_org_id, resource, approved_only):
+            if purpose is None or grant["purpose"] is None or purpose in grant["purpose"]:
+                return True
+        return False
+
+class ContractPermissionIndex:
+    """
+    Read-through cache of per-organization contract permissions
+
+    Each organization's active contracts are loaded with one query and
+    indexed by (counterpart organization, resource). Entries are dropped
+    whenever a contract involving the organization is written, and also
+    expire after CONTRACT_INDEX_TTL_SECONDS as a safety net for changes made
+    outside the API, such as TTL deletion of ended contracts.
+    """
+
+    def __init__(self):
+        self._cache = TTLCache(
+            ttl_seconds=float(os.getenv("CONTRACT_INDEX_TTL_SECONDS", "300")),
+            max_entries=int(os.getenv("CONTRACT_INDEX_MAX_ORGS", "4096"))
+        )
+
+    def _load(self, org_id: str) -> OrgContractPermissions:
+        from helpers import inter_org_contracts_collection
+        contracts = list(inter_org_contracts_collection.find({
+            "$or": [
+                {"source_org_id": org_id},
+                {"target_org_id": org_id}
+            ],
+            "status": "active"
+        }))
+        return OrgContractPermissions(org_id, contracts)
+
+    def for_org(self, org_id: str) -> OrgContractPermissions:
+        """Get the permission index for an organization, loading it on a miss"""
+        return self._cache.get_or_set(org_id, lambda: self._load(org_id))
+
+    def invalidate(self, *org_ids: Optional[str]) -> None:
+        """Drop the cached permissions of every given organization"""
+        for org_id in org_ids:
+            if org_id:
+                self._cache.invalidate(org_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+# Global instance
+contract_permission_index = ContractPermissionIndex()
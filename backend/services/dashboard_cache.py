@@ -0,0 +1,32 @@
+import os
+from typing import Optional
+
+from services.cache import TTLCache
+
+# Per-section TTLs for the org dashboard snapshot. Activity feeds change
+# constantly and expire quickly; policy-derived aggregates are slower moving
+# and are also invalidated explicitly when policies change.
+SECTION_TTLS = {
+    "access_logs": float(os.getenv("DASHBOARD_ACTIVITY_TTL_SECONDS", "10")),
+    "audit_logs": float(os.getenv("DASHBOARD_ACTIVITY_TTL_SECONDS", "10")),
+    "unread_alerts": float(os.getenv("DASHBOARD_ACTIVITY_TTL_SECONDS", "10")),
+    "data_categories": float(os.getenv("DASHBOARD_AGGREGATE_TTL_SECONDS", "60")),
+    "compliance": float(os.getenv("DASHBOARD_AGGREGATE_TTL_SECONDS", "60")),
+}
+
+# Keyed by (org_id, section) or (org_id, section, limit) for activity feeds
+dashboard_snapshot_cache = TTLCache(ttl_seconds=10, max_entries=4096)
+
+def invalidate_org_dashboard(org_id: Optional[str], *sections: str) -> None:
+    """
+    Drop cached dashboard sections for an organization
+
+    Args:
+        org_id: The organization whose dashboard changed
+        sections: Sections to drop; all sections when omitted
+    """
+    if not org_id:
+        return
+    dashboard_snapshot_cache.invalidate_where(
+        lambda key: key[0] == org_id and (not sections or key[1] in sections)
+    )
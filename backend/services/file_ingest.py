@@ -0,0 +1,156 @@
+import os
+import uuid
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Optional, Dict
+import logging
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Bytes pulled from an UploadFile per read
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries, headers and form fields around a file
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds its size limit"""
+
+class StagedUpload:
+    """
+    An upload written to a temporary file next to its final location
+
+    The temp file lives in the destination directory so commit() is an
+    atomic rename: readers either see the complete file or nothing.
+    """
+
+    def __init__(self, temp_path: Path, size: int, sha256: str):
+        self.temp_path = temp_path
+        self.size = size
+        self.sha256 = sha256
+
+    def commit(self, destination: Path) -> Path:
+        """Atomically move the upload to its final path"""
+        os.replace(self.temp_path, destination)
+        return destination
+
+    def discard(self) -> None:
+        """Remove the temp file if it is still there"""
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+async def stage_upload(upload, directory: Path, max_bytes: int, chunk_size: int = UPLOAD_CHUNK_SIZE, encryptor=None) -> StagedUpload:
+    """
+    Stream an UploadFile to a temp file, hashing it on the way
+
+    The upload is read in chunks, so at most one chunk is held in memory,
+    and the size limit is enforced as soon as it is crossed. Writes run
+    on a worker thread to keep the event loop free. With an encryptor the
+    file is encrypted as it streams in; size and hash always describe the
+    plaintext.
+
+    Args:
+        upload: The FastAPI UploadFile
+        directory: Directory the file will be committed into
+        max_bytes: Size limit for the upload
+        chunk_size: Bytes per read
+        encryptor: Optional SegmentEncryptor to encrypt the file at rest
+
+    Returns:
+        The staged upload with its size and SHA-256 hex digest
+
+    Raises:
+        UploadTooLarge: If the upload is bigger than max_bytes
+    """
+    # The form parser has already spooled the body; RequestSizeLimitMiddleware
+    # is what stops oversized requests before they are received
+    declared_size: Optional[int] = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_bytes:
+        raise UploadTooLarge(f"Upload of {declared_size} bytes exceeds the {max_bytes} byte limit")
+
+    await upload.seek(0)
+    temp_path = directory / f".{uuid.uuid4()}.part"
+    hasher = hashlib.sha256()
+    size = 0
+    out = await asyncio.to_thread(open, temp_path, "wb")
+    try:
+        if encryptor is not None:
+            await asyncio.to_thread(out.write, encryptor.header)
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+            hasher.update(chunk)
+            if encryptor is not None:
+                chunk = encryptor.update(chunk)
+            await asyncio.to_thread(out.write, chunk)
+        if encryptor is not None:
+            await asyncio.to_thread(out.write, encryptor.finalize())
+        await asyncio.to_thread(out.flush)
+        await asyncio.to_thread(os.fsync, out.fileno())
+    except BaseException:
+        out.close()
+        StagedUpload(temp_path, size, "").discard()
+        raise
+    out.close()
+
+    return StagedUpload(temp_path, size, hasher.hexdigest())
+
+class RequestSizeLimitMiddleware:
+    """
+    Reject request bodies over a size limit before they are parsed
+
+    FastAPI spools a whole multipart body to disk before the route handler
+    runs, so a limit checked in the handler only applies after the upload
+    was received. This ASGI middleware answers 413 straight away when
+    Content-Length is over the limit, and counts the bytes of bodies sent
+    without one, failing as soon as the limit is crossed.
+
+    Args:
+        app: The ASGI app to wrap
+        limits: Maximum body size in bytes per request path prefix
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request body exceeds the {limit} byte limit"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            logger.warning(f"Rejected {scope['path']}: Content-Length {int(content_length)} exceeds {limit}")
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
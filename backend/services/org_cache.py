@@ -0,0 +1,124 @@
+import os
+import copy
+from typing import Dict, Any, Optional
+import logging
+
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class OrganizationCache:
+    """
+    Read-through cache of organization documents
+
+    Keeps org_id -> document and org_name -> org_id maps. Organizations
+    rarely change, so entries live for ORG_CACHE_TTL_SECONDS and are dropped
+    whenever the API writes an organization; the TTL only bounds staleness
+    for changes made by other workers or outside the API. Lookups that
+    find nothing are not cached, so new organizations show up immediately;
+    only resolve_org_id, which runs for every field of every stamped write,
+    remembers misses, for ORG_CACHE_MISS_TTL_SECONDS. Callers get copies
+    and may modify them freely.
+    """
+
+    def __init__(self):
+        ttl_seconds = float(os.getenv("ORG_CACHE_TTL_SECONDS", "300"))
+        max_entries = int(os.getenv("ORG_CACHE_MAX_ENTRIES", "4096"))
+        self._by_id = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._id_by_name = TTLCache(ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self._unresolved = TTLCache(
+            ttl_seconds=float(os.getenv("ORG_CACHE_MISS_TTL_SECONDS", "30")),
+            max_entries=max_entries
+        )
+
+    @staticmethod
+    def _collection():
+        from helpers import organizations_collection
+        return organizations_collection
+
+    def _store(self, org: Dict[str, Any]) -> None:
+        self._by_id.set(org["org_id"], org)
+        self._unresolved.invalidate(org["org_id"])
+        if org.get("org_name"):
+            self._id_by_name.set(org["org_name"], org["org_id"])
+            self._unresolved.invalidate(org["org_name"])
+
+    def get_by_id(self, org_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get an organization by org_id, loading it on a miss"""
+        if not org_id:
+            return None
+        org = self._by_id.get(org_id)
+        if org is None:
+            org = self._collection().find_one({"org_id": org_id})
+            if org is None:
+                return None
+            self._store(org)
+        return copy.deepcopy(org)
+
+    def get_id_by_name(self, org_name: Optional[str]) -> Optional[str]:
+        """Get the org_id of an organization by its name, loading it on a miss"""
+        if not org_name:
+            return None
+        org_id = self._id_by_name.get(org_name)
+        if org_id is None:
+            org = self._collection().find_one({"org_name": org_name})
+            if org is None:
+                return None
+            self._store(org)
+            org_id = org["org_id"]
+        return org_id
+
+    def get_by_name(self, org_name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Get an organization by its name"""
+        return self.get_by_id(self.get_id_by_name(org_name))
+
+    def resolve_org_id(self, value: Optional[str]) -> Optional[str]:
+        """
+        Get the org_id for a value that is an org_id or an org_name
+
+        Values that match no organization are remembered briefly, so
+        repeatedly stamping the same unknown value, such as "Individual
+        User", costs no database round trips.
+
+        Returns:
+            The org_id, or None if no organization matches
+        """
+        if not value or self._unresolved.get(value):
+            return None
+        if self.get_by_id(value):
+            return value
+        org_id = self.get_id_by_name(value)
+        if org_id is None:
+            self._unresolved.set(value, True)
+        return org_id
+
+    def warm(self) -> int:
+        """Load every organization; returns how many were cached"""
+        count = 0
+        for org in self._collection().find():
+            if org.get("org_id"):
+                self._store(org)
+                count += 1
+        logger.info(f"Organization cache warmed with {count} organization(s)")
+        return count
+
+    def invalidate(self, org_id: Optional[str] = None, org_name: Optional[str] = None) -> None:
+        """Drop an organization by id and/or name after it was written"""
+        for value in (org_id, org_name):
+            if value:
+                self._unresolved.invalidate(value)
+        if org_id:
+            cached = self._by_id.get(org_id)
+            if cached and cached.get("org_name"):
+                self._id_by_name.invalidate(cached["org_name"])
+            self._by_id.invalidate(org_id)
+        if org_name:
+            self._id_by_name.invalidate(org_name)
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._id_by_name.clear()
+        self._unresolved.clear()
+
+# Global instance
+organization_cache = OrganizationCache()
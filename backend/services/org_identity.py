@@ -0,0 +1,151 @@
+from typing import Dict, Any, List, Optional, Callable
+import logging
+
+from pymongo import UpdateOne
+
+from services.org_cache import organization_cache
+
+logger = logging.getLogger(__name__)
+
+# Older documents name organizations inconsistently: the same field may hold
+# an org_id or an org_name. Every write is stamped with the canonical org_ids
+# below, so an organization's documents are found with one indexed equality
+# match instead of an $or over each field and both spellings.
+
+# Organizations a log entry is about; audit listings match org_ids
+LOG_PARTY_FIELDS = ["fintech_id", "fintech_name", "source_org_id", "target_org_id"]
+# Every organization a log entry mentions; activity feeds match related_org_ids
+LOG_RELATED_FIELDS = LOG_PARTY_FIELDS + ["requester_org_id", "responder_org_id", "organization_id"]
+# Organizations a policy shares data with; matched through org_ids
+POLICY_ORG_FIELDS = ["target_org_id", "shared_with"]
+
+def canonical_org_id(value: Any) -> Optional[str]:
+    """
+    Resolve an org_id or org_name to the org_id
+
+    Values that match no organization are returned unchanged, so they still
+    match queries for the same literal value.
+    """
+    if not value:
+        return None
+    value = str(value)
+    return organization_cache.resolve_org_id(value) or value
+
+def _org_ids(doc: Dict[str, Any], fields: List[str], resolve: Callable[[Any], Optional[str]]) -> List[str]:
+    org_ids = []
+    for field in fields:
+        org_id = resolve(doc.get(field))
+        if org_id and org_id not in org_ids:
+            org_ids.append(org_id)
+    return org_ids
+
+def stamp_log(doc: Dict[str, Any], resolve: Callable[[Any], Optional[str]] = canonical_org_id) -> Dict[str, Any]:
+    """Set org_ids and related_org_ids on a log entry"""
+    doc["org_ids"] = _org_ids(doc, LOG_PARTY_FIELDS, resolve)
+    doc["related_org_ids"] = _org_ids(doc, LOG_RELATED_FIELDS, resolve)
+    return doc
+
+def stamp_policy(doc: Dict[str, Any], resolve: Callable[[Any], Optional[str]] = canonical_org_id) -> Dict[str, Any]:
+    """Set org_ids on a policy from its target_org_id and shared_with name"""
+    doc["org_ids"] = _org_ids(doc, POLICY_ORG_FIELDS, resolve)
+    return doc
+
+def stamp_data_request(doc: Dict[str, Any], resolve: Callable[[Any], Optional[str]] = canonical_org_id) -> Dict[str, Any]:
+    """Fill in target_org_id from target_org_name when the name belongs to an organization"""
+    if not doc.get("target_org_id") and doc.get("target_org_name"):
+        org_id = resolve(doc["target_org_name"])
+        if org_id and org_id != doc["target_org_name"]:
+            doc["target_org_id"] = org_id
+    return doc
+
+class OrgStampedCollection:
+    """
+    A collection whose inserts are stamped with canonical organization ids
+
+    insert_one and insert_many run the stamp function on each document
+    before writing it; everything else is passed through unchanged.
+    """
+
+    def __init__(self, collection, stamp: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        self._collection = collection
+        self._stamp = stamp
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def insert_one(self, document, *args, **kwargs):
+        return self._collection.insert_one(self._stamp(document), *args, **kwargs)
+
+    def insert_many(self, documents, *args, **kwargs):
+        return self._collection.insert_many([self._stamp(doc) for doc in documents], *args, **kwargs)
+
+def backfill_org_ids(collection, query: Dict[str, Any], fields: List[str], stamp, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Stamp existing documents that predate write-path stamping
+
+    Only fields the stamp function changes are written, and stamped
+    documents no longer match the query, so the backfill can be re-run
+    and can run while the application is writing.
+
+    Args:
+        collection: The collection to backfill
+        query: Selects documents that still need stamping
+        fields: Fields the stamp function reads
+        stamp: One of the stamp_* functions
+        batch_size: Documents per bulk write
+
+    Returns:
+        Counts of documents scanned and updated
+    """
+    # Names repeat across millions of documents; resolve each one once
+    resolved: Dict[str, Optional[str]] = {}
+
+    def resolve(value):
+        if not value:
+            return None
+        key = str(value)
+        if key not in resolved:
+            resolved[key] = canonical_org_id(key)
+        return resolved[key]
+
+    stats = {"scanned": 0, "updated": 0}
+    operations = []
+
+    def flush():
+        if operations:
+            stats["updated"] += collection.bulk_write(operations, ordered=False).modified_count
+            operations.clear()
+
+    for doc in collection.find(query, {field: 1 for field in fields}, batch_size=batch_size):
+        stats["scanned"] += 1
+        stamped = stamp(dict(doc), resolve)
+        changes = {key: value for key, value in stamped.items() if doc.get(key) != value}
+        if changes:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+            if len(operations) >= batch_size:
+                flush()
+    flush()
+
+    logger.info(f"Backfilled org ids on {stats['updated']} of {stats['scanned']} documents in {collection.name}")
+    return stats
+
+def backfill_logs(collection, batch_size: int = 1000) -> Dict[str, int]:
+    return backfill_org_ids(
+        collection,
+        {"$or": [{"org_ids": {"$exists": False}}, {"related_org_ids": {"$exists": False}}]},
+        LOG_RELATED_FIELDS,
+        stamp_log,
+        batch_size
+    )
+
+def backfill_policies(collection, batch_size: int = 1000) -> Dict[str, int]:
+    return backfill_org_ids(collection, {"org_ids": {"$exists": False}}, POLICY_ORG_FIELDS, stamp_policy, batch_size)
+
+def backfill_data_requests(collection, batch_size: int = 1000) -> Dict[str, int]:
+    return backfill_org_ids(
+        collection,
+        {"target_org_id": None, "target_org_name": {"$nin": [None, ""]}},
+        ["target_org_id", "target_org_name"],
+        stamp_data_request,
+        batch_size
+    )
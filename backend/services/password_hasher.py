@@ -0,0 +1,112 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+import logging
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashing jobs are already waiting"""
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded thread pool
+
+    bcrypt releases the GIL, so running it on a small pool keeps the event
+    loop responsive while still using the available cores. At most
+    PASSWORD_HASH_WORKERS jobs run at once and at most
+    PASSWORD_HASH_MAX_PENDING are admitted (running plus queued); beyond
+    that callers get PasswordHasherBusy instead of piling up behind a
+    login spike. BCRYPT_ROUNDS sets the cost factor for new hashes.
+    """
+
+    def __init__(self):
+        self.rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+        self.max_workers = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.max_pending = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._stats = {
+            "pending": 0,
+            "running": 0,
+            "completed": 0,
+            "rejected": 0,
+            "queue_wait_seconds": 0.0,
+            "work_seconds": 0.0,
+        }
+
+    def hash_sync(self, password: str) -> str:
+        """Hash a password on the calling thread"""
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify_sync(self, password: str, hashed: str) -> bool:
+        """Verify a password against a hash on the calling thread"""
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def _run(self, func, submitted_at: float, *args):
+        started_at = time.monotonic()
+        with self._lock:
+            self._stats["running"] += 1
+            self._stats["queue_wait_seconds"] += started_at - submitted_at
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["completed"] += 1
+                self._stats["work_seconds"] += time.monotonic() - started_at
+
+    async def _submit(self, func, *args):
+        with self._lock:
+            if self._stats["pending"] >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise PasswordHasherBusy("Too many password hashing requests in progress")
+            self._stats["pending"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._run, func, time.monotonic(), *args)
+        finally:
+            with self._lock:
+                self._stats["pending"] -= 1
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password without blocking the event loop
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated
+        """
+        return await self._submit(self.hash_sync, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """
+        Verify a password without blocking the event loop
+
+        Raises:
+            PasswordHasherBusy: If the pool is saturated
+        """
+        return await self._submit(self.verify_sync, password, hashed)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current pool configuration, queue depth and cumulative timings"""
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats["completed"]
+        return {
+            "rounds": self.rounds,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queue_depth": stats["pending"] - stats["running"],
+            **stats,
+            "avg_queue_wait_ms": round(stats["queue_wait_seconds"] * 1000 / completed, 2) if completed else 0.0,
+            "avg_work_ms": round(stats["work_seconds"] * 1000 / completed, 2) if completed else 0.0,
+        }
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,162 @@
+import io
+import os
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import logging
+
+import PyPDF2
+from pymongo import ASCENDING
+
+try:
+    import fitz  # PyMuPDF; optional, only used to render thumbnails
+except ImportError:
+    fitz = None
+
+logger = logging.getLogger(__name__)
+
+# Page fields returned in listings; text and thumbnails are fetched separately
+PAGE_SUMMARY_PROJECTION = {"_id": 0, "page": 1, "offset": 1, "width": 1, "height": 1, "text_length": 1, "has_thumbnail": 1}
+
+class PdfPageIndex:
+    """
+    Per-page metadata for stored PDFs, built once per unique content
+
+    One document per (sha256, page) holds the byte offset of the page
+    object, its size, its extracted text and optionally a PNG thumbnail, so
+    viewers can list, search and lazily fetch pages without re-parsing the
+    PDF. Thumbnails need PyMuPDF and are enabled with PDF_THUMBNAILS=1.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.thumbnails_enabled = os.getenv("PDF_THUMBNAILS", "0") == "1" and fitz is not None
+        self.thumbnail_pages = int(os.getenv("PDF_THUMBNAIL_PAGES", "20"))
+        self.thumbnail_width = int(os.getenv("PDF_THUMBNAIL_WIDTH", "200"))
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("sha256", ASCENDING), ("page", ASCENDING)], unique=True)
+
+    @staticmethod
+    def _page_offsets(reader: PyPDF2.PdfReader) -> Dict[int, int]:
+        # xref maps generation -> object number -> byte offset; objects
+        # stored inside object streams have no offset of their own
+        offsets = {}
+        for generation, objects in reader.xref.items():
+            for idnum, offset in objects.items():
+                offsets[(idnum, generation)] = offset
+        page_offsets = {}
+        for number, page in enumerate(reader.pages, start=1):
+            ref = getattr(page, "indirect_reference", None)
+            if ref is not None and (ref.idnum, ref.generation) in offsets:
+                page_offsets[number] = offsets[(ref.idnum, ref.generation)]
+        return page_offsets
+
+    def _render_thumbnails(self, stream, page_count: int) -> Dict[int, bytes]:
+        stream.seek(0)
+        thumbnails = {}
+        with fitz.open(stream=stream.read(), filetype="pdf") as document:
+            for index in range(min(page_count, self.thumbnail_pages)):
+                page = document[index]
+                scale = self.thumbnail_width / max(page.rect.width, 1)
+                thumbnails[index + 1] = page.get_pixmap(matrix=fitz.Matrix(scale, scale)).tobytes("png")
+        return thumbnails
+
+    def build(self, sha256: str, stream) -> Dict[str, Any]:
+        """
+        Parse a PDF and store its page index, replacing any previous one
+
+        Args:
+            sha256: Content hash of the PDF
+            stream: Seekable binary stream of the plaintext PDF
+
+        Returns:
+            Summary with the page count and whether thumbnails were rendered
+        """
+        reader = PyPDF2.PdfReader(stream)
+        page_offsets = self._page_offsets(reader)
+        now = datetime.utcnow()
+
+        pages = []
+        for number, page in enumerate(reader.pages, start=1):
+            try:
+                text = page.extract_text() or ""
+            except Exception as e:
+                logger.warning(f"Could not extract text from page {number} of {sha256}: {e}")
+                text = ""
+            pages.append({
+                "sha256": sha256,
+                "page": number,
+                "offset": page_offsets.get(number),
+                "width": float(page.mediabox.width),
+                "height": float(page.mediabox.height),
+                "text": text,
+                "text_length": len(text),
+                "has_thumbnail": False,
+                "created_at": now
+            })
+
+        if self.thumbnails_enabled and pages:
+            try:
+                for number, png in self._render_thumbnails(stream, len(pages)).items():
+                    pages[number - 1]["thumbnail"] = png
+                    pages[number - 1]["has_thumbnail"] = True
+            except Exception as e:
+                logger.warning(f"Could not render thumbnails for {sha256}: {e}")
+
+        self.collection.delete_many({"sha256": sha256})
+        if pages:
+            self.collection.insert_many(pages)
+        return {
+            "page_count": len(pages),
+            "thumbnails": any(page["has_thumbnail"] for page in pages)
+        }
+
+    def list_pages(self, sha256: str) -> List[Dict[str, Any]]:
+        return list(self.collection.find({"sha256": sha256}, PAGE_SUMMARY_PROJECTION).sort("page", ASCENDING))
+
+    def get_thumbnail(self, sha256: str, page: int) -> Optional[bytes]:
+        doc = self.collection.find_one({"sha256": sha256, "page": page}, {"_id": 0, "thumbnail": 1})
+        return doc.get("thumbnail") if doc else None
+
+    def search(self, sha256: str, query: str, limit: int = 50, context: int = 60) -> List[Dict[str, Any]]:
+        """Find pages whose text contains the query (case-insensitive), with a snippet around the first match"""
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        results = []
+        cursor = self.collection.find(
+            {"sha256": sha256, "text": {"$regex": pattern.pattern, "$options": "i"}},
+            {"_id": 0, "page": 1, "text": 1}
+        ).sort("page", ASCENDING).limit(limit)
+        for doc in cursor:
+            text = doc["text"]
+            matches = list(pattern.finditer(text))
+            if not matches:
+                continue
+            first = matches[0]
+            results.append({
+                "page": doc["page"],
+                "match_count": len(matches),
+                "snippet": text[max(0, first.start() - context):first.end() + context]
+            })
+        return results
+
+    def delete(self, sha256: str) -> None:
+        self.collection.delete_many({"sha256": sha256})
+
+def extract_page_pdf(stream, page_number: int) -> bytes:
+    """
+    Build a standalone single-page PDF from one page of a document
+
+    Only the objects that page uses are read from the stream.
+
+    Raises:
+        IndexError: If the page does not exist
+    """
+    reader = PyPDF2.PdfReader(stream)
+    if page_number < 1 or page_number > len(reader.pages):
+        raise IndexError(f"Page {page_number} out of range")
+    writer = PyPDF2.PdfWriter()
+    writer.add_page(reader.pages[page_number - 1])
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,145 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Fields returned for a PII entry; matches the shape of the legacy embedded entries
+ENTRY_PROJECTION = {"_id": 0, "user_id": 1, "resource": 1, "original": 1, "token": 1, "created_at": 1}
+
+class PIIStore:
+    """
+    User PII stored as one document per (user_id, resource)
+
+    Replaces the legacy layout that kept every user's PII in a single
+    document with an embedded "pii" array, so each lookup is an indexed
+    point read returning only the entries asked for.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("user_id", 1), ("resource", 1)], unique=True)
+        # Reverse lookup from a token to its owners. Not unique: some values,
+        # like an IFSC code, are legitimately shared by many users.
+        self.collection.create_index([("token", 1), ("resource", 1)], name="token_resource")
+        try:
+            self.collection.drop_index("token_resource_unique")
+        except OperationFailure:
+            pass
+
+    def upsert(self, user_id: int, resource: str, original: str, token: str) -> None:
+        """
+        Add or replace a user's entry for a resource in a single atomic write
+
+        Args:
+            user_id: The owning user
+            resource: The PII resource type, e.g. "pan"
+            original: The encrypted PII value
+            token: The resource token for the value
+        """
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"user_id": user_id, "resource": resource},
+            {
+                "$set": {"original": original, "token": token, "created_at": now},
+                "$setOnInsert": {"user_id": user_id, "resource": resource}
+            },
+            upsert=True
+        )
+
+    def get_entry(self, user_id: int, resource: str) -> Optional[Dict[str, Any]]:
+        """Get a user's entry for one resource"""
+        return self.collection.find_one({"user_id": user_id, "resource": resource}, ENTRY_PROJECTION)
+
+    def get_entries(self, user_id: int, resources: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Get a user's entries, optionally limited to some resources"""
+        query = {"user_id": user_id}
+        if resources is not None:
+            query["resource"] = {"$in": list(resources)}
+        return list(self.collection.find(query, ENTRY_PROJECTION))
+
+    def get_entries_by_resource(self, user_id: int, resources: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get a user's entries keyed by resource"""
+        return {entry["resource"]: entry for entry in self.get_entries(user_id, resources)}
+
+    def get_entries_for_users(self, user_ids: Iterable[int], resources: Optional[Iterable[str]] = None) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Get the entries of many users with one query, as {user_id: {resource: entry}}"""
+        query = {"user_id": {"$in": list(user_ids)}}
+        if resources is not None:
+            query["resource"] = {"$in": list(resources)}
+        entries_by_user: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for entry in self.collection.find(query, ENTRY_PROJECTION):
+            entries_by_user.setdefault(entry["user_id"], {})[entry["resource"]] = entry
+        return entries_by_user
+
+    def find_by_token(self, token: str, resource: str) -> List[Dict[str, Any]]:
+        """Resolve a token to the entries of every user holding that value"""
+        return list(self.collection.find({"token": token, "resource": resource}, ENTRY_PROJECTION))
+
+    def find_by_tokens(self, user_id: int, pairs: Iterable[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        """Match many of a user's (resource, token) pairs with one query, as {(resource, token): entry}"""
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        entries = self.collection.find(
+            {"user_id": user_id, "$or": [{"token": token, "resource": resource} for resource, token in pairs]},
+            ENTRY_PROJECTION
+        )
+        return {(entry["resource"], entry["token"]): entry for entry in entries}
+
+    def list_resources(self, user_id: int) -> List[str]:
+        """List the resource types a user has PII for, served from the index"""
+        return [entry["resource"] for entry in self.collection.find({"user_id": user_id}, {"_id": 0, "resource": 1})]
+
+    def migrate_embedded(self, legacy_collection, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Copy entries from the legacy embedded "pii" arrays into this store
+
+        Existing entries are never overwritten, so the migration can be re-run
+        safely while the application is writing to the new store.
+
+        Args:
+            legacy_collection: The collection holding {user_id, pii: [...]} documents
+            batch_size: Entries per bulk write
+
+        Returns:
+            Counts of users scanned, entries seen and entries inserted
+        """
+        self.ensure_indexes()
+        stats = {"users": 0, "entries": 0, "inserted": 0}
+        operations = []
+
+        def flush():
+            if operations:
+                result = self.collection.bulk_write(operations, ordered=False)
+                stats["inserted"] += result.upserted_count
+                operations.clear()
+
+        for doc in legacy_collection.find({}, {"user_id": 1, "pii": 1}, batch_size=batch_size):
+            stats["users"] += 1
+            for entry in doc.get("pii", []):
+                if not entry.get("resource"):
+                    continue
+                stats["entries"] += 1
+                operations.append(UpdateOne(
+                    {"user_id": doc["user_id"], "resource": entry["resource"]},
+                    {"$setOnInsert": {
+                        "user_id": doc["user_id"],
+                        "resource": entry["resource"],
+                        "original": entry.get("original"),
+                        "token": entry.get("token"),
+                        "created_at": entry.get("created_at") or datetime.utcnow()
+                    }},
+                    upsert=True
+                ))
+                if len(operations) >= batch_size:
+                    flush()
+        flush()
+
+        logger.info(f"Migrated {stats['inserted']} of {stats['entries']} PII entries for {stats['users']} users")
+        return stats
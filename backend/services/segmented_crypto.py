@@ -0,0 +1,239 @@
+import io
+import os
+import base64
+import struct
+from typing import Iterator, Optional, Tuple
+import logging
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   header:  MAGIC | version (1 byte) | segment size (uint32) | file id (16 bytes)
+#   segment: nonce (12 bytes) | ciphertext | tag (16 bytes)
+# Every segment holds SEGMENT_SIZE bytes of plaintext except the last, which
+# holds the remainder (possibly none). Each segment is authenticated together
+# with the header, its index and whether it is the last one, so segments
+# cannot be reordered, swapped between files or truncated unnoticed.
+MAGIC = b"PDSE"
+VERSION = 1
+HEADER_FORMAT = ">4sBI16s"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+NONCE_SIZE = 12
+TAG_SIZE = 16
+SEGMENT_OVERHEAD = NONCE_SIZE + TAG_SIZE
+SEGMENT_SIZE = 64 * 1024
+
+class DecryptionError(Exception):
+    """Raised when an encrypted file is malformed or fails authentication"""
+
+def _load_key() -> bytes:
+    """
+    FILE_ENCRYPTION_KEY (urlsafe base64, 32 bytes) if set, otherwise a key
+    derived from FERNET_KEY so no extra configuration is required
+    """
+    configured = os.getenv("FILE_ENCRYPTION_KEY")
+    if configured:
+        key = base64.urlsafe_b64decode(configured)
+        if len(key) != 32:
+            raise ValueError("FILE_ENCRYPTION_KEY must be 32 bytes of urlsafe base64")
+        return key
+    fernet_key = os.getenv("FERNET_KEY")
+    if not fernet_key:
+        raise Exception("FILE_ENCRYPTION_KEY or FERNET_KEY must be set in environment variables")
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"pedolone-file-encryption-v1"
+    ).derive(fernet_key.encode())
+
+_aead: Optional[AESGCM] = None
+
+def _get_aead() -> AESGCM:
+    global _aead
+    if _aead is None:
+        _aead = AESGCM(_load_key())
+    return _aead
+
+def _segment_aad(header: bytes, index: int, final: bool) -> bytes:
+    return header + struct.pack(">QB", index, 1 if final else 0)
+
+class SegmentEncryptor:
+    """
+    Incremental encryptor producing the segmented format
+
+    Feed plaintext through update() in chunks of any size and write out
+    whatever it returns, starting with header and ending with finalize().
+    """
+
+    def __init__(self, segment_size: int = SEGMENT_SIZE):
+        self.segment_size = segment_size
+        self.header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, segment_size, os.urandom(16))
+        self._aead = _get_aead()
+        self._buffer = bytearray()
+        self._index = 0
+
+    def _seal(self, plaintext: bytes, final: bool) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = self._aead.encrypt(nonce, plaintext, _segment_aad(self.header, self._index, final))
+        self._index += 1
+        return nonce + sealed
+
+    def update(self, data: bytes) -> bytes:
+        self._buffer.extend(data)
+        out = []
+        # Keep at least one byte back so the last segment is sealed as final
+        while len(self._buffer) > self.segment_size:
+            out.append(self._seal(bytes(self._buffer[:self.segment_size]), final=False))
+            del self._buffer[:self.segment_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        sealed = self._seal(bytes(self._buffer), final=True)
+        self._buffer.clear()
+        return sealed
+
+def encrypted_size(plaintext_size: int, segment_size: int = SEGMENT_SIZE) -> int:
+    """Size on disk of a plaintext of the given size"""
+    segments = max(1, -(-plaintext_size // segment_size))
+    return HEADER_SIZE + plaintext_size + segments * SEGMENT_OVERHEAD
+
+def parse_header(header: bytes) -> int:
+    """Validate a header and return its segment size"""
+    if len(header) != HEADER_SIZE:
+        raise DecryptionError("Truncated header")
+    magic, version, segment_size, _ = struct.unpack(HEADER_FORMAT, header)
+    if magic != MAGIC or version != VERSION or segment_size <= 0:
+        raise DecryptionError("Not a segmented encrypted file")
+    return segment_size
+
+def plaintext_size(stored_size: int, segment_size: int) -> int:
+    """Plaintext size of a file from its size on disk"""
+    body = stored_size - HEADER_SIZE
+    stride = segment_size + SEGMENT_OVERHEAD
+    segments = -(-body // stride)
+    if body < SEGMENT_OVERHEAD or body - (segments - 1) * stride < SEGMENT_OVERHEAD:
+        raise DecryptionError("Truncated file")
+    return body - segments * SEGMENT_OVERHEAD
+
+def read_layout(f) -> Tuple[bytes, int, int]:
+    """Read an open file's header and return (header, segment size, plaintext size)"""
+    f.seek(0)
+    header = f.read(HEADER_SIZE)
+    segment_size = parse_header(header)
+    stored_size = f.seek(0, os.SEEK_END)
+    return header, segment_size, plaintext_size(stored_size, segment_size)
+
+def iter_decrypted_range(f, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Decrypt plaintext bytes [start, end) of an open encrypted file
+
+    Only the segments overlapping the range are read and decrypted, so
+    reads near the end of a large file cost the same as reads near the start.
+
+    Args:
+        f: A seekable binary file object
+        start: First plaintext byte
+        end: One past the last plaintext byte, defaults to the end of the file
+
+    Raises:
+        DecryptionError: If the file is malformed or a segment fails authentication
+    """
+    header, segment_size, total = read_layout(f)
+    end = total if end is None else min(end, total)
+    if start >= end:
+        return
+    last_index = _last_segment_index(total, segment_size)
+
+    for index in range(start // segment_size, (end - 1) // segment_size + 1):
+        plaintext = _decrypt_segment(f, header, segment_size, index, last_index)
+        segment_start = index * segment_size
+        yield plaintext[max(0, start - segment_start):end - segment_start]
+
+def _last_segment_index(total: int, segment_size: int) -> int:
+    return max(0, -(-total // segment_size) - 1)
+
+def _decrypt_segment(f, header: bytes, segment_size: int, index: int, last_index: int) -> bytes:
+    stride = segment_size + SEGMENT_OVERHEAD
+    f.seek(HEADER_SIZE + index * stride)
+    sealed = f.read(stride)
+    if len(sealed) < SEGMENT_OVERHEAD:
+        raise DecryptionError("Truncated segment")
+    try:
+        return _get_aead().decrypt(
+            sealed[:NONCE_SIZE],
+            sealed[NONCE_SIZE:],
+            _segment_aad(header, index, index == last_index)
+        )
+    except InvalidTag:
+        raise DecryptionError(f"Segment {index} failed authentication")
+
+class DecryptingReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over the plaintext of an encrypted file
+
+    Lets parsers such as PyPDF2 read an encrypted file in place; only the
+    segments they touch are decrypted, and the most recent one is kept.
+    """
+
+    def __init__(self, f):
+        super().__init__()
+        self._f = f
+        self._header, self._segment_size, self.size = read_layout(f)
+        self._last_index = _last_segment_index(self.size, self._segment_size)
+        self._pos = 0
+        self._cached_index = None
+        self._cached = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            base = 0
+        elif whence == io.SEEK_CUR:
+            base = self._pos
+        elif whence == io.SEEK_END:
+            base = self.size
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        if self._pos >= self.size:
+            return 0
+        index = self._pos // self._segment_size
+        if index != self._cached_index:
+            self._cached = _decrypt_segment(self._f, self._header, self._segment_size, index, self._last_index)
+            self._cached_index = index
+        offset = self._pos - index * self._segment_size
+        count = min(len(buffer), len(self._cached) - offset)
+        buffer[:count] = self._cached[offset:offset + count]
+        self._pos += count
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+def encrypt_bytes(data: bytes, segment_size: int = SEGMENT_SIZE) -> bytes:
+    """Encrypt an in-memory buffer into the segmented format"""
+    encryptor = SegmentEncryptor(segment_size)
+    return encryptor.header + encryptor.update(data) + encryptor.finalize()
+
+def decrypt_bytes(blob: bytes) -> bytes:
+    """Decrypt an in-memory buffer in the segmented format"""
+    return b"".join(iter_decrypted_range(io.BytesIO(blob)))
@@ -0,0 +1,127 @@
+import os
+import hmac
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Any, Optional
+import logging
+
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class SessionStore(ABC):
+    """
+    Short-lived session storage with automatic expiry
+
+    Sessions are plain dicts that must carry an "expires_at" datetime (UTC);
+    a session is never returned after that time. An "otp" value is never
+    stored: set() replaces it with an HMAC in "otp_hash", and callers check
+    submitted codes with verify_otp().
+    """
+
+    def __init__(self):
+        from jwt_utils import SECRET_KEY
+        self._otp_key = os.getenv("OTP_HASH_KEY", SECRET_KEY).encode()
+
+    def _hash_otp(self, otp: str) -> str:
+        return hmac.new(self._otp_key, str(otp).encode(), hashlib.sha256).hexdigest()
+
+    def _with_hashed_otp(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        session = dict(session)
+        if "otp" in session:
+            session["otp_hash"] = self._hash_otp(session.pop("otp"))
+        return session
+
+    def verify_otp(self, session: Dict[str, Any], otp: str) -> bool:
+        """Check a submitted OTP against the one stored with a session"""
+        expected = session.get("otp_hash")
+        return bool(expected) and hmac.compare_digest(expected, self._hash_otp(otp))
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session, or None if it is missing or expired"""
+
+    @abstractmethod
+    def set(self, session_id: str, session: Dict[str, Any]) -> None:
+        """Create or replace a session"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Remove a session"""
+
+class MemorySessionStore(SessionStore):
+    """In-process backend bounded by LRU eviction; only suitable for a single worker"""
+
+    def __init__(self, namespace: str, max_entries: int = 10000):
+        super().__init__()
+        self.namespace = namespace
+        self._cache = TTLCache(ttl_seconds=600, max_entries=max_entries)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._cache.get((self.namespace, session_id))
+        return dict(session) if session is not None else None
+
+    def set(self, session_id: str, session: Dict[str, Any]) -> None:
+        ttl = (session["expires_at"] - datetime.utcnow()).total_seconds()
+        if ttl <= 0:
+            self.delete(session_id)
+            return
+        self._cache.set((self.namespace, session_id), self._with_hashed_otp(session), ttl_seconds=ttl)
+
+    def delete(self, session_id: str) -> None:
+        self._cache.invalidate((self.namespace, session_id))
+
+class MongoSessionStore(SessionStore):
+    """
+    MongoDB backend shared by every worker and surviving restarts
+
+    A TTL index on expires_at removes expired sessions; reads also filter on
+    expires_at because the TTL monitor only runs about once a minute.
+    """
+
+    def __init__(self, collection, namespace: str):
+        super().__init__()
+        self.collection = collection
+        self.namespace = namespace
+        self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.namespace}:{session_id}"
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        doc = self.collection.find_one(
+            {"_id": self._key(session_id), "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "namespace": 0}
+        )
+        return doc
+
+    def set(self, session_id: str, session: Dict[str, Any]) -> None:
+        self.collection.replace_one(
+            {"_id": self._key(session_id)},
+            {**self._with_hashed_otp(session), "namespace": self.namespace},
+            upsert=True
+        )
+
+    def delete(self, session_id: str) -> None:
+        self.collection.delete_one({"_id": self._key(session_id)})
+
+def create_session_store(namespace: str) -> SessionStore:
+    """
+    Create the session store configured by OTP_SESSION_BACKEND
+
+    "mongo" (the default) stores sessions in the otp_sessions collection so
+    they work across workers; "memory" keeps them in-process, bounded by
+    OTP_SESSION_MAX_ENTRIES.
+
+    Args:
+        namespace: Separates the sessions of different consent flows
+    """
+    backend = os.getenv("OTP_SESSION_BACKEND", "mongo").lower()
+    if backend == "memory":
+        return MemorySessionStore(namespace, max_entries=int(os.getenv("OTP_SESSION_MAX_ENTRIES", "10000")))
+    if backend != "mongo":
+        logger.warning(f"Unknown OTP_SESSION_BACKEND '{backend}', using mongo")
+
+    from helpers import db
+    return MongoSessionStore(db.otp_sessions, namespace)
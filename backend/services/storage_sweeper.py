@@ -0,0 +1,119 @@
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StorageSweeper:
+    """
+    Deletes expired shared files and CSV exports, records and content
+
+    Expired documents are found through the expires_at index and processed
+    in batches. Each batch is claimed with a unique token before anything is
+    deleted, so several workers can sweep at once without handling the same
+    document twice; a claim left by a crashed worker is taken over once it
+    is older than the lease. Documents are kept for a grace period after
+    expiry so listings can still show them as expired.
+    """
+
+    def __init__(self, shared_files_collection, csv_files_collection, blob_store):
+        self.shared_files = shared_files_collection
+        self.csv_files = csv_files_collection
+        self.blob_store = blob_store
+        self.batch_size = int(os.getenv("STORAGE_SWEEP_BATCH_SIZE", "200"))
+        self.max_batches = int(os.getenv("STORAGE_SWEEP_MAX_BATCHES", "50"))
+        self.grace = timedelta(hours=float(os.getenv("STORAGE_SWEEP_GRACE_HOURS", "24")))
+        self.lease = timedelta(minutes=float(os.getenv("STORAGE_SWEEP_LEASE_MINUTES", "10")))
+
+    def ensure_indexes(self) -> None:
+        self.shared_files.create_index("expires_at")
+        self.csv_files.create_index("expires_at")
+
+    def _release_shared_file(self, doc: Dict[str, Any]) -> int:
+        if doc.get("content_sha256"):
+            # Flag before releasing so a batch retried after a crash cannot
+            # drop the same blob reference twice
+            claimed = self.shared_files.find_one_and_update(
+                {"file_id": doc["file_id"], "blob_released": {"$ne": True}},
+                {"$set": {"blob_released": True}},
+                projection={"_id": 1}
+            )
+            return self.blob_store.release(doc["content_sha256"]) if claimed else 0
+        # Files stored before the blob store have a file of their own
+        return self._delete_file(doc.get("file_path"))
+
+    def _release_csv_file(self, doc: Dict[str, Any]) -> int:
+        return self._delete_file(doc.get("file_path"))
+
+    @staticmethod
+    def _delete_file(path) -> int:
+        if not path:
+            return 0
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _sweep(self, collection, release, projection: Dict[str, int]) -> Dict[str, int]:
+        stats = {"deleted": 0, "bytes_reclaimed": 0}
+        for _ in range(self.max_batches):
+            now = datetime.utcnow()
+            claimable = {
+                "expires_at": {"$lte": now - self.grace},
+                "$or": [
+                    {"sweep_claim": {"$exists": False}},
+                    {"sweep_claimed_at": {"$lte": now - self.lease}}
+                ]
+            }
+            ids = [doc["_id"] for doc in collection.find(claimable, {"_id": 1}).limit(self.batch_size)]
+            if not ids:
+                break
+
+            claim = uuid.uuid4().hex
+            collection.update_many(
+                {**claimable, "_id": {"$in": ids}},
+                {"$set": {"sweep_claim": claim, "sweep_claimed_at": now}}
+            )
+            for doc in collection.find({"sweep_claim": claim}, projection):
+                stats["bytes_reclaimed"] += release(doc)
+            stats["deleted"] += collection.delete_many({"sweep_claim": claim}).deleted_count
+
+            if len(ids) < self.batch_size:
+                break
+        return stats
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Sweep expired shared files and CSV exports
+
+        Returns:
+            Documents deleted per kind and total bytes reclaimed on disk
+        """
+        shared = self._sweep(
+            self.shared_files,
+            self._release_shared_file,
+            {"_id": 0, "file_id": 1, "file_path": 1, "content_sha256": 1}
+        )
+        csv_exports = self._sweep(
+            self.csv_files,
+            self._release_csv_file,
+            {"_id": 0, "file_id": 1, "file_path": 1}
+        )
+        garbage = self.blob_store.collect_garbage()
+
+        stats = {
+            "shared_files_deleted": shared["deleted"],
+            "csv_files_deleted": csv_exports["deleted"],
+            "blobs_collected": garbage["blobs_deleted"],
+            "bytes_reclaimed": shared["bytes_reclaimed"] + csv_exports["bytes_reclaimed"] + garbage["bytes_reclaimed"]
+        }
+        if stats["shared_files_deleted"] or stats["csv_files_deleted"] or stats["blobs_collected"]:
+            logger.info(
+                f"Storage sweep deleted {stats['shared_files_deleted']} shared file(s) and "
+                f"{stats['csv_files_deleted']} CSV export(s), reclaimed {stats['bytes_reclaimed']} bytes"
+            )
+        return stats
@@ -238,6 +238,19 @@ export default function OrgDashboard() {
   // File sharing state
   const [fileRequests, setFileRequests] = useState([]);
   const [sharedFiles, setSharedFiles] = useState([]);
+  const [fileRequestsPagination, setFileRequestsPagination] = useState({
+    limit: 50,
+    offset: 0,
+    total: 0,
+    hasMore: false
+  });
+  const [sharedFilesPagination, setSharedFilesPagination] = useState({
+    limit: 50,
+    offset: 0,
+    total: 0,
+    hasMore: false
+  });
+  const [fileSharingPageLoading, setFileSharingPageLoading] = useState(false);
   const [showFileRequestModal, setShowFileRequestModal] = useState(false);
   const [showUploadFileModal, setShowUploadFileModal] = useState(false);
   const [showDirectShareModal, setShowDirectShareModal] = useState(false);
@@ -512,13 +525,25 @@ export default function OrgDashboard() {
         const complianceResponse = await api.get(`/policy/compliance/org/${orgId}`);
         setComplianceMetrics(complianceResponse.data || []);
         
-        // Fetch file sharing data
+        // Fetch the first page of file sharing data
         try {
-          const fileRequestsResponse = await api.get(`/file-sharing/requests/${orgIdToUse}`);
+          const fileRequestsResponse = await api.get(`/file-sharing/requests/${orgIdToUse}?limit=${fileRequestsPagination.limit}&offset=0`);
           setFileRequests(fileRequestsResponse.data?.file_requests || []);
+          setFileRequestsPagination(prev => ({
+            ...prev,
+            offset: 0,
+            total: fileRequestsResponse.data?.total_count || 0,
+            hasMore: fileRequestsResponse.data?.has_more || false
+          }));
           
-          const sharedFilesResponse = await api.get(`/file-sharing/shared-files/${orgIdToUse}`);
+          const sharedFilesResponse = await api.get(`/file-sharing/shared-files/${orgIdToUse}?limit=${sharedFilesPagination.limit}&offset=0`);
           setSharedFiles(sharedFilesResponse.data?.shared_files || []);
+          setSharedFilesPagination(prev => ({
+            ...prev,
+            offset: 0,
+            total: sharedFilesResponse.data?.total_count || 0,
+            hasMore: sharedFilesResponse.data?.has_more || false
+          }));
         } catch (fileErr) {
           console.error('Error fetching file sharing data:', fileErr);
           setFileRequests([]);
@@ -1713,6 +1738,63 @@ export default function OrgDashboard() {
     }
   };
 
+  // Append the next page of file requests or shared files
+  const handleLoadMoreFileRequests = async () => {
+    if (!orgIdToUse) return;
+    
+    setFileSharingPageLoading(true);
+    try {
+      const api = createAxiosInstance();
+      const offset = fileRequestsPagination.offset + fileRequestsPagination.limit;
+      const params = new URLSearchParams({
+        limit: fileRequestsPagination.limit.toString(),
+        offset: offset.toString()
+      });
+      
+      const response = await api.get(`/file-sharing/requests/${orgIdToUse}?${params}`);
+      
+      setFileRequests(prev => [...prev, ...(response.data?.file_requests || [])]);
+      setFileRequestsPagination(prev => ({
+        ...prev,
+        offset,
+        total: response.data?.total_count || 0,
+        hasMore: response.data?.has_more || false
+      }));
+    } catch (err) {
+      console.error('Error loading more file requests:', err);
+    } finally {
+      setFileSharingPageLoading(false);
+    }
+  };
+
+  const handleLoadMoreSharedFiles = async () => {
+    if (!orgIdToUse) return;
+    
+    setFileSharingPageLoading(true);
+    try {
+      const api = createAxiosInstance();
+      const offset = sharedFilesPagination.offset + sharedFilesPagination.limit;
+      const params = new URLSearchParams({
+        limit: sharedFilesPagination.limit.toString(),
+        offset: offset.toString()
+      });
+      
+      const response = await api.get(`/file-sharing/shared-files/${orgIdToUse}?${params}`);
+      
+      setSharedFiles(prev => [...prev, ...(response.data?.shared_files || [])]);
+      setSharedFilesPagination(prev => ({
+        ...prev,
+        offset,
+        total: response.data?.total_count || 0,
+        hasMore: response.data?.has_more || false
+      }));
+    } catch (err) {
+      console.error('Error loading more shared files:', err);
+    } finally {
+      setFileSharingPageLoading(false);
+    }
+  };
+
   const handleFileRequestFormChange = (field, value) => {
     setFileRequestForm(prev => ({
       ...prev,
@@ -4004,7 +4086,7 @@ export default function OrgDashboard() {
               {/* File Requests Section */}
               <div style={{ marginBottom: '2rem' }}>
                 <h3 style={{ fontSize: '1.25rem', fontWeight: '600', marginBottom: '1rem', color: '#374151' }}>
-                  File Requests ({fileRequests.length})
+                  File Requests ({fileRequestsPagination.total})
                 </h3>
                 <div style={{ 
                   background: 'linear-gradient(135deg, rgba(255, 255, 255, 0.95) 0%, rgba(248, 250, 252, 0.95) 100%)',
@@ -4162,12 +4244,38 @@ export default function OrgDashboard() {
                     </div>
                   )}
                 </div>
+                {fileRequestsPagination.hasMore && (
+                  <div style={{ 
+                    display: 'flex', 
+                    justifyContent: 'space-between', 
+                    alignItems: 'center', 
+                    marginTop: '1rem'
+                  }}>
+                    <div style={{ fontSize: '0.875rem', color: '#6b7280' }}>
+                      Showing {fileRequests.length} of {fileRequestsPagination.total} file requests
+                    </div>
+                    <button
+                      onClick={handleLoadMoreFileRequests}
+                      disabled={fileSharingPageLoading}
+                      style={{
+                        padding: '0.5rem 1rem',
+                        border: '1px solid #e5e7eb',
+                        borderRadius: '6px',
+                        background: 'white',
+                        cursor: fileSharingPageLoading ? 'not-allowed' : 'pointer',
+                        opacity: fileSharingPageLoading ? 0.5 : 1
+                      }}
+                    >
+                      {fileSharingPageLoading ? 'Loading...' : 'Load more'}
+                    </button>
+                  </div>
+                )}
               </div>
 
               {/* Shared Files Section */}
               <div>
                 <h3 style={{ fontSize: '1.25rem', fontWeight: '600', marginBottom: '1rem', color: '#374151' }}>
-                  Shared Files ({sharedFiles.length})
+                  Shared Files ({sharedFilesPagination.total})
                 </h3>
                 <div style={{ 
                   background: 'linear-gradient(135deg, rgba(255, 255, 255, 0.95) 0%, rgba(248, 250, 252, 0.95) 100%)',
@@ -4268,6 +4376,32 @@ export default function OrgDashboard() {
                     </div>
                   )}
                 </div>
+                {sharedFilesPagination.hasMore && (
+                  <div style={{ 
+                    display: 'flex', 
+                    justifyContent: 'space-between', 
+                    alignItems: 'center', 
+                    marginTop: '1rem'
+                  }}>
+                    <div style={{ fontSize: '0.875rem', color: '#6b7280' }}>
+                      Showing {sharedFiles.length} of {sharedFilesPagination.total} shared files
+                    </div>
+                    <button
+                      onClick={handleLoadMoreSharedFiles}
+                      disabled={fileSharingPageLoading}
+                      style={{
+                        padding: '0.5rem 1rem',
+                        border: '1px solid #e5e7eb',
+                        borderRadius: '6px',
+                        background: 'white',
+                        cursor: fileSharingPageLoading ? 'not-allowed' : 'pointer',
+                        opacity: fileSharingPageLoading ? 0.5 : 1
+                      }}
+                    >
+                      {fileSharingPageLoading ? 'Loading...' : 'Load more'}
+                    </button>
+                  </div>
+                )}
               </div>
             </div>
           )}